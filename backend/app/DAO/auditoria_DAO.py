@@ -4,17 +4,335 @@ Registra TODAS las acciones realizadas en el sistema
 """
 
 from app.db.conexion_DB import ConectDB
-import json
+from app.utils.paginacion import PageResult, build_cursor
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+import orjson
+import zstandard
+from mysql.connector.errors import DataError, Error, IntegrityError
+
+logger = logging.getLogger(__name__)
+
+
+# Las fechas se guardan como str(datetime) ('2026-10-16 12:00:00'), igual que
+# los registros anteriores
+def _dumps(obj) -> str:
+    return orjson.dumps(obj, default=str, option=orjson.OPT_PASSTHROUGH_DATETIME).decode()
+
+
+_loads = orjson.loads
+
+
+# Los JSON se guardan comprimidos con zstd. Los registros se reconocen por el
+# magic number, así conviven con las filas en texto plano migradas de la
+# columna JSON anterior.
+# Los (de)compresores de zstandard no se pueden usar desde varios hilos a la
+# vez: cada hilo tiene los suyos.
+_ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+_zstd_local = threading.local()
+
+
+def _zstd():
+    """(compresor, descompresor) del hilo actual"""
+    ctx = getattr(_zstd_local, 'ctx', None)
+    if ctx is None:
+        ctx = _zstd_local.ctx = (zstandard.ZstdCompressor(level=3), zstandard.ZstdDecompressor())
+    return ctx
+
+
+def _pack(obj) -> bytes:
+    """Serializar a JSON y comprimir"""
+    return _zstd()[0].compress(_dumps(obj).encode())
+
+
+def _unpack(value) -> str:
+    """Descomprimir (si corresponde) y devolver el texto JSON"""
+    if not isinstance(value, (bytes, bytearray)):
+        return value
+    
+    data = bytes(value)
+    if data.startswith(_ZSTD_MAGIC):
+        data = _zstd()[1].decompress(data)
+    return data.decode()
+
+
+def _parse_datos(auditorias: list, parse_json: bool = True) -> None:
+    """
+    Decodificar los campos datos_anteriores / datos_nuevos de cada registro
+    
+    Con parse_json=False se devuelven como texto JSON (sin parsear).
+    """
+    for aud in auditorias:
+        for campo in ('datos_anteriores', 'datos_nuevos'):
+            if aud.get(campo):
+                texto = _unpack(aud[campo])
+                aud[campo] = _loads(texto) if parse_json else texto
+
+
+_INSERT_AUDITORIA = """
+    INSERT INTO auditoria 
+    (entidad, id_entidad, accion, descripcion, 
+     datos_anteriores, datos_nuevos, id_usuario,
+     ip_address, user_agent)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+# Resúmenes diarios para las estadísticas (evitan recorrer auditoria)
+_UPSERT_STATS_ACCION = """
+    INSERT INTO auditoria_stats_accion (accion, dia, cnt)
+    VALUES (%s, CURRENT_DATE, %s)
+    ON DUPLICATE KEY UPDATE cnt = cnt + VALUES(cnt)
+"""
+
+_UPSERT_STATS_USUARIO = """
+    INSERT INTO auditoria_stats_usuario (id_usuario, dia, cnt)
+    VALUES (%s, CURRENT_DATE, %s)
+    ON DUPLICATE KEY UPDATE cnt = cnt + VALUES(cnt)
+"""
+
+
+# ========================================
+# ESCRITURA DIFERIDA (write-behind)
+# ========================================
+# Los registros de auditoría se encolan y un hilo los serializa e inserta por
+# lotes con executemany, fuera del camino del request. La cola es acotada: si se
+# llena (base caída o lenta) se descarta el registro más antiguo en lugar de
+# bloquear el request.
+_BATCH_SIZE = 500
+_FLUSH_INTERVAL = 0.2  # segundos
+_QUEUE_MAXSIZE = 10000
+# Deadlock (1213) y lock wait timeout (1205): el lote se reintenta entero
+_LOCK_ERRNOS = (1213, 1205)
+_LOCK_RETRIES = 3
+_LOCK_BACKOFF = 0.05  # segundos, crece con cada intento
+
+_audit_queue = queue.Queue(maxsize=_QUEUE_MAXSIZE)
+_worker = None
+_worker_pid = None
+_worker_lock = threading.Lock()
+
+
+def _to_row(data: dict) -> tuple:
+    """Convertir el dict de auditoría en la tupla de valores del INSERT"""
+    # Convertir diccionarios a JSON (comprimido)
+    datos_anteriores = _pack(data.get('datos_anteriores')) if data.get('datos_anteriores') else None
+    datos_nuevos = _pack(data.get('datos_nuevos')) if data.get('datos_nuevos') else None
+    
+    return (
+        data['entidad'],
+        data['id_entidad'],
+        data['accion'],
+        data.get('descripcion', ''),
+        datos_anteriores,
+        datos_nuevos,
+        data['id_usuario'],
+        data.get('ip_address'),
+        data.get('user_agent')
+    )
+
+
+def _update_stats(cursor, rows: list) -> None:
+    """
+    Sumar los registros insertados a las tablas de resumen diario
+    (auditoria_stats_accion / auditoria_stats_usuario), en la misma transacción
+    """
+    por_accion = Counter(row[2] for row in rows)
+    por_usuario = Counter(row[6] for row in rows)
+    # Siempre en el mismo orden: los writers de cada worker (y create_sync)
+    # bloquean las mismas filas del día y no se cruzan entre sí
+    cursor.executemany(_UPSERT_STATS_ACCION, sorted(por_accion.items()))
+    cursor.executemany(_UPSERT_STATS_USUARIO,
+                       sorted(por_usuario.items(), key=lambda item: (item[0] is None, item[0] or 0)))
+
+
+def _encolar(data: dict) -> None:
+    """Encolar un registro; si la cola está llena se descarta el más antiguo"""
+    while True:
+        try:
+            _audit_queue.put_nowait(data)
+            return
+        except queue.Full:
+            try:
+                descartado = _audit_queue.get_nowait()
+                logger.warning("Cola de auditoría llena, se descarta: %s %s %s",
+                               descartado.get('entidad'), descartado.get('id_entidad'),
+                               descartado.get('accion'))
+            except queue.Empty:
+                pass
+
+
+def _insert_batch(items: list) -> None:
+    """Serializar e insertar un lote de registros de auditoría"""
+    batch = []
+    for data in items:
+        try:
+            batch.append(_to_row(data))
+        except Exception:
+            logger.exception("Error serializing auditoria")
+    
+    if batch:
+        _insert_rows(batch)
+
+
+def _insert_rows(rows: list) -> None:
+    """
+    Insertar filas ya serializadas en una sola transacción
+    
+    MySQL rechaza el INSERT de varias filas entero si una sola es inválida
+    (valor demasiado largo, FK o ENUM en modo estricto). En ese caso el lote se
+    reintenta en mitades, así solo se pierde el registro que falla. Un deadlock
+    o lock wait timeout reintenta el lote completo hasta _LOCK_RETRIES veces.
+    Los demás errores (base caída, etc.) no se reintentan.
+    """
+    for intento in range(_LOCK_RETRIES + 1):
+        try:
+            with ConectDB.get_cursor() as cursor:
+                cursor.executemany(_INSERT_AUDITORIA, rows)
+                _update_stats(cursor, rows)
+            return
+        except (DataError, IntegrityError):
+            if len(rows) == 1:
+                logger.exception("Error inserting auditoria, se descarta: %s %s %s",
+                                 rows[0][0], rows[0][1], rows[0][2])
+                return
+            mitad = len(rows) // 2
+            _insert_rows(rows[:mitad])
+            _insert_rows(rows[mitad:])
+            return
+        except Error as e:
+            if e.errno in _LOCK_ERRNOS and intento < _LOCK_RETRIES:
+                time.sleep(_LOCK_BACKOFF * (intento + 1))
+                continue
+            logger.exception("Error inserting auditoria batch (%d registros)", len(rows))
+            return
+        except Exception:
+            logger.exception("Error inserting auditoria batch (%d registros)", len(rows))
+            return
+
+
+def _drain() -> None:
+    """Hilo que vacía la cola: junta hasta _BATCH_SIZE registros o espera _FLUSH_INTERVAL"""
+    while True:
+        batch = [_audit_queue.get()]
+        deadline = time.monotonic() + _FLUSH_INTERVAL
+        
+        while len(batch) < _BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(_audit_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        
+        _insert_batch(batch)
+
+
+def _ensure_worker() -> None:
+    """Iniciar el hilo de escritura (uno por proceso; los hilos no sobreviven al fork)"""
+    global _worker, _worker_pid
+    
+    if _worker is not None and _worker_pid == os.getpid() and _worker.is_alive():
+        return
+    
+    with _worker_lock:
+        if _worker is None or _worker_pid != os.getpid() or not _worker.is_alive():
+            _worker = threading.Thread(target=_drain, name='auditoria-writer', daemon=True)
+            _worker.start()
+            _worker_pid = os.getpid()
+
+
+def _flush_now() -> None:
+    """Insertar lo que quede en la cola (al terminar el proceso)"""
+    batch = []
+    while True:
+        try:
+            batch.append(_audit_queue.get_nowait())
+        except queue.Empty:
+            break
+        
+        if len(batch) >= _BATCH_SIZE:
+            _insert_batch(batch)
+            batch = []
+    
+    if batch:
+        _insert_batch(batch)
+
+
+atexit.register(_flush_now)
+
+
+# Filtros de auditoría: (clave, condición SQL sobre la columna)
+_AUDIT_FILTERS = (
+    ('entidad', 'entidad = %s'),
+    ('accion', 'accion = %s'),
+    ('id_usuario', 'id_usuario = %s'),
+    ('fecha_desde', 'fecha_hora >= %s'),
+    ('fecha_hasta', 'fecha_hora <= %s'),
+)
+
+
+def _build_filters(valores: dict, alias: str = '') -> tuple:
+    """
+    Armar el fragmento WHERE y sus parámetros a partir de los filtros informados
+    
+    Args:
+        valores (dict): {clave de _AUDIT_FILTERS: valor}; se ignoran los vacíos
+        alias (str): Alias de la tabla auditoria en la consulta (ej. 'a.')
+    
+    Returns:
+        tuple: (" AND ... AND ...", [params])
+    """
+    where = ""
+    params = []
+    for clave, condicion in _AUDIT_FILTERS:
+        valor = valores.get(clave)
+        if valor:
+            where += f" AND {alias}{condicion}"
+            params.append(valor)
+    return where, params
+
+
+# Ventana por defecto de las estadísticas cuando no se indica fecha_desde
+# (acota el recorrido a las particiones recientes)
+_STATS_DIAS_DEFAULT = 90
+
+
+def _fecha_desde_default(fecha_desde):
+    """Usar los últimos _STATS_DIAS_DEFAULT días si no se indicó fecha_desde"""
+    if fecha_desde:
+        return fecha_desde
+    return (datetime.now() - timedelta(days=_STATS_DIAS_DEFAULT)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+# Filas por lote al recorrer historiales largos
+_FETCH_BATCH = 256
+
+
+# Columnas del listado sin los JSON (datos_anteriores / datos_nuevos)
+_LIST_COLS = """
+    a.id_auditoria, a.entidad, a.id_entidad, a.accion, a.descripcion,
+    a.id_usuario, a.ip_address, a.user_agent, a.fecha_hora
+"""
 
 
 class AuditoriaDAO:
     """Data Access Object para la tabla auditoria"""
     
     @staticmethod
-    def create(data: dict) -> int:
+    def create(data: dict) -> None:
         """
         Registrar una acción en auditoría
         
+        Se mantiene por compatibilidad: equivale a create_async.
+        
         Args:
             data (dict): {
                 'entidad': str (Usuario, Producto, Envio, etc.),
@@ -28,141 +346,154 @@ class AuditoriaDAO:
                 'user_agent': str (opcional)
             }
         """
+        AuditoriaDAO.create_async(data)
+    
+    @staticmethod
+    def create_async(data: dict) -> None:
+        """
+        Registrar una acción en auditoría sin esperar la escritura
+        
+        Solo encola el registro: la serialización a JSON y el INSERT se hacen
+        en el hilo de escritura. Si se necesita el ID generado usar create_sync.
+        
+        Args:
+            data (dict): mismo formato que create
+        """
+        _ensure_worker()
+        _encolar(dict(data))
+    
+    @staticmethod
+    def create_sync(data: dict) -> int:
+        """
+        Registrar una acción en auditoría de forma sincrónica
+        
+        Args:
+            data (dict): mismo formato que create
+        
+        Returns:
+            int: ID del registro de auditoría
+        """
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
-                # Convertir diccionarios a JSON
-                datos_anteriores = json.dumps(data.get('datos_anteriores')) if data.get('datos_anteriores') else None
-                datos_nuevos = json.dumps(data.get('datos_nuevos')) if data.get('datos_nuevos') else None
-                
-                query = """
-                    INSERT INTO auditoria 
-                    (entidad, id_entidad, accion, descripcion, 
-                     datos_anteriores, datos_nuevos, id_usuario,
-                     ip_address, user_agent)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """
-                cursor.execute(query, (
-                    data['entidad'],
-                    data['id_entidad'],
-                    data['accion'],
-                    data.get('descripcion', ''),
-                    datos_anteriores,
-                    datos_nuevos,
-                    data['id_usuario'],
-                    data.get('ip_address'),
-                    data.get('user_agent')
-                ))
-                connection.commit()
-                return cursor.lastrowid
-        except Exception as e:
-            print(f"Error creating auditoria: {e}")
-            connection.rollback()
+            row = _to_row(data)
+            with ConectDB.get_cursor() as cursor:
+                cursor.execute(_INSERT_AUDITORIA, row)
+                auditoria_id = cursor.lastrowid
+                _update_stats(cursor, [row])
+                return auditoria_id
+        except Exception:
+            logger.exception("Error creating auditoria")
             raise
-        finally:
-            connection.close()
 
             
     @staticmethod
     def get_all(page=1, limit=50, entidad=None, accion=None, usuario_id=None, 
-                fecha_desde=None, fecha_hasta=None):
-        """Obtener todos los registros de auditoría con filtros"""
+                fecha_desde=None, fecha_hasta=None, cursor=None, parse_json=False,
+                include_blobs=False) -> PageResult:
+        """
+        Obtener todos los registros de auditoría con filtros
+
+        Args:
+            cursor (tuple): (fecha_hora, id_auditoria) del último registro de la
+                página anterior. Si se envía, se pagina por keyset y se ignora page.
+            parse_json (bool): Parsear datos_anteriores/datos_nuevos. En los listados
+                se devuelven como texto JSON sin parsear.
+            include_blobs (bool): Incluir datos_anteriores/datos_nuevos. Por defecto
+                el listado no los trae.
+        """
         try:
             connection = ConectDB.get_connection()
-            with connection.cursor(dictionary=True) as cursor:
-                # Contar total
-                count_query = "SELECT COUNT(*) as total FROM auditoria WHERE 1=1"
-                params = []
-                
-                if entidad:
-                    count_query += " AND entidad = %s"
-                    params.append(entidad)
-                
-                if accion:
-                    count_query += " AND accion = %s"
-                    params.append(accion)
+            with connection.cursor(dictionary=True) as db_cursor:
+                # Filtros comunes (sobre la tabla base, sin joins)
+                filtros, params = _build_filters({
+                    'entidad': entidad,
+                    'accion': accion,
+                    'id_usuario': usuario_id,
+                    'fecha_desde': fecha_desde,
+                    'fecha_hasta': fecha_hasta
+                })
                 
-                if usuario_id:
-                    count_query += " AND id_usuario = %s"
-                    params.append(usuario_id)
+                # Deferred join: la subconsulta recorre solo el índice (fecha_hora, id)
+                # y los joins se hacen únicamente sobre las filas de la página.
+                # En modo página el total sale de la misma consulta con COUNT(*) OVER(),
+                # que se evalúa antes del LIMIT. En modo keyset no se calcula el total.
+                if cursor:
+                    ids_query = "SELECT id_auditoria, NULL AS _total FROM auditoria WHERE 1=1" + filtros
+                else:
+                    ids_query = "SELECT id_auditoria, COUNT(*) OVER() AS _total FROM auditoria WHERE 1=1" + filtros
                 
-                if fecha_desde:
-                    count_query += " AND fecha_hora >= %s"
-                    params.append(fecha_desde)
-                
-                if fecha_hasta:
-                    count_query += " AND fecha_hora <= %s"
-                    params.append(fecha_hasta)
-                
-                cursor.execute(count_query, params)
-                total = cursor.fetchone()['total']
+                # Keyset: seguir desde el último registro sin recorrer el offset
+                if cursor:
+                    ids_query += " AND (fecha_hora, id_auditoria) < (%s, %s)"
+                    params.extend(cursor)
+                    ids_query += " ORDER BY fecha_hora DESC, id_auditoria DESC LIMIT %s"
+                    params.append(limit)
+                else:
+                    ids_query += " ORDER BY fecha_hora DESC, id_auditoria DESC LIMIT %s OFFSET %s"
+                    params.extend([limit, (page - 1) * limit])
                 
                 # Obtener registros
-                offset = (page - 1) * limit
-                query = """
-                    SELECT a.*,
+                columnas = "a.*" if include_blobs else _LIST_COLS
+                query = f"""
+                    SELECT {columnas}, k._total,
                            u.nombre as usuario_nombre,
                            u.apellido as usuario_apellido,
                            u.username
-                    FROM auditoria a
+                    FROM ({ids_query}) k
+                    JOIN auditoria a ON a.id_auditoria = k.id_auditoria
                     JOIN usuarios u ON a.id_usuario = u.id_usuario
-                    WHERE 1=1
+                    ORDER BY a.fecha_hora DESC, a.id_auditoria DESC
                 """
                 
-                if entidad:
-                    query += " AND a.entidad = %s"
-                
-                if accion:
-                    query += " AND a.accion = %s"
-                
-                if usuario_id:
-                    query += " AND a.id_usuario = %s"
-                
-                if fecha_desde:
-                    query += " AND a.fecha_hora >= %s"
+                db_cursor.execute(query, params)
+                auditorias = db_cursor.fetchall()
+                total = auditorias[0]['_total'] if auditorias else (None if cursor else 0)
                 
-                if fecha_hasta:
-                    query += " AND a.fecha_hora <= %s"
+                for aud in auditorias:
+                    del aud['_total']
                 
-                query += " ORDER BY a.fecha_hora DESC LIMIT %s OFFSET %s"
-                params.extend([limit, offset])
+                if include_blobs:
+                    _parse_datos(auditorias, parse_json)
                 
-                cursor.execute(query, params)
-                auditorias = cursor.fetchall()
-                
-                # Parsear JSON
-                for aud in auditorias:
-                    if aud.get('datos_anteriores'):
-                        aud['datos_anteriores'] = json.loads(aud['datos_anteriores'])
-                    if aud.get('datos_nuevos'):
-                        aud['datos_nuevos'] = json.loads(aud['datos_nuevos'])
+                ultimo = auditorias[-1] if len(auditorias) == limit else None
                 
-                return {
-                    'auditorias': auditorias,
-                    'pagination': {
-                        'page': page,
-                        'limit': limit,
-                        'total': total,
-                        'total_pages': (total + limit - 1) // limit
-                    }
-                }
-        except Exception as e:
-            print(f"Error getting auditorias: {e}")
+                return PageResult(
+                    key='auditorias',
+                    rows=auditorias,
+                    page=page,
+                    limit=limit,
+                    total=total,
+                    next_cursor=build_cursor(ultimo['fecha_hora'], ultimo['id_auditoria']) if ultimo else None
+                )
+        except Exception:
+            logger.exception("Error getting auditorias")
             raise
         finally:
             connection.close()
     
     @staticmethod
-    def get_by_usuario(usuario_id: int, page=1, limit=50) -> dict:
+    def get_by_usuario(usuario_id: int, page=1, limit=50, cursor=None) -> PageResult:
         """Obtener auditoría de un usuario específico"""
-        return AuditoriaDAO.get_all(page=page, limit=limit, usuario_id=usuario_id)
+        return AuditoriaDAO.get_all(page=page, limit=limit, usuario_id=usuario_id, cursor=cursor)
     
     @staticmethod
-    def get_by_entidad(entidad: str, id_entidad: int) -> list:
+    def get_by_entidad(entidad: str, id_entidad: int, parse_json=True) -> list:
         """Obtener historial de auditoría de una entidad específica"""
+        return list(AuditoriaDAO.iter_by_entidad(entidad, id_entidad, parse_json))
+    
+    @staticmethod
+    def iter_by_entidad(entidad: str, id_entidad: int, parse_json=True):
+        """
+        Recorrer el historial de auditoría de una entidad sin cargarlo entero
+        
+        Usa un cursor sin buffer y trae las filas de a _FETCH_BATCH, parseando
+        el JSON fila por fila. La conexión vuelve al pool al agotar (o cerrar)
+        el generador.
+        
+        Yields:
+            dict: registro de auditoría
+        """
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor() as cursor:
                 query = """
                     SELECT a.*,
                            u.nombre as usuario_nombre,
@@ -173,30 +504,37 @@ class AuditoriaDAO:
                     ORDER BY a.fecha_hora DESC
                 """
                 cursor.execute(query, (entidad, id_entidad))
-                auditorias = cursor.fetchall()
                 
-                # Parsear JSON
-                for aud in auditorias:
-                    if aud.get('datos_anteriores'):
-                        aud['datos_anteriores'] = json.loads(aud['datos_anteriores'])
-                    if aud.get('datos_nuevos'):
-                        aud['datos_nuevos'] = json.loads(aud['datos_nuevos'])
-                
-                return auditorias
-        except Exception as e:
-            print(f"Error getting auditoria by entidad: {e}")
+                while True:
+                    rows = cursor.fetchmany(_FETCH_BATCH)
+                    if not rows:
+                        break
+                    
+                    _parse_datos(rows, parse_json)
+                    
+                    yield from rows
+        except Exception:
+            logger.exception("Error getting auditoria by entidad")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def get_actividad_reciente(limit: int = 20) -> list:
-        """Obtener actividad reciente del sistema"""
+        """
+        Obtener actividad reciente del sistema
+        
+        Solo trae las columnas del resumen (sin datos_anteriores/datos_nuevos)
+        para que MySQL recorra el índice idx_recent.
+        """
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor() as cursor:
                 query = """
-                    SELECT a.*,
+                    SELECT a.id_auditoria,
+                           a.entidad,
+                           a.id_entidad,
+                           a.accion,
+                           a.descripcion,
+                           a.fecha_hora,
+                           a.id_usuario,
                            u.nombre as usuario_nombre,
                            u.apellido as usuario_apellido
                     FROM auditoria a
@@ -206,67 +544,85 @@ class AuditoriaDAO:
                 """
                 cursor.execute(query, (limit,))
                 return cursor.fetchall()
-        except Exception as e:
-            print(f"Error getting actividad reciente: {e}")
+        except Exception:
+            logger.exception("Error getting actividad reciente")
+            raise
+    
+    @staticmethod
+    def get_latest_id() -> int:
+        """
+        Obtener el último id_auditoria registrado (0 si no hay registros)
+        
+        MAX sobre la PRIMARY KEY: MySQL lo resuelve leyendo el final del índice.
+        """
+        try:
+            with ConectDB.get_cursor(dictionary=False, readonly=True) as cursor:
+                cursor.execute("SELECT MAX(id_auditoria) FROM auditoria")
+                return cursor.fetchone()[0] or 0
+        except Exception:
+            logger.exception("Error getting ultimo id de auditoria")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def count_por_accion(fecha_desde=None, fecha_hasta=None) -> dict:
-        """Contar acciones por tipo"""
+        """
+        Contar acciones por tipo (por defecto, de los últimos 90 días)
+        
+        Se calcula sobre el resumen diario auditoria_stats_accion: las fechas
+        se toman con granularidad de día.
+        """
+        fecha_desde = _fecha_desde_default(fecha_desde)
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
-                query = "SELECT accion, COUNT(*) as count FROM auditoria WHERE 1=1"
-                params = []
-                
-                if fecha_desde:
-                    query += " AND fecha_hora >= %s"
-                    params.append(fecha_desde)
+            with ConectDB.get_cursor() as cursor:
+                query = """
+                    SELECT accion, SUM(cnt) as count
+                    FROM auditoria_stats_accion
+                    WHERE dia >= DATE(%s)
+                """
+                params = [fecha_desde]
                 
                 if fecha_hasta:
-                    query += " AND fecha_hora <= %s"
+                    query += " AND dia <= DATE(%s)"
                     params.append(fecha_hasta)
                 
                 query += " GROUP BY accion"
                 cursor.execute(query, params)
                 
                 results = cursor.fetchall()
-                return {row['accion']: row['count'] for row in results}
-        except Exception as e:
-            print(f"Error counting por accion: {e}")
+                return {row['accion']: int(row['count']) for row in results}
+        except Exception:
+            logger.exception("Error counting por accion")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def count_por_usuario(fecha_desde=None, fecha_hasta=None) -> list:
-        """Contar acciones por usuario"""
+        """
+        Contar acciones por usuario (por defecto, de los últimos 90 días)
+        
+        Se calcula sobre el resumen diario auditoria_stats_usuario.
+        """
+        fecha_desde = _fecha_desde_default(fecha_desde)
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor() as cursor:
                 query = """
-                    SELECT u.id_usuario, u.nombre, u.apellido, COUNT(*) as count
-                    FROM auditoria a
-                    JOIN usuarios u ON a.id_usuario = u.id_usuario
-                    WHERE 1=1
+                    SELECT u.id_usuario, u.nombre, u.apellido, SUM(s.cnt) as count
+                    FROM auditoria_stats_usuario s
+                    JOIN usuarios u ON s.id_usuario = u.id_usuario
+                    WHERE s.dia >= DATE(%s)
                 """
-                params = []
-                
-                if fecha_desde:
-                    query += " AND a.fecha_hora >= %s"
-                    params.append(fecha_desde)
+                params = [fecha_desde]
                 
                 if fecha_hasta:
-                    query += " AND a.fecha_hora <= %s"
+                    query += " AND s.dia <= DATE(%s)"
                     params.append(fecha_hasta)
                 
                 query += " GROUP BY u.id_usuario ORDER BY count DESC"
                 cursor.execute(query, params)
-                return cursor.fetchall()
-        except Exception as e:
-            print(f"Error counting por usuario: {e}")
+                
+                results = cursor.fetchall()
+                for row in results:
+                    row['count'] = int(row['count'])
+                return results
+        except Exception:
+            logger.exception("Error counting por usuario")
             raise
-        finally:
-            connection.close()
\ No newline at end of file
@@ -3,7 +3,26 @@ DAO de Categorías
 Maneja operaciones de base de datos para categorías de productos
 """
 
+import logging
+
 from app.db.conexion_DB import ConectDB
+from app.utils.cache import TTLCache, cached
+
+logger = logging.getLogger(__name__)
+
+# Consultas fijas: se preparan una vez por conexión (get_prepared_cursor)
+_SELECT_BY_ID = "SELECT * FROM categorias WHERE id_categoria = %s"
+_SELECT_BY_CODIGO = "SELECT * FROM categorias WHERE codigo = %s"
+_EXISTS_CODIGO = "SELECT COUNT(*) as count FROM categorias WHERE codigo = %s"
+_EXISTS_CODIGO_EXCLUDE = _EXISTS_CODIGO + " AND id_categoria != %s"
+
+# Las categorías casi no cambian: se cachean y se invalidan al escribir
+_cache = TTLCache(maxsize=256, ttl=120)
+
+
+def _invalidar_cache():
+    """Invalidar el cache de categorías"""
+    _cache.clear()
 
 
 class CategoriaDAO:
@@ -23,8 +42,7 @@ class CategoriaDAO:
             }
         """
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor() as cursor:
                 query = """
                     INSERT INTO categorias 
                     (tipo, nombre, codigo, descripcion, activo)
@@ -36,20 +54,19 @@ class CategoriaDAO:
                     data.get('codigo'),
                     data.get('descripcion', '')
                 ))
-                return cursor.lastrowid
-        except Exception as e:
-            print(f"Error creating categoria: {e}")
-            connection.rollback()
+                categoria_id = cursor.lastrowid
+            _invalidar_cache()
+            return categoria_id
+        except Exception:
+            logger.exception("Error creating categoria")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
+    @cached(_cache)
     def get_all(activo=None):
         """Obtener todas las categorías"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor() as cursor:
                 query = "SELECT * FROM categorias WHERE 1=1"
                 params = []
                 
@@ -60,63 +77,52 @@ class CategoriaDAO:
                 query += " ORDER BY tipo, nombre"
                 cursor.execute(query, params)
                 return cursor.fetchall()
-        except Exception as e:
-            print(f"Error getting categorias: {e}")
+        except Exception:
+            logger.exception("Error getting categorias")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
+    @cached(_cache)
     def get_by_id(categoria_id: int) -> dict:
         """Obtener categoría por ID"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor(dictionary=True) as cursor:
-                query = "SELECT * FROM categorias WHERE id_categoria = %s"
-                cursor.execute(query, (categoria_id,))
+            with ConectDB.get_prepared_cursor(_SELECT_BY_ID) as cursor:
+                cursor.execute(_SELECT_BY_ID, (categoria_id,))
                 return cursor.fetchone()
-        except Exception as e:
-            print(f"Error getting categoria by id: {e}")
+        except Exception:
+            logger.exception("Error getting categoria by id")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
+    @cached(_cache)
     def get_by_codigo(codigo: str) -> dict:
         """Obtener categoría por código"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
-                query = "SELECT * FROM categorias WHERE codigo = %s"
-                cursor.execute(query, (codigo,))
+            with ConectDB.get_prepared_cursor(_SELECT_BY_CODIGO) as cursor:
+                cursor.execute(_SELECT_BY_CODIGO, (codigo,))
                 return cursor.fetchone()
-        except Exception as e:
-            print(f"Error getting categoria by codigo: {e}")
+        except Exception:
+            logger.exception("Error getting categoria by codigo")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
+    @cached(_cache)
     def get_by_tipo(tipo: str) -> list:
         """Obtener categorías por tipo"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor() as cursor:
                 query = "SELECT * FROM categorias WHERE tipo = %s AND activo = 1 ORDER BY nombre"
                 cursor.execute(query, (tipo,))
                 return cursor.fetchall()
-        except Exception as e:
-            print(f"Error getting categorias by tipo: {e}")
+        except Exception:
+            logger.exception("Error getting categorias by tipo")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def update(categoria_id: int, data: dict) -> bool:
         """Actualizar categoría"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor() as cursor:
                 fields = []
                 values = []
                 
@@ -131,58 +137,51 @@ class CategoriaDAO:
                 values.append(categoria_id)
                 query = f"UPDATE categorias SET {', '.join(fields)} WHERE id_categoria = %s"
                 cursor.execute(query, values)
-                return cursor.rowcount > 0
-        except Exception as e:
-            print(f"Error updating categoria: {e}")
-            connection.rollback()
+                updated = cursor.rowcount > 0
+            _invalidar_cache()
+            return updated
+        except Exception:
+            logger.exception("Error updating categoria")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def delete(categoria_id: int) -> bool:
         """Eliminar (soft delete) categoría"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor() as cursor:
                 query = "UPDATE categorias SET activo = 0 WHERE id_categoria = %s"
                 cursor.execute(query, (categoria_id,))
-                return cursor.rowcount > 0
-        except Exception as e:
-            print(f"Error deleting categoria: {e}")
-            connection.rollback()
+                deleted = cursor.rowcount > 0
+            _invalidar_cache()
+            return deleted
+        except Exception:
+            logger.exception("Error deleting categoria")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def exists_codigo(codigo: str, exclude_id: int = None) -> bool:
         """Verificar si existe una categoría con ese código"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
-                query = "SELECT COUNT(*) as count FROM categorias WHERE codigo = %s"
-                params = [codigo]
-                
-                if exclude_id:
-                    query += " AND id_categoria != %s"
-                    params.append(exclude_id)
-                
+            query = _EXISTS_CODIGO_EXCLUDE if exclude_id else _EXISTS_CODIGO
+            params = (codigo, exclude_id) if exclude_id else (codigo,)
+            with ConectDB.get_prepared_cursor(query) as cursor:
                 cursor.execute(query, params)
                 result = cursor.fetchone()
                 return result['count'] > 0
-        except Exception as e:
-            print(f"Error checking codigo: {e}")
+        except Exception:
+            logger.exception("Error checking codigo")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def count_productos(categoria_id: int) -> int:
-        """Contar productos de una categoría"""
+        """
+        Contar productos activos de una categoría
+        
+        No se cachea: es el control de CategoriaService.delete y las altas o
+        cambios de productos no invalidan los caches de categorías.
+        """
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor() as cursor:
                 query = """
                     SELECT COUNT(*) as count 
                     FROM productos 
@@ -191,8 +190,6 @@ class CategoriaDAO:
                 cursor.execute(query, (categoria_id,))
                 result = cursor.fetchone()
                 return result['count']
-        except Exception as e:
-            print(f"Error counting productos: {e}")
-            raise
-        finally:
-            connection.close()
\ No newline at end of file
+        except Exception:
+            logger.exception("Error counting productos")
+            raise
\ No newline at end of file
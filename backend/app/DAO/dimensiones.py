@@ -0,0 +1,49 @@
+"""
+Tablas de dimensión en memoria
+Nombres de productos, usuarios, localidades y lugares para completar filas
+(movimientos) sin hacer JOIN en cada consulta
+"""
+
+from app.db.conexion_DB import ConectDB
+from app.utils.cache import MISS, TTLCache
+
+# tabla -> consulta que carga la dimensión completa (la primera columna es el ID)
+_CONSULTAS = {
+    'productos': "SELECT id_producto, nombre, codigo FROM productos",
+    'usuarios': "SELECT id_usuario, nombre, apellido FROM usuarios",
+    'localidades': "SELECT id_localidad, nombre FROM localidades",
+    'lugares': "SELECT id_lugar, nombre FROM lugares",
+}
+
+# Una entrada por tabla: {id: {columna: valor}}
+_cache = TTLCache(maxsize=len(_CONSULTAS), ttl=300)
+
+
+def _cargar(tabla: str) -> dict:
+    """Leer la dimensión completa desde la base"""
+    with ConectDB.get_cursor(readonly=True) as cursor:
+        cursor.execute(_CONSULTAS[tabla])
+        id_col = cursor.column_names[0]
+        return {row[id_col]: row for row in cursor.fetchall()}
+
+
+def get_dimension(tabla: str, ids=()) -> dict:
+    """
+    Obtener la dimensión {id: fila} de una tabla
+
+    Si alguno de los ids pedidos no está (p. ej. un producto recién creado)
+    se vuelve a cargar la tabla. El dict devuelto no debe modificarse.
+    """
+    dimension = _cache.get(tabla)
+    if dimension is MISS or any(i is not None and i not in dimension for i in ids):
+        dimension = _cargar(tabla)
+        _cache.set(tabla, dimension)
+    return dimension
+
+
+def invalidar(tabla: str = None):
+    """Invalidar una dimensión (o todas) después de modificar la tabla"""
+    if tabla:
+        _cache.pop(tabla)
+    else:
+        _cache.clear()
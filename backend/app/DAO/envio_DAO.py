@@ -3,7 +3,160 @@ DAO de Envíos
 Maneja envíos de productos entre localidades
 """
 
+import logging
+
 from app.db.conexion_DB import ConectDB
+from app.utils.paginacion import PageResult, build_cursor
+
+logger = logging.getLogger(__name__)
+
+# Columnas del listado: todo menos las observaciones (TEXT), que solo se
+# devuelven en el detalle (get_by_id)
+_LIST_COLS = """
+    e.id_envio, e.id_producto, e.cantidad, e.estado,
+    e.id_usuario_envia, e.id_usuario_recibe,
+    e.localidad_origen, e.localidad_destino,
+    e.lugar_origen, e.lugar_destino,
+    e.fecha_envio, e.fecha_recepcion, e.fecha_cancelacion, e.motivo
+"""
+
+
+# Campos que necesita el servicio para mover el stock al recibir / cancelar
+_SELECT_PARA_ACTUALIZAR = """
+    SELECT id_envio, id_producto, cantidad, lugar_origen, localidad_destino
+    FROM envios
+    WHERE id_envio = %s
+"""
+
+# Nombres para mostrar: joins comunes al listado y al detalle
+_ENVIO_JOIN_COLS = """
+    p.nombre as producto_nombre,
+    p.codigo as producto_codigo,
+    ue.nombre as usuario_envia_nombre,
+    ue.apellido as usuario_envia_apellido,
+    ur.nombre as usuario_recibe_nombre,
+    ur.apellido as usuario_recibe_apellido,
+    lo_origen.nombre as localidad_origen_nombre,
+    lo_destino.nombre as localidad_destino_nombre,
+    lug_origen.nombre as lugar_origen_nombre,
+    lug_destino.nombre as lugar_destino_nombre
+"""
+
+_ENVIO_JOINS = """
+    JOIN productos p ON e.id_producto = p.id_producto
+    JOIN usuarios ue ON e.id_usuario_envia = ue.id_usuario
+    LEFT JOIN usuarios ur ON e.id_usuario_recibe = ur.id_usuario
+    JOIN localidades lo_origen ON e.localidad_origen = lo_origen.id_localidad
+    JOIN localidades lo_destino ON e.localidad_destino = lo_destino.id_localidad
+    JOIN lugares lug_origen ON e.lugar_origen = lug_origen.id_lugar
+    LEFT JOIN lugares lug_destino ON e.lugar_destino = lug_destino.id_lugar
+"""
+
+# Listado: producto y localidades salen de las columnas desnormalizadas
+# (*_snapshot), solo se unen usuarios y lugares
+_ENVIO_LIST_JOIN_COLS = """
+    e.producto_nombre_snapshot as producto_nombre,
+    e.producto_codigo_snapshot as producto_codigo,
+    ue.nombre as usuario_envia_nombre,
+    ue.apellido as usuario_envia_apellido,
+    ur.nombre as usuario_recibe_nombre,
+    ur.apellido as usuario_recibe_apellido,
+    e.localidad_origen_nombre_snapshot as localidad_origen_nombre,
+    e.localidad_destino_nombre_snapshot as localidad_destino_nombre,
+    lug_origen.nombre as lugar_origen_nombre,
+    lug_destino.nombre as lugar_destino_nombre
+"""
+
+_ENVIO_LIST_JOINS = """
+    JOIN usuarios ue ON e.id_usuario_envia = ue.id_usuario
+    LEFT JOIN usuarios ur ON e.id_usuario_recibe = ur.id_usuario
+    JOIN lugares lug_origen ON e.lugar_origen = lug_origen.id_lugar
+    LEFT JOIN lugares lug_destino ON e.lugar_destino = lug_destino.id_lugar
+"""
+
+# Detalle de un envío (todas las columnas + nombres actuales)
+_ENVIO_BASE_SELECT = f"""
+    SELECT e.*, {_ENVIO_JOIN_COLS}
+    FROM envios e
+    {_ENVIO_JOINS}
+"""
+
+_SELECT_BY_ID = _ENVIO_BASE_SELECT + " WHERE e.id_envio = %s"
+
+# Filtros del listado de envíos: (clave, condición SQL sobre la columna)
+_ENVIO_FILTERS = (
+    ('estado', 'estado = %s'),
+    ('localidad_origen', 'localidad_origen = %s'),
+    ('localidad_destino', 'localidad_destino = %s'),
+    ('id_producto', 'id_producto = %s'),
+    ('id_usuario_envia', 'id_usuario_envia = %s'),
+    ('id_usuario_recibe', 'id_usuario_recibe = %s'),
+)
+
+# SQL del listado ya armado por combinación de filtros: {(mascara, keyset): query}
+_ENVIO_LIST_SQL = {}
+
+
+def _build_envio_where(**valores) -> tuple:
+    """
+    Calcular la máscara de filtros informados y sus parámetros
+    
+    Returns:
+        tuple: (mascara, [params]) donde el bit i indica que se usa _ENVIO_FILTERS[i]
+    """
+    mascara = 0
+    params = []
+    for i, (clave, _) in enumerate(_ENVIO_FILTERS):
+        valor = valores.get(clave)
+        if valor:
+            mascara |= 1 << i
+            params.append(valor)
+    return mascara, params
+
+
+def _envio_list_sql(mascara: int, keyset: bool) -> str:
+    """
+    Obtener el SQL del listado para una combinación de filtros
+    
+    Se arma una sola vez por combinación, así el texto enviado a MySQL es
+    siempre idéntico para los mismos filtros.
+    """
+    key = (mascara, keyset)
+    query = _ENVIO_LIST_SQL.get(key)
+    if query is not None:
+        return query
+    
+    filtros = "".join(
+        f" AND {condicion}"
+        for i, (_, condicion) in enumerate(_ENVIO_FILTERS)
+        if mascara & (1 << i)
+    )
+    
+    # Deferred join: la subconsulta recorre solo el índice (fecha_envio, id)
+    # y los joins se hacen únicamente sobre las filas de la página.
+    # En modo página el total sale de la misma consulta con COUNT(*) OVER(),
+    # que se evalúa antes del LIMIT. En modo keyset no se calcula el total.
+    if keyset:
+        ids_query = (
+            "SELECT id_envio, NULL AS _total FROM envios WHERE 1=1" + filtros +
+            " AND (fecha_envio, id_envio) < (%s, %s)"
+            " ORDER BY fecha_envio DESC, id_envio DESC LIMIT %s"
+        )
+    else:
+        ids_query = (
+            "SELECT id_envio, COUNT(*) OVER() AS _total FROM envios WHERE 1=1" + filtros +
+            " ORDER BY fecha_envio DESC, id_envio DESC LIMIT %s OFFSET %s"
+        )
+    
+    query = f"""
+        SELECT {_LIST_COLS}, k._total, {_ENVIO_LIST_JOIN_COLS}
+        FROM ({ids_query}) k
+        JOIN envios e ON e.id_envio = k.id_envio
+        {_ENVIO_LIST_JOINS}
+        ORDER BY e.fecha_envio DESC, e.id_envio DESC
+    """
+    _ENVIO_LIST_SQL[key] = query
+    return query
 
 
 class EnvioDAO:
@@ -24,19 +177,31 @@ class EnvioDAO:
                 'lugar_origen': int,
                 'lugar_destino': int (opcional),
                 'motivo': str,
-                'observaciones_envio': str
+                'observaciones_envio': str,
+                'producto_nombre': str (opcional),
+                'producto_codigo': str (opcional),
+                'localidad_origen_nombre': str (opcional),
+                'localidad_destino_nombre': str (opcional)
             }
+        
+        Los nombres se guardan desnormalizados para el listado; si no se
+        informan se buscan en la misma sentencia.
         """
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor() as cursor:
                 query = """
                     INSERT INTO envios 
                     (id_producto, cantidad, id_usuario_envia, 
                      localidad_origen, localidad_destino, 
                      lugar_origen, lugar_destino, 
-                     estado, motivo, observaciones_envio)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, 'enviado', %s, %s)
+                     estado, motivo, observaciones_envio,
+                     producto_nombre_snapshot, producto_codigo_snapshot,
+                     localidad_origen_nombre_snapshot, localidad_destino_nombre_snapshot)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, 'enviado', %s, %s,
+                            COALESCE(%s, (SELECT nombre FROM productos WHERE id_producto = %s)),
+                            COALESCE(%s, (SELECT codigo FROM productos WHERE id_producto = %s)),
+                            COALESCE(%s, (SELECT nombre FROM localidades WHERE id_localidad = %s)),
+                            COALESCE(%s, (SELECT nombre FROM localidades WHERE id_localidad = %s)))
                 """
                 cursor.execute(query, (
                     data['id_producto'],
@@ -47,100 +212,68 @@ class EnvioDAO:
                     data['lugar_origen'],
                     data.get('lugar_destino'),
                     data.get('motivo', ''),
-                    data.get('observaciones_envio', '')
+                    data.get('observaciones_envio', ''),
+                    data.get('producto_nombre'), data['id_producto'],
+                    data.get('producto_codigo'), data['id_producto'],
+                    data.get('localidad_origen_nombre'), data['localidad_origen'],
+                    data.get('localidad_destino_nombre'), data['localidad_destino']
                 ))
                 return cursor.lastrowid
-        except Exception as e:
-            print(f"Error creating envio: {e}")
-            connection.rollback() # en caso de error, revierte la transacción
+        except Exception:
+            logger.exception("Error creating envio")
             raise
-        finally:
-            connection.close() #cierra la conexion
     
     @staticmethod
     def get_all(page=1, limit=20, estado=None, localidad_origen=None, 
-                localidad_destino=None, producto_id=None):
-        """Obtener todos los envíos con filtros"""
+                localidad_destino=None, producto_id=None, cursor=None,
+                usuario_envia=None, usuario_recibe=None) -> PageResult:
+        """
+        Obtener todos los envíos con filtros
+
+        Args:
+            cursor (tuple): (fecha_envio, id_envio) del último registro de la
+                página anterior. Si se envía, se pagina por keyset y se ignora page.
+        """
         try:
             connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
-                # Contar total
-                count_query = "SELECT COUNT(*) as total FROM envios WHERE 1=1"
-                params = []
-                
-                if estado:
-                    count_query += " AND estado = %s"
-                    params.append(estado)
-                
-                if localidad_origen:
-                    count_query += " AND localidad_origen = %s"
-                    params.append(localidad_origen)
+            with connection.cursor(dictionary=True) as db_cursor:
+                # Filtros comunes (sobre la tabla base, sin joins)
+                mascara, params = _build_envio_where(
+                    estado=estado,
+                    localidad_origen=localidad_origen,
+                    localidad_destino=localidad_destino,
+                    id_producto=producto_id,
+                    id_usuario_envia=usuario_envia,
+                    id_usuario_recibe=usuario_recibe
+                )
                 
-                if localidad_destino:
-                    count_query += " AND localidad_destino = %s"
-                    params.append(localidad_destino)
+                # Keyset: seguir desde el último registro sin recorrer el offset
+                if cursor:
+                    params.extend(cursor)
+                    params.append(limit)
+                else:
+                    params.extend([limit, (page - 1) * limit])
                 
-                if producto_id:
-                    count_query += " AND id_producto = %s"
-                    params.append(producto_id)
+                query = _envio_list_sql(mascara, bool(cursor))
+                db_cursor.execute(query, params)
+                envios = db_cursor.fetchall()
+                total = envios[0]['_total'] if envios else (None if cursor else 0)
                 
-                cursor.execute(count_query, params)
-                total = cursor.fetchone()['total']
+                for envio in envios:
+                    del envio['_total']
                 
-                # Obtener registros
-                offset = (page - 1) * limit
-                query = """
-                    SELECT e.*,
-                           p.nombre as producto_nombre,
-                           p.codigo as producto_codigo,
-                           ue.nombre as usuario_envia_nombre,
-                           ue.apellido as usuario_envia_apellido,
-                           ur.nombre as usuario_recibe_nombre,
-                           ur.apellido as usuario_recibe_apellido,
-                           lo_origen.nombre as localidad_origen_nombre,
-                           lo_destino.nombre as localidad_destino_nombre,
-                           lug_origen.nombre as lugar_origen_nombre,
-                           lug_destino.nombre as lugar_destino_nombre
-                    FROM envios e
-                    JOIN productos p ON e.id_producto = p.id_producto
-                    JOIN usuarios ue ON e.id_usuario_envia = ue.id_usuario
-                    LEFT JOIN usuarios ur ON e.id_usuario_recibe = ur.id_usuario
-                    JOIN localidades lo_origen ON e.localidad_origen = lo_origen.id_localidad
-                    JOIN localidades lo_destino ON e.localidad_destino = lo_destino.id_localidad
-                    JOIN lugares lug_origen ON e.lugar_origen = lug_origen.id_lugar
-                    LEFT JOIN lugares lug_destino ON e.lugar_destino = lug_destino.id_lugar
-                    WHERE 1=1
-                """
-                
-                if estado:
-                    query += " AND e.estado = %s"
-                
-                if localidad_origen:
-                    query += " AND e.localidad_origen = %s"
-                
-                if localidad_destino:
-                    query += " AND e.localidad_destino = %s"
-                
-                if producto_id:
-                    query += " AND e.id_producto = %s"
-                
-                query += " ORDER BY e.fecha_envio DESC LIMIT %s OFFSET %s"
-                params.extend([limit, offset])
+                ultimo = envios[-1] if len(envios) == limit else None
                 
-                cursor.execute(query, params)
-                envios = cursor.fetchall()
-                
-                return {
-                    'envios': envios,
-                    'pagination': {
-                        'page': page,
-                        'limit': limit,
-                        'total': total,
-                        'total_pages': (total + limit - 1) // limit
-                    }
-                }
-        except Exception as e:
-            print(f"Error getting envios: {e}")
+                return PageResult(
+                    key='envios',
+                    rows=envios,
+                    page=page,
+                    limit=limit,
+                    total=total,
+                    next_cursor=build_cursor(ultimo['fecha_envio'], ultimo['id_envio']) if ultimo else None
+                )
+        except Exception:
+            logger.exception("Error getting envios")
             raise
         finally:
             connection.close() #cierra la conexion
@@ -150,33 +283,11 @@ class EnvioDAO:
         """Obtener un envío por ID"""
         try:
             connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
-                query = """
-                    SELECT e.*,
-                           p.nombre as producto_nombre,
-                           p.codigo as producto_codigo,
-                           ue.nombre as usuario_envia_nombre,
-                           ue.apellido as usuario_envia_apellido,
-                           ur.nombre as usuario_recibe_nombre,
-                           ur.apellido as usuario_recibe_apellido,
-                           lo_origen.nombre as localidad_origen_nombre,
-                           lo_destino.nombre as localidad_destino_nombre,
-                           lug_origen.nombre as lugar_origen_nombre,
-                           lug_destino.nombre as lugar_destino_nombre
-                    FROM envios e
-                    JOIN productos p ON e.id_producto = p.id_producto
-                    JOIN usuarios ue ON e.id_usuario_envia = ue.id_usuario
-                    LEFT JOIN usuarios ur ON e.id_usuario_recibe = ur.id_usuario
-                    JOIN localidades lo_origen ON e.localidad_origen = lo_origen.id_localidad
-                    JOIN localidades lo_destino ON e.localidad_destino = lo_destino.id_localidad
-                    JOIN lugares lug_origen ON e.lugar_origen = lug_origen.id_lugar
-                    LEFT JOIN lugares lug_destino ON e.lugar_destino = lug_destino.id_lugar
-                    WHERE e.id_envio = %s
-                """
-                cursor.execute(query, (envio_id,))
+            with connection.cursor(dictionary=True) as cursor:
+                cursor.execute(_SELECT_BY_ID, (envio_id,))
                 return cursor.fetchone()
-        except Exception as e:
-            print(f"Error getting envio by id: {e}")
+        except Exception:
+            logger.exception("Error getting envio by id")
             raise
         finally:
             connection.close() #cierra la conexion
@@ -200,26 +311,38 @@ class EnvioDAO:
                 """
                 cursor.execute(query, (localidad_destino,))
                 return cursor.fetchall()
-        except Exception as e:
-            print(f"Error getting pendientes recepcion: {e}")
+        except Exception:
+            logger.exception("Error getting pendientes recepcion")
             raise
         finally:
             connection.close() #cierra la conexion
     
     @staticmethod
-    def marcar_recibido(envio_id: int, usuario_recibe_id: int, lugar_destino_id: int, observaciones: str = '') -> bool:
+    def marcar_recibido(envio_id: int, usuario_recibe_id: int, lugar_destino_id: int, observaciones: str = '') -> dict:
         """
         Marcar un envío como recibido
         
+        Bloquea la fila (SELECT ... FOR UPDATE) y la actualiza en la misma
+        transacción, así dos recepciones simultáneas no pueden sumar stock dos veces.
+        
         Args:
             envio_id: ID del envío
             usuario_recibe_id: ID del usuario que recibe
             lugar_destino_id: ID del lugar donde se recibe
             observaciones: Observaciones de recepción
+        
+        Returns:
+            dict: {'id_envio', 'id_producto', 'cantidad', 'lugar_origen',
+                   'localidad_destino'} del envío recibido, o None si no estaba
+                   pendiente
         """
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor() as cursor:
+                cursor.execute(_SELECT_PARA_ACTUALIZAR + " AND estado IN ('enviado', 'en_transito') FOR UPDATE", (envio_id,))
+                envio = cursor.fetchone()
+                if not envio:
+                    return None
+                
                 query = """
                     UPDATE envios 
                     SET estado = 'recibido',
@@ -227,63 +350,64 @@ class EnvioDAO:
                         lugar_destino = %s,
                         fecha_recepcion = NOW(),
                         observaciones_recepcion = %s
-                    WHERE id_envio = %s AND estado IN ('enviado', 'en_transito')
+                    WHERE id_envio = %s
                 """
                 cursor.execute(query, (usuario_recibe_id, lugar_destino_id, observaciones, envio_id))
-                return cursor.rowcount > 0
-        except Exception as e:
-            print(f"Error marcando recibido: {e}")
-            connection.rollback() # en caso de error, revierte la transacción
+                return envio
+        except Exception:
+            logger.exception("Error marcando recibido")
             raise
-        finally:
-            connection.close() #cierra la conexion
     
     @staticmethod
-    def cancelar(envio_id: int, observaciones: str = '') -> bool:
-        """Cancelar un envío"""
+    def cancelar(envio_id: int, observaciones: str = '') -> dict:
+        """
+        Cancelar un envío
+        
+        Bloquea la fila y la actualiza en la misma transacción.
+        
+        Returns:
+            dict: {'id_envio', 'id_producto', 'cantidad', 'lugar_origen',
+                   'localidad_destino'} del envío cancelado, o None si ya estaba
+                   recibido o no existe
+        """
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor() as cursor:
+                cursor.execute(_SELECT_PARA_ACTUALIZAR + " AND estado NOT IN ('recibido', 'cancelado') FOR UPDATE", (envio_id,))
+                envio = cursor.fetchone()
+                if not envio:
+                    return None
+                
                 query = """
                     UPDATE envios 
                     SET estado = 'cancelado',
                         fecha_cancelacion = NOW(),
                         observaciones_cancelacion = %s
-                    WHERE id_envio = %s AND estado != 'recibido'
+                    WHERE id_envio = %s
                 """
                 cursor.execute(query, (observaciones, envio_id))
-                return cursor.rowcount > 0
-        except Exception as e:
-            print(f"Error cancelando envio: {e}")
-            connection.rollback() # en caso de error, revierte la transacción
+                return envio
+        except Exception:
+            logger.exception("Error cancelando envio")
             raise
-        finally:
-            connection.close() #cierra la conexion
     
     @staticmethod
     def update_estado(envio_id: int, nuevo_estado: str) -> bool:
         """Actualizar estado del envío"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor() as cursor:
                 query = "UPDATE envios SET estado = %s WHERE id_envio = %s"
                 cursor.execute(query, (nuevo_estado, envio_id))
                 return cursor.rowcount > 0
-        except Exception as e:
-            print(f"Error updating estado: {e}")
-            connection.rollback() # en caso de error, revierte la transacción
+        except Exception:
+            logger.exception("Error updating estado")
             raise
-        finally:
-            connection.close() #cierra la conexion
     
     @staticmethod
     def get_por_usuario_envia(usuario_id: int) -> list:
         """Obtener envíos realizados por un usuario"""
-        result = EnvioDAO.get_all(page=1, limit=100)
-        return [e for e in result['envios'] if e['id_usuario_envia'] == usuario_id]
+        return EnvioDAO.get_all(page=1, limit=100, usuario_envia=usuario_id).rows
     
     @staticmethod
     def get_por_usuario_recibe(usuario_id: int) -> list:
         """Obtener envíos recibidos por un usuario"""
-        result = EnvioDAO.get_all(page=1, limit=100)
-        return [e for e in result['envios'] if e.get('id_usuario_recibe') == usuario_id]
\ No newline at end of file
+        return EnvioDAO.get_all(page=1, limit=100, usuario_recibe=usuario_id).rows
\ No newline at end of file
@@ -3,7 +3,38 @@ DAO de Localidades
 Maneja operaciones de base de datos para localidades de Río Negro
 """
 
+import logging
+from collections import defaultdict
+
 from app.db.conexion_DB import ConectDB
+from app.DAO import dimensiones
+from app.utils.cache import TTLCache, cached, limpiar_cache_request, request_memoize
+from app.utils.sql import in_params
+
+logger = logging.getLogger(__name__)
+
+_INSERT_LOCALIDAD = """
+    INSERT INTO localidades 
+    (nombre, descripcion, direccion, ciudad, codigo_postal, activo)
+    VALUES (%s, %s, %s, %s, %s, 1)
+"""
+
+# Columnas que se devuelven (sin created_at / updated_at, que nadie usa)
+_LOCALIDAD_COLS = "id_localidad, nombre, descripcion, direccion, ciudad, codigo_postal, activo, num_lugares"
+_LUGAR_COLS = "id_lugar, nombre, descripcion, tipo, id_localidad, activo"
+
+# Las localidades casi no cambian: se cachean y se invalidan al escribir
+_cache = TTLCache(maxsize=256, ttl=60)
+# El conteo de lugares lo modifica LugarDAO (vía triggers): TTL corto
+_count_cache = TTLCache(maxsize=256, ttl=10)
+
+
+def _invalidar_cache():
+    """Invalidar el cache de localidades"""
+    _cache.clear()
+    _count_cache.clear()
+    dimensiones.invalidar('localidades')
+    limpiar_cache_request()
 
 
 class LocalidadDAO:
@@ -24,34 +55,27 @@ class LocalidadDAO:
             }
         """
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
-                query = """
-                    INSERT INTO localidades 
-                    (nombre, descripcion, direccion, ciudad, codigo_postal, activo)
-                    VALUES (%s, %s, %s, %s, %s, 1)
-                """
-                cursor.execute(query, (
+            with ConectDB.get_cursor() as cursor:
+                cursor.execute(_INSERT_LOCALIDAD, (
                     data['nombre'],
                     data.get('descripcion', ''),
                     data.get('direccion', ''),
                     data.get('ciudad', ''),
                     data.get('codigo_postal', '')
                 ))
-                return cursor.lastrowid
-        except Exception as e:
-            print(f"Error creating localidad: {e}")
-            connection.rollback() # en caso de error, revierte la transacción
+                localidad_id = cursor.lastrowid
+            _invalidar_cache()
+            return localidad_id
+        except Exception:
+            logger.exception("Error creating localidad")
             raise
-        finally:
-            connection.close() #cierra la conexion
     
     @staticmethod
+    @cached(_cache)
     def get_all(activo=None) -> dict:
         """Obtener todas las localidades"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor(dictionary=True) as cursor:
+            with ConectDB.get_cursor(readonly=True) as cursor:
                 query = "SELECT id_localidad, nombre FROM localidades WHERE 1=1"
                 params = []
                 
@@ -62,78 +86,98 @@ class LocalidadDAO:
                 query += " ORDER BY nombre"
                 cursor.execute(query, params)
                 return cursor.fetchall()
-        except Exception as e:
-            print(f"Error getting localidades: {e}")
+        except Exception:
+            logger.exception("Error getting localidades")
             raise
-        finally:
-            connection.close() #cierra la conexion
     
     @staticmethod
+    @request_memoize
+    @cached(_cache)
     def get_by_id(localidad_id: int) -> dict:
         """Obtener localidad por ID"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
-                query = "SELECT * FROM localidades WHERE id_localidad = %s"
+            with ConectDB.get_cursor(readonly=True) as cursor:
+                query = f"SELECT {_LOCALIDAD_COLS} FROM localidades WHERE id_localidad = %s"
                 cursor.execute(query, (localidad_id,))
                 return cursor.fetchone()
-        except Exception as e:
-            print(f"Error getting localidad by id: {e}")
+        except Exception:
+            logger.exception("Error getting localidad by id")
             raise
-        finally:
-            connection.close() #cierra la conexion
     
     @staticmethod
+    @cached(_cache)
     def get_by_nombre(nombre: str) -> dict:
         """Obtener localidad por nombre"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor(dictionary=True) as cursor:
-                query = "SELECT * FROM localidades WHERE nombre = %s"
+            with ConectDB.get_cursor(readonly=True) as cursor:
+                query = f"SELECT {_LOCALIDAD_COLS} FROM localidades WHERE nombre = %s"
                 cursor.execute(query, (nombre,))
                 return cursor.fetchone()
-        except Exception as e:
-            print(f"Error getting localidad by nombre: {e}")
+        except Exception:
+            logger.exception("Error getting localidad by nombre")
             raise
-        finally:
-            connection.close() #cierra la conexion
     
     @staticmethod
     def get_con_lugares(localidad_id: int) -> dict:
         """Obtener localidad con sus lugares"""
+        localidades = LocalidadDAO.get_con_lugares_bulk([localidad_id])
+        return localidades[0] if localidades else None
+    
+    @staticmethod
+    def get_con_lugares_bulk(localidad_ids: list) -> list:
+        """
+        Obtener varias localidades con sus lugares
+        
+        Siempre son 2 consultas, sin importar cuántas localidades se pidan.
+        
+        Args:
+            localidad_ids (list): IDs de las localidades
+        
+        Returns:
+            list: Localidades (en el orden de localidad_ids) con la clave 'lugares'
+        """
+        if not localidad_ids:
+            return []
+        
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
-                # Obtener localidad
-                query_loc = "SELECT * FROM localidades WHERE id_localidad = %s"
-                cursor.execute(query_loc, (localidad_id,))
-                localidad = cursor.fetchone()
+            with ConectDB.get_cursor(readonly=True) as cursor:
+                placeholders, params = in_params(localidad_ids)
                 
-                if not localidad:
-                    return None
+                # Obtener localidades
+                cursor.execute(
+                    f"SELECT {_LOCALIDAD_COLS} FROM localidades WHERE id_localidad IN ({placeholders})",
+                    params
+                )
+                por_id = {loc['id_localidad']: loc for loc in cursor.fetchall()}
                 
-                # Obtener lugares de esta localidad
-                query_lugares = """
-                    SELECT * FROM lugares 
-                    WHERE id_localidad = %s AND activo = 1
-                    ORDER BY nombre
+                # Obtener lugares de todas las localidades
+                query_lugares = f"""
+                    SELECT {_LUGAR_COLS} FROM lugares 
+                    WHERE id_localidad IN ({placeholders}) AND activo = 1
+                    ORDER BY id_localidad, nombre
                 """
-                cursor.execute(query_lugares, (localidad_id,))
-                localidad['lugares'] = cursor.fetchall()
+                cursor.execute(query_lugares, params)
                 
-                return localidad
-        except Exception as e:
-            print(f"Error getting localidad con lugares: {e}")
+                lugares = defaultdict(list)
+                for lugar in cursor.fetchall():
+                    lugares[lugar['id_localidad']].append(lugar)
+                
+                resultado = []
+                for localidad_id in localidad_ids:
+                    localidad = por_id.get(localidad_id)
+                    if localidad:
+                        localidad['lugares'] = lugares[localidad_id]
+                        resultado.append(localidad)
+                return resultado
+        except Exception:
+            logger.exception("Error getting localidades con lugares")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def update(localidad_id: int, data: dict) -> bool:
         """Actualizar localidad"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor() as cursor:
                 fields = []
                 values = []
                 
@@ -148,70 +192,83 @@ class LocalidadDAO:
                 values.append(localidad_id)
                 query = f"UPDATE localidades SET {', '.join(fields)} WHERE id_localidad = %s"
                 cursor.execute(query, values)
-                return cursor.rowcount > 0
-        except Exception as e:
-            print(f"Error updating localidad: {e}")
+                actualizado = cursor.rowcount > 0
+                
+                # Propagar el renombre a los nombres desnormalizados de envios
+                if actualizado and 'nombre' in data:
+                    cursor.execute(
+                        "UPDATE envios SET localidad_origen_nombre_snapshot = %s WHERE localidad_origen = %s",
+                        (data['nombre'], localidad_id)
+                    )
+                    cursor.execute(
+                        "UPDATE envios SET localidad_destino_nombre_snapshot = %s WHERE localidad_destino = %s",
+                        (data['nombre'], localidad_id)
+                    )
+            _invalidar_cache()
+            return actualizado
+        except Exception:
+            logger.exception("Error updating localidad")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def delete(localidad_id: int) -> bool:
         """Eliminar (soft delete) localidad"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor() as cursor:
                 query = "UPDATE localidades SET activo = 0 WHERE id_localidad = %s"
                 cursor.execute(query, (localidad_id,))
-                return cursor.rowcount > 0
-        except Exception as e:
-            print(f"Error deleting localidad: {e}")
+                eliminado = cursor.rowcount > 0
+            _invalidar_cache()
+            return eliminado
+        except Exception:
+            logger.exception("Error deleting localidad")
             raise
     
     @staticmethod
+    @cached(_cache)
     def exists_nombre(nombre: str, exclude_id: int = None) -> bool:
         """Verificar si existe una localidad con ese nombre"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
-                query = "SELECT COUNT(*) as count FROM localidades WHERE nombre = %s"
+            with ConectDB.get_cursor(readonly=True) as cursor:
+                # Alcanza con la primera coincidencia (índice único sobre nombre)
+                query = "SELECT 1 FROM localidades WHERE nombre = %s"
                 params = [nombre]
                 
                 if exclude_id:
-                    query += " AND id_localidad != %s"
+                    query += " AND id_localidad <> %s"
                     params.append(exclude_id)
                 
-                cursor.execute(query, params)
-                result = cursor.fetchone()
-                return result['count'] > 0
-        except Exception as e:
-            print(f"Error checking nombre: {e}")
+                cursor.execute(query + " LIMIT 1", params)
+                return cursor.fetchone() is not None
+        except Exception:
+            logger.exception("Error checking nombre")
             raise
     
     @staticmethod
+    @cached(_count_cache)
     def count_lugares(localidad_id: int) -> int:
-        """Contar lugares de una localidad"""
+        """
+        Contar lugares activos de una localidad
+        
+        Lee el contador localidades.num_lugares, que mantienen los triggers
+        sobre lugares (ver init_db_aguas_rionegrinas.py).
+        """
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
-                query = """
-                    SELECT COUNT(*) as count 
-                    FROM lugares 
-                    WHERE id_localidad = %s AND activo = 1
-                """
+            with ConectDB.get_cursor(readonly=True) as cursor:
+                query = "SELECT num_lugares FROM localidades WHERE id_localidad = %s"
                 cursor.execute(query, (localidad_id,))
                 result = cursor.fetchone()
-                return result['count']
-        except Exception as e:
-            print(f"Error counting lugares: {e}")
+                return result['num_lugares'] if result else 0
+        except Exception:
+            logger.exception("Error counting lugares")
             raise
 
     @staticmethod
+    @request_memoize
     def validar_lugar_localidad(lugar_id: int, localidad_id: int) -> bool:
         """Validar que un lugar pertenece a una localidad"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor(readonly=True) as cursor:
                 query = """
                     SELECT COUNT(*) as count 
                     FROM lugares 
@@ -220,23 +277,22 @@ class LocalidadDAO:
                 cursor.execute(query, (lugar_id, localidad_id))
                 result = cursor.fetchone()
                 return result['count'] > 0
-        except Exception as e:
-            print(f"Error validating lugar-localidad: {e}")
+        except Exception:
+            logger.exception("Error validating lugar-localidad")
             raise
         
     @staticmethod
     def lugares_en_localidad(id_localidad: int) -> dict:
         """Obtener todos los lugares de una localidad"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor(dictionary=True) as cursor:
-                query = """
-                    SELECT * FROM lugares 
+            with ConectDB.get_cursor(readonly=True) as cursor:
+                query = f"""
+                    SELECT {_LUGAR_COLS} FROM lugares 
                     WHERE id_localidad = %s AND activo = 1
                 """
                 cursor.execute(query, ( id_localidad,))
                 result = cursor.fetchall()
                 return result
-        except Exception as e:
-            print(f"Error obteniendo lugares de la localidad: {e}")
+        except Exception:
+            logger.exception("Error obteniendo lugares de la localidad")
             raise
\ No newline at end of file
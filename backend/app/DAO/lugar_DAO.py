@@ -3,7 +3,25 @@ DAO de Lugares
 Maneja operaciones de lugares físicos dentro de localidades
 """
 
+import logging
+
 from app.db.conexion_DB import ConectDB
+from app.DAO import dimensiones
+from app.utils.cache import limpiar_cache_request, request_memoize
+
+logger = logging.getLogger(__name__)
+
+_INSERT_LUGAR = """
+    INSERT INTO lugares 
+    (nombre, descripcion, tipo, id_localidad, activo)
+    VALUES (%s, %s, %s, %s, 1)
+"""
+
+# Filas por lectura en los métodos que recorren el resultado (iter_*)
+_FETCH_BATCH = 256
+
+# Columnas que se devuelven (sin created_at / updated_at, que nadie usa)
+_LUGAR_COLS = "l.id_lugar, l.nombre, l.descripcion, l.tipo, l.id_localidad, l.activo"
 
 
 class LugarDAO:
@@ -23,35 +41,25 @@ class LugarDAO:
             }
         """
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
-                query = """
-                    INSERT INTO lugares 
-                    (nombre, descripcion, tipo, id_localidad, activo)
-                    VALUES (%s, %s, %s, %s, 1)
-                """
-                cursor.execute(query, (
+            with ConectDB.get_cursor() as cursor:
+                cursor.execute(_INSERT_LUGAR, (
                     data['nombre'],
                     data.get('descripcion', ''),
                     data.get('tipo', 'almacen'),
                     data['id_localidad']
                 ))
                 return cursor.lastrowid
-        except Exception as e:
-            print(f"Error creating lugar: {e}")
-            connection.rollback()
+        except Exception:
+            logger.exception("Error creating lugar")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def get_all(localidad_id=None, tipo=None, activo=None):
         """Obtener todos los lugares con filtros"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
-                query = """
-                    SELECT l.*, loc.nombre as localidad_nombre, loc.ciudad
+            with ConectDB.get_cursor(readonly=True) as cursor:
+                query = f"""
+                    SELECT {_LUGAR_COLS}, loc.nombre as localidad_nombre, loc.ciudad
                     FROM lugares l
                     JOIN localidades loc ON l.id_localidad = loc.id_localidad
                     WHERE 1=1
@@ -73,39 +81,34 @@ class LugarDAO:
                 query += " ORDER BY loc.nombre, l.nombre"
                 cursor.execute(query, params)
                 return cursor.fetchall()
-        except Exception as e:
-            print(f"Error getting lugares: {e}")
+        except Exception:
+            logger.exception("Error getting lugares")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
+    @request_memoize
     def get_by_id(lugar_id: int) -> dict:
         """Obtener lugar por ID"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
-                query = """
-                    SELECT l.*, loc.nombre as localidad_nombre
+            with ConectDB.get_cursor(readonly=True) as cursor:
+                query = f"""
+                    SELECT {_LUGAR_COLS}, loc.nombre as localidad_nombre
                     FROM lugares l
                     JOIN localidades loc ON l.id_localidad = loc.id_localidad
                     WHERE l.id_lugar = %s
                 """
                 cursor.execute(query, (lugar_id,))
                 return cursor.fetchone()
-        except Exception as e:
-            print(f"Error getting lugar by id: {e}")
+        except Exception:
+            logger.exception("Error getting lugar by id")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def get_by_localidad(localidad_id: int, activo=True) -> list:
         """Obtener todos los lugares de una localidad"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
-                query = "SELECT * FROM lugares WHERE id_localidad = %s"
+            with ConectDB.get_cursor(readonly=True) as cursor:
+                query = f"SELECT {_LUGAR_COLS} FROM lugares l WHERE id_localidad = %s"
                 params = [localidad_id]
                 
                 if activo is not None:
@@ -115,18 +118,15 @@ class LugarDAO:
                 query += " ORDER BY tipo, nombre"
                 cursor.execute(query, params)
                 return cursor.fetchall()
-        except Exception as e:
-            print(f"Error getting lugares by localidad: {e}")
+        except Exception:
+            logger.exception("Error getting lugares by localidad")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def update(lugar_id: int, data: dict) -> bool:
         """Actualizar lugar"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor() as cursor:
                 fields = []
                 values = []
                 
@@ -141,47 +141,62 @@ class LugarDAO:
                 values.append(lugar_id)
                 query = f"UPDATE lugares SET {', '.join(fields)} WHERE id_lugar = %s"
                 cursor.execute(query, values)
-                return cursor.rowcount > 0
-        except Exception as e:
-            print(f"Error updating lugar: {e}")
-            connection.rollback()
+                actualizado = cursor.rowcount > 0
+            dimensiones.invalidar('lugares')
+            limpiar_cache_request()
+            return actualizado
+        except Exception:
+            logger.exception("Error updating lugar")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def delete(lugar_id: int) -> bool:
         """Eliminar (soft delete) lugar"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor() as cursor:
                 query = "UPDATE lugares SET activo = 0 WHERE id_lugar = %s"
                 cursor.execute(query, (lugar_id,))
-                return cursor.rowcount > 0
-        except Exception as e:
-            print(f"Error deleting lugar: {e}")
-            connection.rollback()
+                eliminado = cursor.rowcount > 0
+            limpiar_cache_request()
+            return eliminado
+        except Exception:
+            logger.exception("Error deleting lugar")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def get_stock_en_lugar(lugar_id: int) -> list:
         """Obtener todos los productos con stock en un lugar"""
+        return list(LugarDAO.iter_stock_en_lugar(lugar_id))
+    
+    @staticmethod
+    def iter_stock_en_lugar(lugar_id: int):
+        """
+        Recorrer los productos con stock en un lugar sin cargarlos enteros
+        
+        Usa un cursor sin buffer y trae las filas de a _FETCH_BATCH. La conexión
+        vuelve al pool al agotar (o cerrar) el generador.
+        
+        Yields:
+            dict: stock del producto en el lugar
+        """
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor(readonly=True) as cursor:
                 query = """
-                    SELECT pl.*, p.nombre as producto_nombre, p.codigo as producto_codigo
+                    SELECT pl.id_producto, pl.id_localidad, pl.id_lugar, pl.cantidad,
+                           p.nombre as producto_nombre, p.codigo as producto_codigo
                     FROM productos_localidad pl
                     JOIN productos p ON pl.id_producto = p.id_producto
                     WHERE pl.id_lugar = %s AND pl.cantidad > 0
                     ORDER BY p.nombre
                 """
                 cursor.execute(query, (lugar_id,))
-                return cursor.fetchall()
-        except Exception as e:
-            print(f"Error getting stock en lugar: {e}")
+                
+                while True:
+                    rows = cursor.fetchmany(_FETCH_BATCH)
+                    if not rows:
+                        break
+                    
+                    yield from rows
+        except Exception:
+            logger.exception("Error getting stock en lugar")
             raise
-        finally:
-            connection.close()
\ No newline at end of file
@@ -3,7 +3,180 @@ DAO de Movimientos
 Registra entradas, salidas, transferencias y ajustes de stock
 """
 
+import logging
+from collections import namedtuple
+
 from app.db.conexion_DB import ConectDB
+from app.DAO.dimensiones import get_dimension
+from app.utils.paginacion import PageResult, build_cursor
+
+logger = logging.getLogger(__name__)
+
+# Sentencia de alta (compartida por create y create_bulk)
+_INSERT_MOVIMIENTO = """
+    INSERT INTO movimientos 
+    (tipo, cantidad, id_producto, id_usuario, id_localidad,
+     lugar_origen, lugar_destino, motivo, observaciones)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+# Filas por sentencia en create_bulk (mantiene el INSERT lejos de max_allowed_packet)
+_BULK_BATCH = 500
+
+# Filas por lectura en los métodos que recorren el resultado (iter_*)
+_FETCH_BATCH = 256
+
+# Columnas de movimientos que se devuelven
+_MOVIMIENTO_CAMPOS = (
+    'id_movimiento', 'tipo', 'cantidad', 'id_producto', 'id_usuario',
+    'id_localidad', 'lugar_origen', 'lugar_destino', 'motivo',
+    'observaciones', 'fecha_hora'
+)
+_MOVIMIENTO_COLS = ", ".join(f"m.{campo}" for campo in _MOVIMIENTO_CAMPOS)
+
+# Nombres que se completan desde las dimensiones
+_NOMBRE_CAMPOS = (
+    'producto_nombre', 'producto_codigo', 'usuario_nombre', 'usuario_apellido',
+    'localidad_nombre', 'lugar_origen_nombre', 'lugar_destino_nombre'
+)
+
+# Fila liviana del listado (tupla, sin dict por fila); se convierte a dict
+# recién al serializar (PageResult.to_dict)
+Movimiento = namedtuple('Movimiento', _MOVIMIENTO_CAMPOS + _NOMBRE_CAMPOS)
+
+# Listado con filtros fijos: cada filtro recibe su valor dos veces y queda
+# desactivado si es NULL, así el texto de la consulta no cambia según los
+# filtros y MySQL la parsea una sola vez.
+# Índices (filtro, fecha_hora) en movimientos: el ORDER BY se resuelve leyendo
+# el índice hacia atrás. get_by_producto/usuario/localidad usan esta consulta.
+# Sin JOINs: los nombres se completan desde las dimensiones en memoria.
+_SELECT_MOVIMIENTOS_BASE = """
+    SELECT {cols}, {total} as _total
+    FROM movimientos m
+    WHERE (%s IS NULL OR m.tipo = %s)
+      AND (%s IS NULL OR m.id_producto = %s)
+      AND (%s IS NULL OR m.id_usuario = %s)
+      AND (%s IS NULL OR m.id_localidad = %s)
+      AND (%s IS NULL OR m.fecha_hora >= %s)
+      AND (%s IS NULL OR m.fecha_hora <= %s)
+"""
+
+# Paginación por página (deprecada): total con COUNT(*) OVER(), que se evalúa
+# antes del LIMIT
+_SELECT_MOVIMIENTOS = _SELECT_MOVIMIENTOS_BASE.format(cols=_MOVIMIENTO_COLS, total="COUNT(*) OVER()") + """
+    ORDER BY m.fecha_hora DESC, m.id_movimiento DESC
+    LIMIT %s OFFSET %s
+"""
+
+# Paginación por keyset: sigue desde el último registro sin recorrer el
+# offset y sin calcular el total
+_SELECT_MOVIMIENTOS_KEYSET = _SELECT_MOVIMIENTOS_BASE.format(cols=_MOVIMIENTO_COLS, total="NULL") + """
+      AND (m.fecha_hora, m.id_movimiento) < (%s, %s)
+    ORDER BY m.fecha_hora DESC, m.id_movimiento DESC
+    LIMIT %s
+"""
+
+_COUNT_POR_TIPO = """
+    SELECT tipo, COUNT(*) AS c, CAST(SUM(cantidad) AS SIGNED) AS t
+    FROM movimientos
+    WHERE (%s IS NULL OR fecha_hora >= %s)
+      AND (%s IS NULL OR fecha_hora <= %s)
+    GROUP BY tipo
+"""
+
+
+def _insert_params(data: dict) -> tuple:
+    """Valores del INSERT de un movimiento"""
+    return (
+        data['tipo'],
+        data['cantidad'],
+        data['id_producto'],
+        data['id_usuario'],
+        data['id_localidad'],
+        data.get('lugar_origen'),
+        data.get('lugar_destino'),
+        data.get('motivo', ''),
+        data.get('observaciones', '')
+    )
+
+
+def _cargar_dimensiones(id_productos, id_usuarios, id_localidades, id_lugares) -> tuple:
+    """Obtener las dimensiones que necesitan las filas (productos, usuarios, localidades, lugares)"""
+    return (
+        get_dimension('productos', id_productos),
+        get_dimension('usuarios', id_usuarios),
+        get_dimension('localidades', id_localidades),
+        get_dimension('lugares', id_lugares),
+    )
+
+
+def _nombres(dimensiones: tuple, id_producto, id_usuario, id_localidad,
+             lugar_origen, lugar_destino) -> tuple:
+    """Nombres de un movimiento, en el orden de _NOMBRE_CAMPOS"""
+    productos, usuarios, localidades, lugares = dimensiones
+    vacio = {}
+    producto = productos.get(id_producto, vacio)
+    usuario = usuarios.get(id_usuario, vacio)
+    return (
+        producto.get('nombre'),
+        producto.get('codigo'),
+        usuario.get('nombre'),
+        usuario.get('apellido'),
+        localidades.get(id_localidad, vacio).get('nombre'),
+        lugares.get(lugar_origen, vacio).get('nombre'),
+        lugares.get(lugar_destino, vacio).get('nombre'),
+    )
+
+
+def _completar_nombres(movimientos: list) -> list:
+    """Agregar los nombres de producto, usuario, localidad y lugares a cada fila (dict)"""
+    if not movimientos:
+        return movimientos
+    
+    dimensiones = _cargar_dimensiones(
+        {m['id_producto'] for m in movimientos},
+        {m['id_usuario'] for m in movimientos},
+        {m['id_localidad'] for m in movimientos},
+        {m['lugar_origen'] for m in movimientos} | {m['lugar_destino'] for m in movimientos}
+    )
+    
+    for m in movimientos:
+        m.update(zip(_NOMBRE_CAMPOS, _nombres(
+            dimensiones, m['id_producto'], m['id_usuario'], m['id_localidad'],
+            m['lugar_origen'], m['lugar_destino']
+        )))
+    return movimientos
+
+
+def _a_movimientos(filas: list) -> list:
+    """
+    Convertir filas de un cursor de tuplas (columnas de _MOVIMIENTO_CAMPOS)
+    en Movimiento con los nombres completos
+    """
+    if not filas:
+        return []
+    
+    # Posiciones de los IDs en _MOVIMIENTO_CAMPOS
+    dimensiones = _cargar_dimensiones(
+        {f[3] for f in filas},
+        {f[4] for f in filas},
+        {f[5] for f in filas},
+        {f[6] for f in filas} | {f[7] for f in filas}
+    )
+    return [
+        Movimiento._make(f + _nombres(dimensiones, f[3], f[4], f[5], f[6], f[7]))
+        for f in filas
+    ]
+
+
+def _filtros(*valores) -> list:
+    """Duplicar cada valor de filtro para el patrón (%s IS NULL OR col = %s)"""
+    params = []
+    for valor in valores:
+        # Un filtro vacío ('' o 0) se trata igual que no informado
+        valor = valor or None
+        params.extend((valor, valor))
+    return params
 
 
 class MovimientoDAO:
@@ -28,231 +201,169 @@ class MovimientoDAO:
             }
         """
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
-                query = """
-                    INSERT INTO movimientos 
-                    (tipo, cantidad, id_producto, id_usuario, id_localidad,
-                     lugar_origen, lugar_destino, motivo, observaciones)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """
-                cursor.execute(query, (
-                    data['tipo'],
-                    data['cantidad'],
-                    data['id_producto'],
-                    data['id_usuario'],
-                    data['id_localidad'],
-                    data.get('lugar_origen'),
-                    data.get('lugar_destino'),
-                    data.get('motivo', ''),
-                    data.get('observaciones', '')
-                ))
+            with ConectDB.get_cursor() as cursor:
+                cursor.execute(_INSERT_MOVIMIENTO, _insert_params(data))
                 return cursor.lastrowid
-        except Exception as e:
-            print(f"Error creating movimiento: {e}")
-            connection.rollback()
+        except Exception:
+            logger.exception("Error creating movimiento")
+            raise
+    
+    @staticmethod
+    def create_bulk(rows: list) -> list:
+        """
+        Crear varios movimientos en una sola transacción
+        
+        executemany reescribe el INSERT como un único VALUES (...), (...), ...
+        por lote, así cada lote de hasta _BULK_BATCH filas es un solo round-trip.
+        
+        Args:
+            rows (list): Lista de dicts con el mismo formato que create()
+        
+        Returns:
+            list: IDs generados, en el orden de rows
+        """
+        if not rows:
+            return []
+        
+        try:
+            ids = []
+            # Cursor de texto: con prepared=True executemany ejecuta fila por fila
+            with ConectDB.get_cursor(dictionary=False) as cursor:
+                for i in range(0, len(rows), _BULK_BATCH):
+                    lote = [_insert_params(data) for data in rows[i:i + _BULK_BATCH]]
+                    cursor.executemany(_INSERT_MOVIMIENTO, lote)
+                    # En un INSERT de varias filas lastrowid es el ID de la primera
+                    # y los siguientes son consecutivos
+                    ids.extend(range(cursor.lastrowid, cursor.lastrowid + cursor.rowcount))
+            return ids
+        except Exception:
+            logger.exception("Error creating movimientos bulk")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def get_all(page=1, limit=20, tipo=None, producto_id=None, usuario_id=None, 
-                localidad_id=None, fecha_desde=None, fecha_hasta=None):
-        """Obtener todos los movimientos con filtros y paginación"""
+                localidad_id=None, fecha_desde=None, fecha_hasta=None,
+                cursor=None) -> PageResult:
+        """
+        Obtener todos los movimientos con filtros y paginación
+        
+        Args:
+            cursor (tuple): (fecha_hora, id_movimiento) del último registro de la
+                página anterior. Si se envía, se pagina por keyset y se ignora page
+                (la paginación por page/offset queda solo por compatibilidad).
+        """
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
-                # Contar total
-                count_query = "SELECT COUNT(*) as total FROM movimientos WHERE 1=1"
-                params = []
-                
-                if tipo:
-                    count_query += " AND tipo = %s"
-                    params.append(tipo)
-                
-                if producto_id:
-                    count_query += " AND id_producto = %s"
-                    params.append(producto_id)
-                
-                if usuario_id:
-                    count_query += " AND id_usuario = %s"
-                    params.append(usuario_id)
-                
-                if localidad_id:
-                    count_query += " AND id_localidad = %s"
-                    params.append(localidad_id)
-                
-                if fecha_desde:
-                    count_query += " AND fecha_hora >= %s"
-                    params.append(fecha_desde)
-                
-                if fecha_hasta:
-                    count_query += " AND fecha_hora <= %s"
-                    params.append(fecha_hasta)
-                
-                cursor.execute(count_query, params)
-                total = cursor.fetchone()['total']
-                
-                # Obtener registros
-                offset = (page - 1) * limit
-                query = """
-                    SELECT m.*,
-                           p.nombre as producto_nombre,
-                           p.codigo as producto_codigo,
-                           u.nombre as usuario_nombre,
-                           u.apellido as usuario_apellido,
-                           loc.nombre as localidad_nombre,
-                           lo.nombre as lugar_origen_nombre,
-                           ld.nombre as lugar_destino_nombre
-                    FROM movimientos m
-                    JOIN productos p ON m.id_producto = p.id_producto
-                    JOIN usuarios u ON m.id_usuario = u.id_usuario
-                    JOIN localidades loc ON m.id_localidad = loc.id_localidad
-                    LEFT JOIN lugares lo ON m.lugar_origen = lo.id_lugar
-                    LEFT JOIN lugares ld ON m.lugar_destino = ld.id_lugar
-                    WHERE 1=1
-                """
-                
-                if tipo:
-                    query += " AND m.tipo = %s"
-                
-                if producto_id:
-                    query += " AND m.id_producto = %s"
-                
-                if usuario_id:
-                    query += " AND m.id_usuario = %s"
-                
-                if localidad_id:
-                    query += " AND m.id_localidad = %s"
-                
-                if fecha_desde:
-                    query += " AND m.fecha_hora >= %s"
-                
-                if fecha_hasta:
-                    query += " AND m.fecha_hora <= %s"
-                
-                query += " ORDER BY m.fecha_hora DESC LIMIT %s OFFSET %s"
-                params.extend([limit, offset])
-                
-                cursor.execute(query, params)
-                movimientos = cursor.fetchall()
-                
-                return {
-                    'movimientos': movimientos,
-                    'pagination': {
-                        'page': page,
-                        'limit': limit,
-                        'total': total,
-                        'total_pages': (total + limit - 1) // limit
-                    }
-                }
-        except Exception as e:
-            print(f"Error getting movimientos: {e}")
+            params = _filtros(tipo, producto_id, usuario_id, localidad_id,
+                              fecha_desde, fecha_hasta)
+            
+            if cursor:
+                query = _SELECT_MOVIMIENTOS_KEYSET
+                params.extend(cursor)
+                params.append(limit)
+            else:
+                query = _SELECT_MOVIMIENTOS
+                params.extend([limit, (page - 1) * limit])
+            
+            # Cursor de tuplas: las filas se arman como Movimiento (namedtuple)
+            with ConectDB.get_prepared_cursor(query, dictionary=False) as db_cursor:
+                db_cursor.execute(query, params)
+                filas = db_cursor.fetchall()
+            
+            # _total es la última columna
+            total = filas[0][-1] if filas else (None if cursor else 0)
+            
+            # Los nombres se completan con la conexión ya devuelta al pool
+            movimientos = _a_movimientos([tuple(f[:-1]) for f in filas])
+            
+            ultimo = movimientos[-1] if len(movimientos) == limit else None
+            
+            return PageResult(
+                key='movimientos',
+                rows=movimientos,
+                page=page,
+                limit=limit,
+                total=total,
+                next_cursor=build_cursor(ultimo.fecha_hora, ultimo.id_movimiento) if ultimo else None
+            )
+        except Exception:
+            logger.exception("Error getting movimientos")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def get_by_id(movimiento_id: int) -> dict:
         """Obtener un movimiento por ID"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
-                query = """
-                    SELECT m.*,
-                           p.nombre as producto_nombre,
-                           p.codigo as producto_codigo,
-                           u.nombre as usuario_nombre,
-                           u.apellido as usuario_apellido,
-                           loc.nombre as localidad_nombre,
-                           lo.nombre as lugar_origen_nombre,
-                           ld.nombre as lugar_destino_nombre
-                    FROM movimientos m
-                    JOIN productos p ON m.id_producto = p.id_producto
-                    JOIN usuarios u ON m.id_usuario = u.id_usuario
-                    JOIN localidades loc ON m.id_localidad = loc.id_localidad
-                    LEFT JOIN lugares lo ON m.lugar_origen = lo.id_lugar
-                    LEFT JOIN lugares ld ON m.lugar_destino = ld.id_lugar
-                    WHERE m.id_movimiento = %s
-                """
+            with ConectDB.get_cursor(readonly=True) as cursor:
+                query = f"SELECT {_MOVIMIENTO_COLS} FROM movimientos m WHERE m.id_movimiento = %s"
                 cursor.execute(query, (movimiento_id,))
-                return cursor.fetchone()
-        except Exception as e:
-            print(f"Error getting movimiento by id: {e}")
+                movimiento = cursor.fetchone()
+            
+            if movimiento:
+                _completar_nombres([movimiento])
+            return movimiento
+        except Exception:
+            logger.exception("Error getting movimiento by id")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
-    def get_by_producto(producto_id: int, page=1, limit=20) -> dict:
+    def get_by_producto(producto_id: int, page=1, limit=20, cursor=None) -> PageResult:
         """Obtener movimientos de un producto específico"""
-        return MovimientoDAO.get_all(page=page, limit=limit, producto_id=producto_id)
+        return MovimientoDAO.get_all(page=page, limit=limit, producto_id=producto_id, cursor=cursor)
     
     @staticmethod
-    def get_by_usuario(usuario_id: int, page=1, limit=20) -> dict:
+    def get_by_usuario(usuario_id: int, page=1, limit=20, cursor=None) -> PageResult:
         """Obtener movimientos realizados por un usuario"""
-        return MovimientoDAO.get_all(page=page, limit=limit, usuario_id=usuario_id)
+        return MovimientoDAO.get_all(page=page, limit=limit, usuario_id=usuario_id, cursor=cursor)
     
     @staticmethod
-    def get_by_localidad(localidad_id: int, page=1, limit=20) -> dict:
+    def get_by_localidad(localidad_id: int, page=1, limit=20, cursor=None) -> PageResult:
         """Obtener movimientos de una localidad"""
-        return MovimientoDAO.get_all(page=page, limit=limit, localidad_id=localidad_id)
+        return MovimientoDAO.get_all(page=page, limit=limit, localidad_id=localidad_id, cursor=cursor)
     
     @staticmethod
     def get_ultimos(limit: int = 10) -> list:
         """Obtener los últimos N movimientos"""
+        return list(MovimientoDAO.iter_ultimos(limit))
+    
+    @staticmethod
+    def iter_ultimos(limit: int = 10):
+        """
+        Recorrer los últimos N movimientos sin cargarlos enteros
+        
+        Usa un cursor sin buffer y trae las filas de a _FETCH_BATCH. La conexión
+        vuelve al pool al agotar (o cerrar) el generador.
+        
+        Yields:
+            dict: movimiento con los nombres completos
+        """
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
-                query = """
-                    SELECT m.*,
-                           p.nombre as producto_nombre,
-                           u.nombre as usuario_nombre,
-                           u.apellido as usuario_apellido,
-                           loc.nombre as localidad_nombre
+            with ConectDB.get_cursor(readonly=True) as cursor:
+                query = f"""
+                    SELECT {_MOVIMIENTO_COLS}
                     FROM movimientos m
-                    JOIN productos p ON m.id_producto = p.id_producto
-                    JOIN usuarios u ON m.id_usuario = u.id_usuario
-                    JOIN localidades loc ON m.id_localidad = loc.id_localidad
-                    ORDER BY m.fecha_hora DESC
+                    ORDER BY m.fecha_hora DESC, m.id_movimiento DESC
                     LIMIT %s
                 """
                 cursor.execute(query, (limit,))
-                return cursor.fetchall()
-        except Exception as e:
-            print(f"Error getting ultimos movimientos: {e}")
+                
+                while True:
+                    rows = cursor.fetchmany(_FETCH_BATCH)
+                    if not rows:
+                        break
+                    
+                    yield from _completar_nombres(rows)
+        except Exception:
+            logger.exception("Error getting ultimos movimientos")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def count_por_tipo(fecha_desde=None, fecha_hasta=None) -> dict:
         """Contar movimientos por tipo en un rango de fechas"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
-                query = """
-                    SELECT tipo, COUNT(*) as count, SUM(cantidad) as total_cantidad
-                    FROM movimientos
-                    WHERE 1=1
-                """
-                params = []
-                
-                if fecha_desde:
-                    query += " AND fecha_hora >= %s"
-                    params.append(fecha_desde)
-                
-                if fecha_hasta:
-                    query += " AND fecha_hora <= %s"
-                    params.append(fecha_hasta)
-                
-                query += " GROUP BY tipo"
-                cursor.execute(query, params)
-                
-                results = cursor.fetchall()
-                return {row['tipo']: {'count': row['count'], 'total': row['total_cantidad']} for row in results}
-        except Exception as e:
-            print(f"Error counting por tipo: {e}")
-            raise
-        finally:
-            connection.close()
\ No newline at end of file
+            # Cursor de tuplas: el resultado se desempaqueta por posición
+            with ConectDB.get_prepared_cursor(_COUNT_POR_TIPO, dictionary=False) as cursor:
+                cursor.execute(_COUNT_POR_TIPO, _filtros(fecha_desde, fecha_hasta))
+                return {tipo: {'count': c, 'total': t} for tipo, c, t in cursor.fetchall()}
+        except Exception:
+            logger.exception("Error counting por tipo")
+            raise
\ No newline at end of file
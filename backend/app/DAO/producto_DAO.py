@@ -3,7 +3,85 @@ DAO de Productos
 Maneja todas las operaciones de base de datos relacionadas con productos
 """
 
+import functools
+import logging
+
 from app.db.conexion_DB import ConectDB
+from app.DAO import dimensiones
+from app.utils.sql import chunks, in_params
+
+logger = logging.getLogger(__name__)
+
+# Filas por lectura en los métodos que recorren el resultado (iter_*)
+_FETCH_BATCH = 1000
+
+# Columnas de los listados (get_all, stock bajo). Sin descripcion ni timestamps:
+# agregar una columna acá es una decisión consciente (idx_prod_list la cubre)
+_PRODUCTO_LIST_COLS = ("p.id_producto, p.nombre, p.codigo, p.id_categoria, p.costo, "
+                       "p.unidad_medida, p.stock_minimo, p.activo")
+
+# Columnas que se pueden modificar con update (en este orden)
+_ALLOWED_UPDATE = ('nombre', 'codigo', 'descripcion', 'id_categoria',
+                   'costo', 'unidad_medida', 'stock_minimo', 'activo')
+
+# Columnas de stock por lugar en get_detail (van después de las del producto)
+_DETALLE_STOCK_COLS = ('id_producto', 'id_localidad', 'id_lugar', 'cantidad', 'updated_at',
+                       'localidad_nombre', 'lugar_nombre', 'lugar_tipo')
+
+# Operadores de MATCH ... IN BOOLEAN MODE que se quitan del texto buscado
+_FULLTEXT_OPERADORES = str.maketrans('', '', '+-<>()~*"@')
+
+# InnoDB no indexa palabras más cortas que innodb_ft_min_token_size ni las de
+# su lista de stopwords por defecto: no se pueden exigir con '+'
+_FULLTEXT_MIN_TOKEN = 3
+_FULLTEXT_STOPWORDS = frozenset((
+    'a', 'about', 'an', 'are', 'as', 'at', 'be', 'by', 'com', 'de', 'en', 'for',
+    'from', 'how', 'i', 'in', 'is', 'it', 'la', 'of', 'on', 'or', 'that', 'the',
+    'this', 'to', 'was', 'what', 'when', 'where', 'who', 'will', 'with', 'und',
+    'www'
+))
+
+
+def _termino_fulltext(palabra: str) -> str:
+    """Término de MATCH: obligatorio si InnoDB lo indexa, opcional si no"""
+    if len(palabra) >= _FULLTEXT_MIN_TOKEN and palabra.lower() not in _FULLTEXT_STOPWORDS:
+        return f"+{palabra}*"
+    return f"{palabra}*"
+
+
+def _filtro_busqueda(search: str) -> tuple:
+    """
+    Armar el filtro de búsqueda de productos
+
+    Una sola palabra (de 2 o más caracteres) se busca como prefijo de nombre o
+    código (LIKE 'x%', usa los índices idx_nombre / idx_codigo). El resto se
+    busca con el índice FULLTEXT ft_prod_nombre_desc: las palabras indexables
+    deben aparecer (como prefijo); las cortas y las stopwords ("de", "x", "90")
+    quedan como opcionales, así "tubo de 110" no exige una palabra "de*".
+
+    Returns:
+        tuple: (condición SQL, [parámetros])
+    """
+    search = search.strip()
+    if ' ' not in search and len(search) >= 2:
+        patron = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        return " AND (p.nombre LIKE %s OR p.codigo LIKE %s)", [patron, patron]
+
+    palabras = search.translate(_FULLTEXT_OPERADORES).split()
+    terminos = ' '.join(_termino_fulltext(palabra) for palabra in palabras)
+    return " AND MATCH(p.nombre, p.descripcion) AGAINST (%s IN BOOLEAN MODE)", [terminos]
+
+
+@functools.lru_cache(maxsize=256)
+def _build_update_sql(campos: tuple) -> str:
+    """UPDATE de productos para un conjunto de columnas (cacheado por combinación)"""
+    asignaciones = ", ".join(f"`{campo}` = %s" for campo in campos)
+    return f"UPDATE productos SET {asignaciones} WHERE id_producto = %s"
+
+
+def _next_cursor(productos: list, limit: int):
+    """Cursor de la página siguiente (None si es la última)"""
+    return productos[-1]['id_producto'] if len(productos) == limit else None
 
 
 class ProductoDAO:
@@ -47,8 +125,8 @@ class ProductoDAO:
                 ))
                 connection.commit()
                 return cursor.lastrowid
-        except Exception as e:
-            print(f"Error creating producto: {e}")
+        except Exception:
+            logger.exception("Error creating producto")
             connection.rollback()
             raise
         finally:
@@ -72,8 +150,8 @@ class ProductoDAO:
                 """
                 cursor.execute(query, (localidad_id,))
                 return cursor.fetchall()
-        except Exception as e:
-            print(f"Error getting stock en localidad: {e}")
+        except Exception:
+            logger.exception("Error getting stock en localidad")
             raise
         finally:
             connection.close()
@@ -95,8 +173,8 @@ class ProductoDAO:
                 """
                 cursor.execute(query, (localidad_id, categoria_id))
                 return cursor.fetchall()
-        except Exception as e:
-            print(f"Error getting stock categoria: {e}")
+        except Exception:
+            logger.exception("Error getting stock categoria")
             raise
         finally:
             connection.close()
@@ -134,90 +212,114 @@ class ProductoDAO:
                 ))
                 connection.commit()
                 return cursor.lastrowid
-        except Exception as e:
-            print(f"Error creating producto_localidad: {e}")
+        except Exception:
+            logger.exception("Error creating producto_localidad")
             connection.rollback()
             raise
         finally:
             connection.close()
     
     @staticmethod
-    def get_all(page=1, limit=20, categoria_id=None, activo=None, search=None):
+    def get_all(page=1, limit=20, categoria_id=None, activo=None, search=None, cursor_id=None):
         """
         Obtener todos los productos con paginación y filtros
         
+        Con cursor_id (el next_cursor de la página anterior) se pagina por
+        keyset: se leen solo los productos con id menor, sin OFFSET ni total.
+        La paginación por page se mantiene por compatibilidad, pero las
+        páginas profundas son lentas (MySQL lee y descarta OFFSET filas).
+        
         Args:
             page (int): Número de página
             limit (int): Registros por página
             categoria_id (int): Filtrar por categoría
             activo (bool): Filtrar por activo
             search (str): Búsqueda por nombre o código
+            cursor_id (int): ID del último producto de la página anterior
         
         Returns:
-            dict: {'productos': list, 'pagination': dict}
+            dict: {'productos': list (con stock_total), 'pagination': dict}
         """
         try:
             connection = ConectDB.get_connection()
             with connection.cursor(dictionary=True) as cursor:
-                # Contar total
-                count_query = """
-                    SELECT COUNT(*) as total 
-                    FROM productos p
-                    WHERE 1=1
-                """
+                # Filtros (una sola vez para el conteo y el listado)
+                where = " WHERE 1=1"
                 params = []
                 
                 if categoria_id:
-                    count_query += " AND p.id_categoria = %s"
+                    where += " AND p.id_categoria = %s"
                     params.append(categoria_id)
                 
                 if activo is not None:
-                    count_query += " AND p.activo = %s"
+                    where += " AND p.activo = %s"
                     params.append(activo)
                 
                 if search:
-                    count_query += " AND (p.nombre LIKE %s OR p.codigo LIKE %s)"
-                    params.extend([f"%{search}%", f"%{search}%"])
+                    filtro_busqueda, params_busqueda = _filtro_busqueda(search)
+                    where += filtro_busqueda
+                    params.extend(params_busqueda)
                 
-                cursor.execute(count_query, params)
-                total = cursor.fetchone()['total']
+                if cursor_id is not None:
+                    query = f"""
+                        SELECT {_PRODUCTO_LIST_COLS}, c.nombre as categoria_nombre, c.codigo as categoria_codigo,
+                               COALESCE(s.stock_total, 0) as stock_total
+                        FROM productos p
+                        LEFT JOIN categorias c ON p.id_categoria = c.id_categoria
+                        LEFT JOIN producto_stock_total s ON s.id_producto = p.id_producto
+                        {where} AND p.id_producto < %s
+                        ORDER BY p.id_producto DESC LIMIT %s
+                    """
+                    cursor.execute(query, params + [cursor_id, limit])
+                    productos = cursor.fetchall()
+                    
+                    return {
+                        'productos': productos,
+                        'pagination': {
+                            'limit': limit,
+                            'next_cursor': _next_cursor(productos, limit)
+                        }
+                    }
                 
-                # Obtener registros paginados
+                # Registros paginados y total en la misma consulta
                 offset = (page - 1) * limit
-                query = """
-                    SELECT p.*, c.nombre as categoria_nombre, c.codigo as categoria_codigo
+                query = f"""
+                    SELECT {_PRODUCTO_LIST_COLS}, c.nombre as categoria_nombre, c.codigo as categoria_codigo,
+                           COALESCE(s.stock_total, 0) as stock_total,
+                           COUNT(*) OVER() AS _total
                     FROM productos p
                     LEFT JOIN categorias c ON p.id_categoria = c.id_categoria
-                    WHERE 1=1
+                    LEFT JOIN producto_stock_total s ON s.id_producto = p.id_producto
+                    {where}
+                    ORDER BY p.id_producto DESC LIMIT %s OFFSET %s
                 """
-                
-                if categoria_id:
-                    query += " AND p.id_categoria = %s"
-                
-                if activo is not None:
-                    query += " AND p.activo = %s"
-                
-                if search:
-                    query += " AND (p.nombre LIKE %s OR p.codigo LIKE %s)"
-                
-                query += " ORDER BY p.id_producto DESC LIMIT %s OFFSET %s"
-                params.extend([limit, offset])
-                
-                cursor.execute(query, params)
+                cursor.execute(query, params + [limit, offset])
                 productos = cursor.fetchall()
                 
+                if productos:
+                    total = productos[0]['_total']
+                    for producto in productos:
+                        del producto['_total']
+                elif offset:
+                    # Página fuera de rango: el total hay que contarlo aparte
+                    cursor.execute(f"SELECT COUNT(*) as total FROM productos p{where}", params)
+                    total = cursor.fetchone()['total']
+                else:
+                    total = 0
+                
                 return {
                     'productos': productos,
                     'pagination': {
                         'page': page,
                         'limit': limit,
                         'total': total,
-                        'total_pages': (total + limit - 1) // limit
+                        'total_pages': (total + limit - 1) // limit,
+                        'next_cursor': _next_cursor(productos, limit)
                     }
                 }
             
-        except Exception as e:
-            print(f"Error getting productos: {e}")
+        except Exception:
+            logger.exception("Error getting productos")
             raise
         finally:
             connection.close()
@@ -236,12 +338,85 @@ class ProductoDAO:
                 """
                 cursor.execute(query, (producto_id,))
                 return cursor.fetchone()
-        except Exception as e:
-            print(f"Error getting producto by id: {e}")
+        except Exception:
+            logger.exception("Error getting producto by id")
             raise
         finally:
             connection.close()
 
+    @staticmethod
+    def get_detail(producto_id: int) -> dict:
+        """
+        Obtener un producto con su stock por lugar y el total, en una sola consulta
+        
+        Equivale a get_by_id + get_stock_total + get_stock_por_localidad.
+        
+        Returns:
+            dict: producto con 'stock_total' y 'stock_por_localidad' (None si no existe)
+        """
+        try:
+            with ConectDB.get_cursor(dictionary=False, readonly=True) as cursor:
+                query = """
+                    SELECT p.*, c.nombre as categoria_nombre, c.codigo as categoria_codigo,
+                           pl.id_producto, pl.id_localidad, pl.id_lugar, pl.cantidad, pl.updated_at,
+                           loc.nombre as localidad_nombre,
+                           lug.nombre as lugar_nombre,
+                           lug.tipo as lugar_tipo
+                    FROM productos p
+                    LEFT JOIN categorias c ON p.id_categoria = c.id_categoria
+                    LEFT JOIN productos_localidad pl ON pl.id_producto = p.id_producto
+                    LEFT JOIN localidades loc ON pl.id_localidad = loc.id_localidad
+                    LEFT JOIN lugares lug ON pl.id_lugar = lug.id_lugar
+                    WHERE p.id_producto = %s
+                    ORDER BY loc.nombre, lug.nombre
+                """
+                cursor.execute(query, (producto_id,))
+                rows = cursor.fetchall()
+                if not rows:
+                    return None
+                
+                # Las primeras columnas son del producto (repetidas en cada fila)
+                n = len(cursor.column_names) - len(_DETALLE_STOCK_COLS)
+                producto = dict(zip(cursor.column_names[:n], rows[0][:n]))
+                stock = [
+                    dict(zip(_DETALLE_STOCK_COLS, row[n:]))
+                    for row in rows
+                    if row[n + 2] is not None  # id_lugar: sin stock cargado
+                ]
+                
+                producto['stock_total'] = sum(s['cantidad'] for s in stock)
+                producto['stock_por_localidad'] = stock
+                return producto
+        except Exception:
+            logger.exception("Error getting producto detail")
+            raise
+    
+    @staticmethod
+    def get_many_by_id(producto_ids: list) -> dict:
+        """
+        Obtener varios productos por ID en una sola consulta (por lote)
+        
+        Returns:
+            dict: {id_producto: producto} (los IDs inexistentes no aparecen)
+        """
+        productos = {}
+        try:
+            with ConectDB.get_cursor(readonly=True) as cursor:
+                for lote in chunks(set(producto_ids)):
+                    placeholders, params = in_params(lote)
+                    cursor.execute(f"""
+                        SELECT p.*, c.nombre as categoria_nombre, c.codigo as categoria_codigo
+                        FROM productos p
+                        LEFT JOIN categorias c ON p.id_categoria = c.id_categoria
+                        WHERE p.id_producto IN ({placeholders})
+                    """, params)
+                    for row in cursor.fetchall():
+                        productos[row['id_producto']] = row
+            return productos
+        except Exception:
+            logger.exception("Error getting productos by id")
+            raise
+
     @staticmethod
     def get_by_codigo(codigo: str) -> dict:
         """Obtener un producto por código"""
@@ -251,39 +426,52 @@ class ProductoDAO:
                 query = "SELECT * FROM productos WHERE codigo = %s"
                 cursor.execute(query, (codigo,))
                 return cursor.fetchone()
-        except Exception as e:
-            print(f"Error getting producto by codigo: {e}")
+        except Exception:
+            logger.exception("Error getting producto by codigo")
             raise
         finally:
             connection.close()
     
     @staticmethod
     def update(producto_id: int, data: dict) -> bool:
-        """Actualizar un producto"""
+        """
+        Actualizar un producto
+        
+        Raises:
+            ValueError: Si data tiene campos que no se pueden modificar
+        """
+        no_permitidos = data.keys() - set(_ALLOWED_UPDATE)
+        if no_permitidos:
+            raise ValueError(f"Campos no permitidos: {', '.join(sorted(no_permitidos))}")
+        
+        campos = tuple(key for key in _ALLOWED_UPDATE if key in data)
+        if not campos:
+            return False
+        
         try:
             connection = ConectDB.get_connection()
             with connection.cursor() as cursor:
-                # Construir query dinámicamente
-                fields = []
-                values = []
-                
-                for key in ['nombre', 'codigo', 'descripcion', 'id_categoria', 
-                           'costo', 'unidad_medida', 'stock_minimo', 'activo']:
-                    if key in data:
-                        fields.append(f"{key} = %s")
-                        values.append(data[key])
+                values = [data[key] for key in campos]
+                values.append(producto_id)
                 
-                if not fields:
-                    return False
+                cursor.execute(_build_update_sql(campos), values)
+                actualizado = cursor.rowcount > 0
                 
-                values.append(producto_id)
-                query = f"UPDATE productos SET {', '.join(fields)} WHERE id_producto = %s"
+                # Propagar el renombre a los nombres desnormalizados de envios
+                if actualizado and ('nombre' in data or 'codigo' in data):
+                    cursor.execute("""
+                        UPDATE envios e
+                        JOIN productos p ON e.id_producto = p.id_producto
+                        SET e.producto_nombre_snapshot = p.nombre,
+                            e.producto_codigo_snapshot = p.codigo
+                        WHERE e.id_producto = %s
+                    """, (producto_id,))
                 
-                cursor.execute(query, values)
                 connection.commit()
-                return cursor.rowcount > 0
-        except Exception as e:
-            print(f"Error updating producto: {e}")
+                dimensiones.invalidar('productos')
+                return actualizado
+        except Exception:
+            logger.exception("Error updating producto")
             connection.rollback()
             raise
         finally:
@@ -299,8 +487,8 @@ class ProductoDAO:
                 cursor.execute(query, (producto_id,))
                 connection.commit()
                 return cursor.rowcount > 0
-        except Exception as e:
-            print(f"Error deleting producto: {e}")
+        except Exception:
+            logger.exception("Error deleting producto")
             connection.rollback()
             raise
         finally:
@@ -310,10 +498,8 @@ class ProductoDAO:
     def exists_codigo(codigo: str, id_producto: int = None) -> bool:
         """Verificar si existe un código de producto"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
-
-                query = "SELECT COUNT(*) as count FROM productos WHERE codigo = %s"
+            with ConectDB.get_cursor(dictionary=False, readonly=True) as cursor:
+                query = "SELECT COUNT(*) FROM productos WHERE codigo = %s"
                 params = [codigo]
                 
                 if id_producto:
@@ -321,35 +507,28 @@ class ProductoDAO:
                     params.append(id_producto)
                 
                 cursor.execute(query, params)
-                result = cursor.fetchone()
-
-                return result[0] > 0 # Cambiado de 'count' a índice 0 para evitar problemas con cursor sin dictionary=True
-
-        except Exception as e:
-            print(f"Error checking codigo: {e}")
+                return cursor.fetchone()[0] > 0
+        except Exception:
+            logger.exception("Error checking codigo")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def get_stock_total(producto_id: int) -> int:
         """Obtener stock total de un producto (suma de todas las localidades)"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor(dictionary=True) as cursor:
+            with ConectDB.get_cursor(dictionary=False, readonly=True) as cursor:
+                # Resumen mantenido por triggers sobre productos_localidad
                 query = """
-                    SELECT COALESCE(SUM(cantidad), 0) as stock_total
-                    FROM productos_localidad
+                    SELECT stock_total
+                    FROM producto_stock_total
                     WHERE id_producto = %s
                 """
                 cursor.execute(query, (producto_id,))
                 result = cursor.fetchone()
-                return result['stock_total']
-        except Exception as e:
-            print(f"Error getting stock total: {e}")
+                return result[0] if result else 0
+        except Exception:
+            logger.exception("Error getting stock total")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def get_stock_por_localidad(producto_id: int) -> list:
@@ -370,8 +549,8 @@ class ProductoDAO:
                 """
                 cursor.execute(query, (producto_id,))
                 return cursor.fetchall()
-        except Exception as e:
-            print(f"Error getting stock por localidad: {e}")
+        except Exception:
+            logger.exception("Error getting stock por localidad")
             raise
         finally:
             connection.close()
@@ -380,47 +559,58 @@ class ProductoDAO:
     def get_stock_en_lugar(producto_id: int, lugar_id: int) -> int:
         """Obtener stock de un producto en un lugar específico"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor(dictionary=False, readonly=True) as cursor:
                 query = """
-                    SELECT COALESCE(cantidad, 0) as cantidad
+                    SELECT cantidad
                     FROM productos_localidad
                     WHERE id_producto = %s AND id_lugar = %s
                 """
                 cursor.execute(query, (producto_id, lugar_id))
                 result = cursor.fetchone()
-                return result['cantidad'] if result else 0
-        except Exception as e:
-            print(f"Error getting stock en lugar: {e}")
+                return result[0] if result else 0
+        except Exception:
+            logger.exception("Error getting stock en lugar")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def get_productos_stock_bajo() -> list:
         """Obtener productos con stock por debajo del mínimo"""
+        return list(ProductoDAO.iter_productos_stock_bajo())
+    
+    @staticmethod
+    def iter_productos_stock_bajo(chunk: int = _FETCH_BATCH):
+        """
+        Recorrer los productos con stock por debajo del mínimo sin cargarlos enteros
+        
+        Usa un cursor sin buffer y trae las filas de a chunk. La conexión
+        vuelve al pool al agotar (o cerrar) el generador.
+        """
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
-                query = """
-                    SELECT p.*, 
-                           COALESCE(SUM(pl.cantidad), 0) as stock_total,
+            with ConectDB.get_cursor(readonly=True) as cursor:
+                # Sin agregación: el total sale de producto_stock_total (los
+                # productos sin stock cargado no tienen fila y cuentan como 0)
+                query = f"""
+                    SELECT {_PRODUCTO_LIST_COLS}, 
+                           COALESCE(t.stock_total, 0) as stock_total,
                            c.nombre as categoria_nombre
                     FROM productos p
-                    LEFT JOIN productos_localidad pl ON p.id_producto = pl.id_producto
+                    LEFT JOIN producto_stock_total t ON p.id_producto = t.id_producto
                     LEFT JOIN categorias c ON p.id_categoria = c.id_categoria
                     WHERE p.activo = 1
-                    GROUP BY p.id_producto
-                    HAVING stock_total < p.stock_minimo
+                      AND COALESCE(t.stock_total, 0) < p.stock_minimo
                     ORDER BY p.nombre
                 """
                 cursor.execute(query)
-                return cursor.fetchall()
-        except Exception as e:
-            print(f"Error getting productos stock bajo: {e}")
+                
+                while True:
+                    rows = cursor.fetchmany(chunk)
+                    if not rows:
+                        break
+                    
+                    yield from rows
+        except Exception:
+            logger.exception("Error getting productos stock bajo")
             raise
-        finally:
-            connection.close()
 
 
     @staticmethod
@@ -454,8 +644,8 @@ class ProductoDAO:
                 cursor.execute(query, params)
                 result = cursor.fetchone()
                 return result[0] > 0 # Cambiado de 'count' a índice 0 para evitar problemas con cursor sin dictionary=True
-        except Exception as e:
-            print(f"Error checking nombre categoria: {e}")
+        except Exception:
+            logger.exception("Error checking nombre categoria")
             raise
         finally:
             connection.close()
\ No newline at end of file
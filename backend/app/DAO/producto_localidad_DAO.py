@@ -4,7 +4,25 @@ Maneja el stock de productos en cada lugar de cada localidad
 ESTE ES CRÍTICO - Actualiza el stock físico
 """
 
+import logging
+
 from app.db.conexion_DB import ConectDB
+from app.utils.sql import chunks, in_params
+
+logger = logging.getLogger(__name__)
+
+# Filas por lectura en los métodos que recorren el resultado (iter_*)
+_FETCH_BATCH = 1000
+
+# Filas por INSERT en las cargas masivas
+_BULK_BATCH = 1000
+
+_INIT_STOCK_BULK = """
+    INSERT INTO productos_localidad 
+    (id_producto, id_localidad, id_lugar, cantidad)
+    VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE cantidad = VALUES(cantidad)
+"""
 
 
 class ProductoLocalidadDAO:
@@ -33,34 +51,60 @@ class ProductoLocalidadDAO:
                 cursor.execute(query, (producto_id, localidad_id, lugar_id, cantidad, cantidad))
                 connection.commit()
                 return cursor.rowcount > 0
-        except Exception as e:
-            print(f"Error init stock: {e}")
+        except Exception:
+            logger.exception("Error init stock")
             connection.rollback()
             raise
         finally:
             connection.close()
     
+    @staticmethod
+    def init_stock_bulk(rows: list) -> int:
+        """
+        Inicializar el stock de muchos (producto, lugar) en una sola transacción
+        
+        executemany reescribe el INSERT como un único VALUES (...), (...), ...
+        por lote, así cada lote de hasta _BULK_BATCH filas es un solo round-trip.
+        
+        Args:
+            rows (list): Tuplas (producto_id, localidad_id, lugar_id, cantidad)
+        
+        Returns:
+            int: Filas afectadas (como informa MySQL para ON DUPLICATE KEY UPDATE)
+        """
+        if not rows:
+            return 0
+        
+        try:
+            afectadas = 0
+            with ConectDB.get_cursor(dictionary=False) as cursor:
+                for i in range(0, len(rows), _BULK_BATCH):
+                    cursor.executemany(_INIT_STOCK_BULK, rows[i:i + _BULK_BATCH])
+                    afectadas += cursor.rowcount
+            return afectadas
+        except Exception:
+            logger.exception("Error init stock bulk")
+            raise
+    
     @staticmethod
     def get_stock(producto_id: int, lugar_id: int) -> int:
         """
         Obtener cantidad de stock de un producto en un lugar específico
         """
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor(readonly=True) as cursor:
+                # Sin fila no hay stock: el 0 lo pone el return, no hace falta COALESCE
                 query = """
-                    SELECT COALESCE(cantidad, 0) as cantidad
+                    SELECT cantidad
                     FROM productos_localidad
                     WHERE id_producto = %s AND id_lugar = %s
                 """
                 cursor.execute(query, (producto_id, lugar_id))
                 result = cursor.fetchone()
                 return result['cantidad'] if result else 0
-        except Exception as e:
-            print(f"Error getting stock: {e}")
+        except Exception:
+            logger.exception("Error getting stock")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def sumar_stock(producto_id: int, lugar_id: int, cantidad: int) -> bool:
@@ -73,48 +117,36 @@ class ProductoLocalidadDAO:
             cantidad: Cantidad a sumar
         """
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
-                # Verificar si existe el registro
-                query_check = """
-                    SELECT id_producto, id_localidad 
-                    FROM productos_localidad 
+            with ConectDB.get_cursor() as cursor:
+                # Caso común: el registro ya existe y basta con el UPDATE
+                query = """
+                    UPDATE productos_localidad 
+                    SET cantidad = cantidad + %s
                     WHERE id_producto = %s AND id_lugar = %s
                 """
-                cursor.execute(query_check, (producto_id, lugar_id))
-                existe = cursor.fetchone()
+                cursor.execute(query, (cantidad, producto_id, lugar_id))
+                if cursor.rowcount > 0:
+                    return True
                 
-                if existe:
-                    # Actualizar stock existente
-                    query = """
-                        UPDATE productos_localidad 
-                        SET cantidad = cantidad + %s
-                        WHERE id_producto = %s AND id_lugar = %s
-                    """
-                    cursor.execute(query, (cantidad, producto_id, lugar_id))
-                else:
-                    # Crear registro nuevo (obtener localidad del lugar)
-                    query_loc = "SELECT id_localidad FROM lugares WHERE id_lugar = %s"
-                    cursor.execute(query_loc, (lugar_id,))
-                    lugar = cursor.fetchone()
-                    
-                    if not lugar:
-                        raise Exception(f"Lugar {lugar_id} no encontrado")
-                    
-                    query = """
-                        INSERT INTO productos_localidad 
-                        (id_producto, id_localidad, id_lugar, cantidad)
-                        VALUES (%s, %s, %s, %s)
-                    """
-                    cursor.execute(query, (producto_id, lugar['id_localidad'], lugar_id, cantidad))
+                # Registro nuevo: upsert (la localidad se toma del lugar; si otra
+                # request lo creó recién, ON DUPLICATE KEY suma igual)
+                query = """
+                    INSERT INTO productos_localidad 
+                    (id_producto, id_localidad, id_lugar, cantidad)
+                    SELECT %s, l.id_localidad, l.id_lugar, %s
+                    FROM lugares l
+                    WHERE l.id_lugar = %s
+                    ON DUPLICATE KEY UPDATE cantidad = cantidad + %s
+                """
+                cursor.execute(query, (producto_id, cantidad, lugar_id, cantidad))
                 
-                return cursor.rowcount > 0
-        except Exception as e:
-            print(f"Error sumando stock: {e}")
-            connection.close()
+                if cursor.rowcount == 0:
+                    raise Exception(f"Lugar {lugar_id} no encontrado")
+                
+                return True
+        except Exception:
+            logger.exception("Error sumando stock")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def restar_stock(producto_id: int, lugar_id: int, cantidad: int) -> bool:
@@ -131,28 +163,32 @@ class ProductoLocalidadDAO:
             Exception: Si no hay stock suficiente
         """
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
-                # Verificar stock actual
-                stock_actual = ProductoLocalidadDAO.get_stock(producto_id, lugar_id)
-                
-                if stock_actual < cantidad:
-                    raise Exception(f"Stock insuficiente. Disponible: {stock_actual}, Requerido: {cantidad}")
-                
-                # Restar stock
+            with ConectDB.get_cursor() as cursor:
+                # Restar solo si alcanza el stock: la condición la valida MySQL
+                # sobre la fila bloqueada, así dos salidas simultáneas no dejan
+                # el stock en negativo
                 query = """
                     UPDATE productos_localidad 
                     SET cantidad = cantidad - %s
-                    WHERE id_producto = %s AND id_lugar = %s
+                    WHERE id_producto = %s AND id_lugar = %s AND cantidad >= %s
                 """
-                cursor.execute(query, (cantidad, producto_id, lugar_id))
-                return cursor.rowcount > 0
-        except Exception as e:
-            print(f"Error restando stock: {e}")
-            connection.rollback()
+                cursor.execute(query, (cantidad, producto_id, lugar_id, cantidad))
+                
+                if cursor.rowcount == 0:
+                    # Solo para el mensaje de error
+                    cursor.execute("""
+                        SELECT cantidad
+                        FROM productos_localidad
+                        WHERE id_producto = %s AND id_lugar = %s
+                    """, (producto_id, lugar_id))
+                    result = cursor.fetchone()
+                    stock_actual = result['cantidad'] if result else 0
+                    raise Exception(f"Stock insuficiente. Disponible: {stock_actual}, Requerido: {cantidad}")
+                
+                return True
+        except Exception:
+            logger.exception("Error restando stock")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def transferir_stock(producto_id: int, lugar_origen: int, lugar_destino: int, cantidad: int) -> bool:
@@ -164,29 +200,48 @@ class ProductoLocalidadDAO:
             lugar_origen: ID del lugar origen
             lugar_destino: ID del lugar destino
             cantidad: Cantidad a transferir
+        
+        Se hace en una sola transacción: si falta stock en origen o no existe el
+        lugar destino no se modifica nada.
+        
+        Raises:
+            Exception: Si no hay stock suficiente en origen
         """
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
-                # Validar stock en origen
-                stock_origen = ProductoLocalidadDAO.get_stock(producto_id, lugar_origen)
+            with ConectDB.get_cursor() as cursor:
+                # Restar de origen solo si alcanza el stock (sin leerlo antes)
+                cursor.execute("""
+                    UPDATE productos_localidad 
+                    SET cantidad = cantidad - %s
+                    WHERE id_producto = %s AND id_lugar = %s AND cantidad >= %s
+                """, (cantidad, producto_id, lugar_origen, cantidad))
                 
-                if stock_origen < cantidad:
+                if cursor.rowcount == 0:
+                    cursor.execute("""
+                        SELECT COALESCE(SUM(cantidad), 0) as cantidad
+                        FROM productos_localidad
+                        WHERE id_producto = %s AND id_lugar = %s
+                    """, (producto_id, lugar_origen))
+                    stock_origen = cursor.fetchone()['cantidad']
                     raise Exception(f"Stock insuficiente en origen. Disponible: {stock_origen}")
                 
-                # Restar de origen
-                ProductoLocalidadDAO.restar_stock(producto_id, lugar_origen, cantidad)
+                # Sumar a destino (crea el registro si no existe)
+                cursor.execute("""
+                    INSERT INTO productos_localidad 
+                    (id_producto, id_localidad, id_lugar, cantidad)
+                    SELECT %s, l.id_localidad, l.id_lugar, %s
+                    FROM lugares l
+                    WHERE l.id_lugar = %s
+                    ON DUPLICATE KEY UPDATE cantidad = cantidad + %s
+                """, (producto_id, cantidad, lugar_destino, cantidad))
                 
-                # Sumar a destino
-                ProductoLocalidadDAO.sumar_stock(producto_id, lugar_destino, cantidad)
+                if cursor.rowcount == 0:
+                    raise Exception(f"Lugar {lugar_destino} no encontrado")
                 
                 return True
-        except Exception as e:
-            print(f"Error transfiriendo stock: {e}")
-            connection.rollback()
+        except Exception:
+            logger.exception("Error transfiriendo stock")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def ajustar_stock(producto_id: int, lugar_id: int, cantidad_nueva: int, motivo: str = '') -> bool:
@@ -200,35 +255,21 @@ class ProductoLocalidadDAO:
             motivo: Motivo del ajuste
         """
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor() as cursor:
+                # Upsert en una sola sentencia (la localidad se toma del lugar)
                 query = """
-                    UPDATE productos_localidad 
-                    SET cantidad = %s
-                    WHERE id_producto = %s AND id_lugar = %s
+                    INSERT INTO productos_localidad 
+                    (id_producto, id_localidad, id_lugar, cantidad)
+                    SELECT %s, l.id_localidad, l.id_lugar, %s
+                    FROM lugares l
+                    WHERE l.id_lugar = %s
+                    ON DUPLICATE KEY UPDATE cantidad = %s
                 """
-                cursor.execute(query, (cantidad_nueva, producto_id, lugar_id))
-                
-                if cursor.rowcount == 0:
-                    # No existe, crear
-                    query_loc = "SELECT id_localidad FROM lugares WHERE id_lugar = %s"
-                    cursor.execute(query_loc, (lugar_id,))
-                    lugar = cursor.fetchone()
-                    
-                    query_insert = """
-                        INSERT INTO productos_localidad 
-                        (id_producto, id_localidad, id_lugar, cantidad)
-                        VALUES (%s, %s, %s, %s)
-                    """
-                    cursor.execute(query_insert, (producto_id, lugar['id_localidad'], lugar_id, cantidad_nueva))
-                
+                cursor.execute(query, (producto_id, cantidad_nueva, lugar_id, cantidad_nueva))
                 return True
-        except Exception as e:
-            print(f"Error ajustando stock: {e}")
-            connection.rollback()
+        except Exception:
+            logger.exception("Error ajustando stock")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def get_stock_por_producto(producto_id: int) -> list:
@@ -249,8 +290,8 @@ class ProductoLocalidadDAO:
                 """
                 cursor.execute(query, (producto_id,))
                 return cursor.fetchall()
-        except Exception as e:
-            print(f"Error getting stock por producto: {e}")
+        except Exception:
+            logger.exception("Error getting stock por producto")
             raise
         finally:
             connection.close()
@@ -258,9 +299,21 @@ class ProductoLocalidadDAO:
     @staticmethod
     def get_stock_por_localidad(localidad_id: int) -> list:
         """Obtener stock de todos los productos en una localidad"""
+        return list(ProductoLocalidadDAO.iter_stock_por_localidad(localidad_id))
+    
+    @staticmethod
+    def iter_stock_por_localidad(localidad_id: int, chunk: int = _FETCH_BATCH):
+        """
+        Recorrer el stock de una localidad sin cargarlo entero
+        
+        Usa un cursor sin buffer y trae las filas de a chunk. La conexión
+        vuelve al pool al agotar (o cerrar) el generador.
+        
+        Yields:
+            dict: stock del producto en el lugar
+        """
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor(readonly=True) as cursor:
                 query = """
                     SELECT pl.*, 
                            p.nombre as producto_nombre,
@@ -273,29 +326,54 @@ class ProductoLocalidadDAO:
                     ORDER BY p.nombre, lug.nombre
                 """
                 cursor.execute(query, (localidad_id,))
-                return cursor.fetchall()
-        except Exception as e:
-            print(f"Error getting stock por localidad: {e}")
+                
+                while True:
+                    rows = cursor.fetchmany(chunk)
+                    if not rows:
+                        break
+                    
+                    yield from rows
+        except Exception:
+            logger.exception("Error getting stock por localidad")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def get_total_por_producto(producto_id: int) -> int:
         """Obtener stock total de un producto (suma de todos los lugares)"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor(dictionary=False, readonly=True) as cursor:
                 query = """
                     SELECT COALESCE(SUM(cantidad), 0) as total
                     FROM productos_localidad
                     WHERE id_producto = %s
                 """
                 cursor.execute(query, (producto_id,))
-                result = cursor.fetchone()
-                return result['total']
-        except Exception as e:
-            print(f"Error getting total stock: {e}")
+                return cursor.fetchone()[0]
+        except Exception:
+            logger.exception("Error getting total stock")
+            raise
+    
+    @staticmethod
+    def get_total_por_productos(producto_ids: list) -> dict:
+        """
+        Obtener el stock total de varios productos en una sola consulta (por lote)
+        
+        Returns:
+            dict: {id_producto: total} (0 para los productos sin stock)
+        """
+        ids = set(producto_ids)
+        totales = dict.fromkeys(ids, 0)
+        try:
+            with ConectDB.get_cursor(dictionary=False, readonly=True) as cursor:
+                for lote in chunks(ids):
+                    placeholders, params = in_params(lote)
+                    cursor.execute(f"""
+                        SELECT id_producto, stock_total
+                        FROM producto_stock_total
+                        WHERE id_producto IN ({placeholders})
+                    """, params)
+                    totales.update(cursor.fetchall())
+            return totales
+        except Exception:
+            logger.exception("Error getting total stock por productos")
             raise
-        finally:
-            connection.close()
\ No newline at end of file
@@ -3,7 +3,22 @@ DAO de Roles y Permisos
 Maneja roles y permisos del sistema
 """
 
+import logging
+import threading
+
 from app.db.conexion_DB import ConectDB
+from app.DAO.usuario_DAO import invalidar_permisos
+from app.utils.cache import TTLCache, cached
+from app.utils.sql import chunks, in_params
+
+logger = logging.getLogger(__name__)
+
+# Roles y permisos casi no cambian: se cachean y se invalidan al escribir
+_cache = TTLCache(maxsize=256, ttl=300)
+
+# Recursos de permisos: se cargan una vez y se descartan solo al modificar permisos
+_recursos_cache = None
+_recursos_lock = threading.Lock()
 
 
 class RolDAO:
@@ -13,8 +28,7 @@ class RolDAO:
     def get(activo=None) -> dict:
         """Obtener todos los roles"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor(dictionary=True) as cursor:
+            with ConectDB.get_cursor(readonly=True) as cursor:
                 query = "SELECT id_rol, nombre, descripcion FROM roles WHERE 1=1"
                 params = []
                 
@@ -25,11 +39,9 @@ class RolDAO:
                 query += " ORDER BY nivel"
                 cursor.execute(query, params)
                 return cursor.fetchall()
-        except Exception as e:
-            print(f"Error getting roles: {e}")
+        except Exception:
+            logger.exception("Error getting roles")
             raise
-        finally:
-            connection.close()
     
 
 
@@ -38,8 +50,7 @@ class RolDAO:
     def get_all(activo=None) -> list:
         """Obtener todos los roles"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor(readonly=True) as cursor:
                 query = "SELECT * FROM roles WHERE 1=1"
                 params = []
                 
@@ -50,48 +61,41 @@ class RolDAO:
                 query += " ORDER BY nivel"
                 cursor.execute(query, params)
                 return cursor.fetchall()
-        except Exception as e:
-            print(f"Error getting roles: {e}")
+        except Exception:
+            logger.exception("Error getting roles")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
+    @cached(_cache)
     def get_by_id(rol_id: int) -> dict:
         """Obtener un rol por ID"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor(readonly=True) as cursor:
                 query = "SELECT * FROM roles WHERE id_rol = %s"
                 cursor.execute(query, (rol_id,))
                 return cursor.fetchone()
-        except Exception as e:
-            print(f"Error getting rol by id: {e}")
+        except Exception:
+            logger.exception("Error getting rol by id")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def get_by_nombre(nombre: str) -> dict:
         """Obtener un rol por nombre"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor(readonly=True) as cursor:
                 query = "SELECT * FROM roles WHERE nombre = %s"
                 cursor.execute(query, (nombre,))
                 return cursor.fetchone()
-        except Exception as e:
-            print(f"Error getting rol by nombre: {e}")
+        except Exception:
+            logger.exception("Error getting rol by nombre")
             raise
-        finally:
-            connection.close()
-
+    
     @staticmethod
+    @cached(_cache)
     def get_permisos(rol_id: int) -> list:
         """Obtener todos los permisos de un rol"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor(readonly=True) as cursor:
                 query = """
                     SELECT p.*
                     FROM roles_permisos rp
@@ -101,138 +105,157 @@ class RolDAO:
                 """
                 cursor.execute(query, (rol_id,))
                 return cursor.fetchall()
-        except Exception as e:
-            print(f"Error getting permisos de rol: {e}")
+        except Exception:
+            logger.exception("Error getting permisos de rol")
+            raise
+    
+    @staticmethod
+    def get_permisos_for_roles(rol_ids: list) -> dict:
+        """
+        Obtener los permisos de varios roles en una sola consulta (por lote)
+        
+        Returns:
+            dict: {id_rol: [permisos]} ([] para los roles sin permisos)
+        """
+        ids = set(rol_ids)
+        permisos = {rol_id: [] for rol_id in ids}
+        try:
+            with ConectDB.get_cursor(readonly=True) as cursor:
+                for lote in chunks(ids):
+                    placeholders, params = in_params(lote)
+                    cursor.execute(f"""
+                        SELECT rp.id_rol, p.*
+                        FROM roles_permisos rp
+                        JOIN permisos p ON rp.id_permiso = p.id_permiso
+                        WHERE rp.id_rol IN ({placeholders})
+                        ORDER BY p.recurso, p.nombre
+                    """, params)
+                    for row in cursor.fetchall():
+                        permisos[row.pop('id_rol')].append(row)
+            return permisos
+        except Exception:
+            logger.exception("Error getting permisos de roles")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def asignar_permiso(rol_id: int, permiso_id: int) -> bool:
         """Asignar un permiso a un rol"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor() as cursor:
                 query = """
                     INSERT IGNORE INTO roles_permisos (id_rol, id_permiso)
                     VALUES (%s, %s)
                 """
                 cursor.execute(query, (rol_id, permiso_id))
-                return cursor.rowcount > 0
-        except Exception as e:
-            print(f"Error asignando permiso: {e}")
-            connection.rollback()
+                asignado = cursor.rowcount > 0
+            _cache.clear()
+            invalidar_permisos()
+            return asignado
+        except Exception:
+            logger.exception("Error asignando permiso")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def quitar_permiso(rol_id: int, permiso_id: int) -> bool:
         """Quitar un permiso de un rol"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor() as cursor:
                 query = "DELETE FROM roles_permisos WHERE id_rol = %s AND id_permiso = %s"
                 cursor.execute(query, (rol_id, permiso_id))
-                return cursor.rowcount > 0
-        except Exception as e:
-            print(f"Error quitando permiso: {e}")
-            connection.rollback()
+                quitado = cursor.rowcount > 0
+            _cache.clear()
+            invalidar_permisos()
+            return quitado
+        except Exception:
+            logger.exception("Error quitando permiso")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def count_usuarios(rol_id: int) -> int:
         """Contar usuarios con este rol"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
-                query = "SELECT COUNT(*) as count FROM usuarios_roles WHERE id_rol = %s"
+            with ConectDB.get_cursor(dictionary=False, readonly=True) as cursor:
+                query = "SELECT COUNT(*) FROM usuarios_roles WHERE id_rol = %s"
                 cursor.execute(query, (rol_id,))
-                result = cursor.fetchone()
-                return result['count']
-        except Exception as e:
-            print(f"Error counting usuarios: {e}")
+                return cursor.fetchone()[0]
+        except Exception:
+            logger.exception("Error counting usuarios")
             raise
-        finally:
-            connection.close()
 
 
 class PermisoDAO:
     """Data Access Object para la tabla permisos"""
     
     @staticmethod
+    @cached(_cache)
     def get_all() -> list:
         """Obtener todos los permisos"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor(readonly=True) as cursor:
                 query = "SELECT * FROM permisos ORDER BY recurso, nombre"
                 cursor.execute(query)
                 return cursor.fetchall()
-        except Exception as e:
-            print(f"Error getting permisos: {e}")
+        except Exception:
+            logger.exception("Error getting permisos")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def get_by_id(permiso_id: int) -> dict:
         """Obtener un permiso por ID"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor(readonly=True) as cursor:
                 query = "SELECT * FROM permisos WHERE id_permiso = %s"
                 cursor.execute(query, (permiso_id,))
                 return cursor.fetchone()
-        except Exception as e:
-            print(f"Error getting permiso by id: {e}")
+        except Exception:
+            logger.exception("Error getting permiso by id")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def get_by_nombre(nombre: str) -> dict:
         """Obtener un permiso por nombre"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor(dictionary=True) as cursor:
+            with ConectDB.get_cursor(readonly=True) as cursor:
                 query = "SELECT * FROM permisos WHERE nombre = %s"
                 cursor.execute(query, (nombre,))
                 return cursor.fetchone()
-        except Exception as e:
-            print(f"Error getting permiso by nombre: {e}")
+        except Exception:
+            logger.exception("Error getting permiso by nombre")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def get_by_recurso(recurso: str) -> list:
         """Obtener todos los permisos de un recurso"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor(readonly=True) as cursor:
                 query = "SELECT * FROM permisos WHERE recurso = %s ORDER BY nombre"
                 cursor.execute(query, (recurso,))
                 return cursor.fetchall()
-        except Exception as e:
-            print(f"Error getting permisos by recurso: {e}")
+        except Exception:
+            logger.exception("Error getting permisos by recurso")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def get_recursos() -> list:
-        """Obtener lista de recursos únicos"""
-        try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
-                query = "SELECT DISTINCT recurso FROM permisos ORDER BY recurso"
-                cursor.execute(query)
-                return [row['recurso'] for row in cursor.fetchall()]
-        except Exception as e:
-            print(f"Error getting recursos: {e}")
-            raise
-        finally:
-            connection.close()
\ No newline at end of file
+        """Obtener lista de recursos únicos (en memoria hasta invalidate_recursos_cache)"""
+        global _recursos_cache
+        recursos = _recursos_cache
+        if recursos is None:
+            with _recursos_lock:
+                recursos = _recursos_cache
+                if recursos is None:
+                    try:
+                        with ConectDB.get_cursor(readonly=True) as cursor:
+                            query = "SELECT DISTINCT recurso FROM permisos ORDER BY recurso"
+                            cursor.execute(query)
+                            recursos = _recursos_cache = tuple(row['recurso'] for row in cursor.fetchall())
+                    except Exception:
+                        logger.exception("Error getting recursos")
+                        raise
+        return list(recursos)
+    
+    @staticmethod
+    def invalidate_recursos_cache():
+        """Descartar los recursos en memoria (llamar al crear/borrar permisos)"""
+        global _recursos_cache
+        _recursos_cache = None
\ No newline at end of file
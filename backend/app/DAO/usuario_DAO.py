@@ -3,7 +3,155 @@ DAO de Usuarios
 Maneja todas las operaciones de base de datos relacionadas con usuarios
 """
 
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
 from app.db.conexion_DB import ConectDB
+from app.DAO import dimensiones
+from app.utils.cache import TTLCache, copiar_filas
+from app.utils.sql import chunks, in_params
+
+logger = logging.getLogger(__name__)
+
+# Total de usuarios por filtro 'activo' para la paginación (se invalida al escribir)
+_count_cache = TTLCache(maxsize=8, ttl=30)
+# Nombres de permisos por usuario (frozenset), consultados en cada request protegida
+_permisos_cache = TTLCache(maxsize=1024, ttl=60)
+# Filas de get_by_id (incluye password_hash; se usa en cada refresh del token)
+_usuario_cache = TTLCache(maxsize=1024, ttl=30)
+
+
+# Escrituras no críticas (ultimo_login) que no deben demorar la respuesta.
+# Cada tarea toma su propia conexión del pool
+_bg = ThreadPoolExecutor(max_workers=2, thread_name_prefix="usuario_bg")
+# Consultas independientes que se ejecutan en paralelo (el COUNT de get_all)
+_consultas = ThreadPoolExecutor(max_workers=4, thread_name_prefix="usuario_consultas")
+
+
+def _invalidar_usuario(usuario_id: int):
+    """Descartar el usuario cacheado por get_by_id"""
+    _usuario_cache.pop(usuario_id)
+
+
+def invalidar_permisos(usuario_id: int = None):
+    """Descartar los permisos cacheados de un usuario (o de todos)"""
+    if usuario_id is None:
+        _permisos_cache.clear()
+    else:
+        _permisos_cache.pop(usuario_id)
+
+
+# Consultas compartidas por el login y las lecturas sueltas
+_QUERY_BY_USERNAME = """
+    SELECT 
+        u.*
+    , l.nombre as localidad_nombre,
+           r.nombre as roles,
+           r.id_rol as roles_ids
+    FROM usuarios u
+    LEFT JOIN localidades l ON u.id_localidad = l.id_localidad
+    LEFT JOIN usuarios_roles ur ON u.id_usuario = ur.id_usuario
+    LEFT JOIN roles r ON ur.id_rol = r.id_rol
+    WHERE u.username = %s
+"""
+
+_QUERY_PERMISOS = """
+    SELECT DISTINCT p.nombre, p.descripcion, p.recurso
+    FROM usuarios_roles ur
+    JOIN roles_permisos rp ON ur.id_rol = rp.id_rol
+    JOIN permisos p ON rp.id_permiso = p.id_permiso
+    WHERE ur.id_usuario = %s
+    ORDER BY p.recurso, p.nombre
+"""
+
+
+_ASIGNAR_ROL = """
+    INSERT INTO usuarios_roles (id_usuario, id_rol, asignado_por)
+    VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+    id_rol = VALUES(id_rol),
+    asignado_por = VALUES(asignado_por),
+    fecha_asignacion = CURRENT_TIMESTAMP
+"""
+
+# Filas por executemany al asignar roles en lote
+_BULK_BATCH = 1000
+
+# Columnas que se pueden actualizar (el orden fija la forma del UPDATE)
+_ALLOWED_UPDATE = ('nombre', 'apellido', 'email', 'legajo', 'id_localidad', 'activo')
+# update_usuario (edición desde el frontend) también permite cambiar el username
+_ALLOWED_UPDATE_USUARIO = ('nombre', 'apellido', 'username', 'email', 'legajo', 'id_localidad', 'activo')
+
+
+@functools.lru_cache(maxsize=128)
+def _build_update_sql(campos: tuple) -> str:
+    """UPDATE de usuarios para un conjunto de columnas (cacheado por combinación)"""
+    asignaciones = ", ".join(f"`{campo}` = %s" for campo in campos)
+    return f"UPDATE usuarios SET {asignaciones} WHERE id_usuario = %s"
+
+
+# Consultas de get_all armadas una sola vez, indexadas por "se filtra por activo".
+# Cada variante es un texto fijo (se puede preparar y reutilizar en el servidor)
+_LIST_SELECT = """
+    SELECT u.id_usuario, 
+    u.nombre, 
+    u.email, 
+    u.apellido,
+    u.legajo,
+    u.activo,
+    u.created_at, l.nombre as localidad_nombre,
+           r.nombre as roles
+    FROM usuarios u
+"""
+_LIST_JOINS = """
+    LEFT JOIN localidades l ON u.id_localidad = l.id_localidad
+    LEFT JOIN usuarios_roles ur ON u.id_usuario = ur.id_usuario
+    LEFT JOIN roles r ON ur.id_rol = r.id_rol
+"""
+
+
+def _where(filtrar_activo: bool, *condiciones: str) -> str:
+    """WHERE de get_all (con u.activo = %s primero si se filtra)"""
+    condiciones = (("u.activo = %s",) if filtrar_activo else ()) + condiciones
+    return f" WHERE {' AND '.join(condiciones)}" if condiciones else ""
+
+
+_GET_ALL_COUNT = {
+    filtrar: f"SELECT COUNT(*) FROM usuarios u{_where(filtrar)}"
+    for filtrar in (False, True)
+}
+# Keyset: solo los usuarios con id menor al cursor
+_GET_ALL_KEYSET = {
+    filtrar: f"""{_LIST_SELECT}{_LIST_JOINS}{_where(filtrar, "u.id_usuario < %s")}
+        ORDER BY u.id_usuario DESC LIMIT %s"""
+    for filtrar in (False, True)
+}
+# Deferred join: el OFFSET se recorre solo sobre los IDs (PRIMARY KEY) y los
+# JOIN se hacen únicamente para los usuarios de la página
+_GET_ALL_PAGE = {
+    filtrar: f"""{_LIST_SELECT}
+        JOIN (
+            SELECT u.id_usuario FROM usuarios u{_where(filtrar)}
+            ORDER BY u.id_usuario DESC LIMIT %s OFFSET %s
+        ) pagina ON u.id_usuario = pagina.id_usuario
+        {_LIST_JOINS}
+        ORDER BY u.id_usuario DESC"""
+    for filtrar in (False, True)
+}
+
+
+def _contar_usuarios(filtrar_activo: bool, params: list) -> int:
+    """COUNT de usuarios con su propia conexión (se ejecuta en _consultas)"""
+    query = _GET_ALL_COUNT[filtrar_activo]
+    with ConectDB.get_prepared_cursor(query, dictionary=False) as cursor:
+        cursor.execute(query, params)
+        return cursor.fetchone()[0]
+
+
+def _next_cursor(usuarios: list, limit: int):
+    """Cursor de la página siguiente (None si es la última)"""
+    return usuarios[-1]['id_usuario'] if len(usuarios) == limit else None
 
 
 class UsuarioDAO:
@@ -29,8 +177,7 @@ class UsuarioDAO:
             int: ID del usuario creado o None si falla
         """
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor() as cursor:
                 query = """
                     INSERT INTO usuarios 
                     (nombre, apellido, username, email, password_hash, legajo, id_localidad, activo)
@@ -45,24 +192,34 @@ class UsuarioDAO:
                     data.get('legajo'),
                     data['id_localidad']
                 ))
-                connection.commit()
-                return cursor.lastrowid
-        except Exception as e:
-            print(f"Error creating usuario: {e}")
-            connection.rollback()
+                usuario_id = cursor.lastrowid
+            _count_cache.clear()
+            return usuario_id
+        except Exception:
+            logger.exception("Error creating usuario")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
-    def get_all(page=1, limit=20, activo=None) -> dict:
+    def get_all(page=1, limit=20, activo=None, cursor_id=None, contar=False, force_recount=False) -> dict:
         """
         Obtener todos los usuarios con paginación
         
+        Con cursor_id (el next_cursor de la página anterior) se pagina por
+        keyset sobre la PRIMARY KEY: se leen solo los usuarios con id menor,
+        sin OFFSET, y el total se cuenta solo si se pide (contar=True).
+        La paginación por page se mantiene por compatibilidad.
+        
+        El total se cachea unos segundos por valor de 'activo'; con
+        force_recount=True se vuelve a contar. Si hay que contar, el COUNT
+        corre en paralelo con el SELECT, en otra conexión del pool.
+        
         Args:
             page (int): Número de página
             limit (int): Registros por página
             activo (bool): Filtrar por estado activo
+            cursor_id (int): ID del último usuario de la página anterior
+            contar (bool): Calcular el total también en la paginación por keyset
+            force_recount (bool): Ignorar el total cacheado
         
         Returns:
             dict: {
@@ -71,65 +228,53 @@ class UsuarioDAO:
                     'page': int,
                     'limit': int,
                     'total': int,
-                    'total_pages': int
+                    'total_pages': int,
+                    'next_cursor': int
                 }
             }
         """
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor(dictionary=True) as cursor:
-                # Contar total
-                count_query = "SELECT COUNT(*) as total FROM usuarios WHERE 1=1"
-                params = []
-                
-                if activo is not None:
-                    count_query += " AND activo = %s"
-                    params.append(activo)
-                
-                cursor.execute(count_query, params)
-                total = cursor.fetchone()['total']
-                
-                # Obtener registros paginados
-                offset = (page - 1) * limit
-                query = """
-                    SELECT u.id_usuario, 
-                    u.nombre, 
-                    u.email, 
-                    u.apellido,
-                    u.legajo,
-                    u.activo,
-                    u.created_at, l.nombre as localidad_nombre,
-                           GROUP_CONCAT(r.nombre) as roles
-                    FROM usuarios u
-                    LEFT JOIN localidades l ON u.id_localidad = l.id_localidad
-                    LEFT JOIN usuarios_roles ur ON u.id_usuario = ur.id_usuario
-                    LEFT JOIN roles r ON ur.id_rol = r.id_rol
-                    WHERE 1=1
-                """
-                
-                if activo is not None:
-                    query += " AND u.activo = %s"
-                
-                query += " GROUP BY u.id_usuario ORDER BY u.id_usuario DESC LIMIT %s OFFSET %s"
-                params.extend([limit, offset])
-                
+            filtrar = activo is not None
+            params = [activo] if filtrar else []
+            
+            total = None
+            futuro_total = None
+            if cursor_id is None or contar:
+                if not force_recount:
+                    total = _count_cache.get(activo, None)
+                if total is None:
+                    futuro_total = _consultas.submit(_contar_usuarios, filtrar, list(params))
+            
+            if cursor_id is not None:
+                query = _GET_ALL_KEYSET[filtrar]
+                params.extend([cursor_id, limit])
+            else:
+                query = _GET_ALL_PAGE[filtrar]
+                params.extend([limit, (page - 1) * limit])
+            
+            with ConectDB.get_prepared_cursor(query) as cursor:
                 cursor.execute(query, params)
                 usuarios = cursor.fetchall()
-                
-                return {
-                    'usuarios': usuarios,
-                    'pagination': {
-                        'page': page,
-                        'limit': limit,
-                        'total': total,
-                        'total_pages': (total + limit - 1) // limit
-                    }
-                }
-        except Exception as e:
-            print(f"Error getting usuarios: {e}")
+            
+            if futuro_total is not None:
+                total = futuro_total.result()
+                _count_cache.set(activo, total)
+            
+            pagination = {'limit': limit}
+            if cursor_id is None:
+                pagination['page'] = page
+            if total is not None:
+                pagination['total'] = total
+                pagination['total_pages'] = (total + limit - 1) // limit
+            pagination['next_cursor'] = _next_cursor(usuarios, limit)
+            
+            return {
+                'usuarios': usuarios,
+                'pagination': pagination
+            }
+        except Exception:
+            logger.exception("Error getting usuarios")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def get_all_sin_paginacion() -> dict:
@@ -142,8 +287,7 @@ class UsuarioDAO:
             }
         """
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor(dictionary=True) as cursor:
+            with ConectDB.get_cursor(readonly=True) as cursor:
                 query = """
                     SELECT 
                     u.id_usuario, 
@@ -157,12 +301,12 @@ class UsuarioDAO:
                     u.created_at,
                     u.updated_at, 
                     l.nombre as localidad_nombre,
-                    GROUP_CONCAT(r.nombre) as rol
+                    r.nombre as rol
                     FROM usuarios u
                     LEFT JOIN localidades l ON u.id_localidad = l.id_localidad
                     LEFT JOIN usuarios_roles ur ON u.id_usuario = ur.id_usuario
                     LEFT JOIN roles r ON ur.id_rol = r.id_rol
-                    GROUP BY u.id_usuario ORDER BY u.id_usuario DESC
+                    ORDER BY u.id_usuario DESC
                 """
                 cursor.execute(query)
                 usuarios = cursor.fetchall()
@@ -170,11 +314,9 @@ class UsuarioDAO:
                 return {
                     'usuarios': usuarios
                 }
-        except Exception as e:
-            print(f"Error getting usuarios: {e}")
+        except Exception:
+            logger.exception("Error getting usuarios")
             raise
-        finally:
-            connection.close()
 
     @staticmethod
     def get_all_localides(id_localidad: int) -> dict:
@@ -187,8 +329,7 @@ class UsuarioDAO:
             }
         """
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor(dictionary=True) as cursor:
+            with ConectDB.get_cursor(readonly=True) as cursor:
                 query = """
                     SELECT 
                     u.id_usuario, 
@@ -202,13 +343,13 @@ class UsuarioDAO:
                     u.created_at,
                     u.updated_at, 
                     l.nombre as localidad_nombre,
-                    GROUP_CONCAT(r.nombre) as rol
+                    r.nombre as rol
                     FROM usuarios u
                     LEFT JOIN localidades l ON u.id_localidad = l.id_localidad
                     LEFT JOIN usuarios_roles ur ON u.id_usuario = ur.id_usuario
                     LEFT JOIN roles r ON ur.id_rol = r.id_rol
                     WHERE l.id_localidad = %s
-                    GROUP BY u.id_usuario ORDER BY u.id_usuario DESC
+                    ORDER BY u.id_usuario DESC
                 """
                 cursor.execute(query,(id_localidad,))
                 usuarios = cursor.fetchall()
@@ -216,11 +357,9 @@ class UsuarioDAO:
                 return {
                     'usuarios': usuarios
                 }
-        except Exception as e:
-            print(f"Error getting usuarios: {e}")
+        except Exception:
+            logger.exception("Error getting usuarios")
             raise
-        finally:
-            connection.close()
 
 
     @staticmethod
@@ -235,42 +374,41 @@ class UsuarioDAO:
             dict: Datos del usuario o None
         """
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor(dictionary=True) as cursor:
-                query = """
-                    SELECT 
-                    u.id_usuario,
-                    u.username,
-                    u.nombre, 
-                    u.apellido,
-                    u.activo,
-                    u.legajo,
-                    u.email,
-                    u.created_at,
-                    u.updated_at,
-                    l.nombre AS localidad_nombre,
-                    l.id_localidad,
-                    GROUP_CONCAT(r.nombre) AS roles
-                    FROM usuarios u
-                    LEFT JOIN localidades l ON u.id_localidad = l.id_localidad
-                    LEFT JOIN usuarios_roles ur ON u.id_usuario = ur.id_usuario
-                    LEFT JOIN roles r ON ur.id_rol = r.id_rol
-                    WHERE u.id_usuario = %s
-                    GROUP BY u.id_usuario;
-                """
+            query = """
+                SELECT 
+                u.id_usuario,
+                u.username,
+                u.nombre, 
+                u.apellido,
+                u.activo,
+                u.legajo,
+                u.email,
+                u.created_at,
+                u.updated_at,
+                l.nombre AS localidad_nombre,
+                l.id_localidad,
+                r.nombre AS roles
+                FROM usuarios u
+                LEFT JOIN localidades l ON u.id_localidad = l.id_localidad
+                LEFT JOIN usuarios_roles ur ON u.id_usuario = ur.id_usuario
+                LEFT JOIN roles r ON ur.id_rol = r.id_rol
+                WHERE u.id_usuario = %s
+            """
+            with ConectDB.get_prepared_cursor(query) as cursor:
                 cursor.execute(query, (usuario_id,))
                 return cursor.fetchone()
-        except Exception as e:
-            print(f"Error getting usuario by id: {e}")
+        except Exception:
+            logger.exception("Error getting usuario by id")
             raise
-        finally:
-            connection.close()
 
     @staticmethod
     def get_by_id(usuario_id: int) -> dict:
         """
         Obtener un usuario por ID incluyendo password_hash para el refresh token
         
+        Se cachea 30 segundos por usuario; las escrituras sobre el usuario
+        (datos, contraseña, estado, rol) lo invalidan.
+        
         Args:
             usuario_id (int): ID del usuario
         
@@ -278,25 +416,28 @@ class UsuarioDAO:
             dict: Datos del usuario o None
         """
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor(dictionary=True) as cursor:
-                query = """
-                    SELECT u.*, l.nombre as localidad_nombre,
-                    GROUP_CONCAT(r.nombre) as roles
-                    FROM usuarios u         
-                    LEFT JOIN localidades l ON u.id_localidad = l.id_localidad
-                    LEFT JOIN usuarios_roles ur ON u.id_usuario = ur.id_usuario
-                    LEFT JOIN roles r ON ur.id_rol = r.id_rol
-                    WHERE u.id_usuario = %s
-                    GROUP BY u.id_usuario
-                """
-                cursor.execute(query, (usuario_id,))
-                return cursor.fetchone()
-        except Exception as e:
-            print(f"Error getting usuario by id: {e}")
+            query = """
+                SELECT u.*, l.nombre as localidad_nombre,
+                r.nombre as roles
+                FROM usuarios u         
+                LEFT JOIN localidades l ON u.id_localidad = l.id_localidad
+                LEFT JOIN usuarios_roles ur ON u.id_usuario = ur.id_usuario
+                LEFT JOIN roles r ON ur.id_rol = r.id_rol
+                WHERE u.id_usuario = %s
+            """
+            usuario = _usuario_cache.get(usuario_id, None)
+            if usuario is None:
+                with ConectDB.get_prepared_cursor(query) as cursor:
+                    cursor.execute(query, (usuario_id,))
+                    usuario = cursor.fetchone()
+                if usuario is None:
+                    return None
+                _usuario_cache.set(usuario_id, usuario)
+            # Copia: los servicios modifican la fila (por ejemplo quitan password_hash)
+            return copiar_filas(usuario)
+        except Exception:
+            logger.exception("Error getting usuario by id")
             raise
-        finally:
-            connection.close()
         
     @staticmethod
     def username(usuario_id: int) -> dict:
@@ -310,66 +451,83 @@ class UsuarioDAO:
             dict: Username del usuario o None
         """
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
-                query = """
-                    SELECT username
-                    FROM usuarios
-                    WHERE id_usuario = %s;
-                """
+            query = """
+                SELECT username
+                FROM usuarios
+                WHERE id_usuario = %s
+            """
+            with ConectDB.get_prepared_cursor(query, dictionary=False) as cursor:
                 cursor.execute(query, (usuario_id,))
                 result = cursor.fetchone()
                 return result[0] if result else None
             
-        except Exception as e:
-            print(f"Error getting usuario by id: {e}")
+        except Exception:
+            logger.exception("Error getting usuario by id")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def get_by_username(username: str) -> dict:
         """Obtener usuario por nombre de usuario"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor(dictionary=True) as cursor:
-                query = """
-                SELECT 
-                    u.*
-                , l.nombre as localidad_nombre,
-                       GROUP_CONCAT(r.nombre) as roles,
-                       GROUP_CONCAT(r.id_rol) as roles_ids
-                FROM usuarios u
-                LEFT JOIN localidades l ON u.id_localidad = l.id_localidad
-                LEFT JOIN usuarios_roles ur ON u.id_usuario = ur.id_usuario
-                LEFT JOIN roles r ON ur.id_rol = r.id_rol
-                WHERE u.username = %s
-                GROUP BY u.id_usuario
-                """
-                cursor.execute(query, (username,))
-                row = cursor.fetchone()
-                return row
-        except Exception as e:
-                print(f"Error getting usuario by username: {e}")
-                raise
-        finally:
-                connection.close()
+            with ConectDB.get_prepared_cursor(_QUERY_BY_USERNAME) as cursor:
+                cursor.execute(_QUERY_BY_USERNAME, (username,))
+                return cursor.fetchone()
+        except Exception:
+            logger.exception("Error getting usuario by username")
+            raise
+    
     
+    @staticmethod
+    def get_for_login(username: str, verificar) -> tuple:
+        """
+        Login: buscar el usuario y, si verificar(usuario) da True, devolver
+        también sus permisos
+        
+        Los permisos se leen en otra conexión (executor _consultas) mientras
+        verificar() compara el bcrypt, así la consulta se superpone con el
+        hash en lugar de sumarse. El ultimo_login se actualiza en segundo
+        plano (update_ultimo_login), fuera de la respuesta.
+        
+        Args:
+            username (str): Username del usuario
+            verificar (callable): Recibe la fila del usuario (con password_hash)
+                y devuelve True si las credenciales son válidas
+        
+        Returns:
+            tuple: (usuario o None, lista de permisos o None si no se verificó)
+        """
+        try:
+            with ConectDB.get_prepared_cursor(_QUERY_BY_USERNAME) as cursor:
+                cursor.execute(_QUERY_BY_USERNAME, (username,))
+                usuario = cursor.fetchone()
+            if not usuario or not usuario['activo']:
+                return usuario, None
+            
+            futuro_permisos = _consultas.submit(UsuarioDAO.get_permisos, usuario['id_usuario'])
+            if not verificar(usuario):
+                # El resultado de los permisos se descarta
+                return usuario, None
+            permisos = futuro_permisos.result()
+            
+            UsuarioDAO.update_ultimo_login(usuario['id_usuario'])
+            # Las requests siguientes del usuario ya encuentran sus permisos en cache
+            _permisos_cache.set(usuario['id_usuario'], frozenset(p['nombre'] for p in permisos))
+            return usuario, permisos
+        except Exception:
+            logger.exception("Error en login de usuario")
+            raise
     
     @staticmethod
     def get_by_email(email: str) -> dict:
         """Obtener usuario por email"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor(readonly=True) as cursor:
                 query = "SELECT * FROM usuarios WHERE email = %s"
                 cursor.execute(query, (email,))
                 return cursor.fetchone()
-        except Exception as e:
-            print(f"Error getting usuario by email: {e}")
+        except Exception:
+            logger.exception("Error getting usuario by email")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def update(usuario_id: int, data: dict) -> bool:
@@ -383,66 +541,64 @@ class UsuarioDAO:
         Returns:
             bool: True si se actualizó, False si no
         """
+        # Las claves fuera de _ALLOWED_UPDATE se ignoran
+        campos = tuple(key for key in _ALLOWED_UPDATE if key in data)
+        if not campos:
+            return False
+        
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
-                # Construir query dinámicamente
-                fields = []
-                values = []
-                
-                for key in ['nombre', 'apellido', 'email', 'legajo', 'id_localidad', 'activo']:
-                    if key in data:
-                        fields.append(f"{key} = %s")
-                        values.append(data[key])
-                
-                if not fields:
-                    return False
-                
+            with ConectDB.get_cursor() as cursor:
+                values = [data[key] for key in campos]
                 values.append(usuario_id)
-                query = f"UPDATE usuarios SET {', '.join(fields)} WHERE id_usuario = %s"
                 
-                cursor.execute(query, values)
-                return cursor.rowcount > 0
-        except Exception as e:
-            print(f"Error updating usuario: {e}")
-            connection.rollback()
+                cursor.execute(_build_update_sql(campos), values)
+                actualizado = cursor.rowcount > 0
+            dimensiones.invalidar('usuarios')
+            _count_cache.clear()
+            _invalidar_usuario(usuario_id)
+            return actualizado
+        except Exception:
+            logger.exception("Error updating usuario")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def update_password(usuario_id: int, password_hash: str) -> bool:
         """Actualizar contraseña de usuario"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor() as cursor:
                 query = "UPDATE usuarios SET password_hash = %s WHERE id_usuario = %s"
                 cursor.execute(query, (password_hash, usuario_id))
-                connection.commit()
-                return cursor.rowcount > 0
-        except Exception as e:
-            print(f"Error updating password: {e}")
-            connection.rollback()
+                actualizado = cursor.rowcount > 0
+            _invalidar_usuario(usuario_id)
+            return actualizado
+        except Exception:
+            logger.exception("Error updating password")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
-    def update_ultimo_login(usuario_id: int) -> bool:
-        """Actualizar fecha de último login"""
+    def update_ultimo_login(usuario_id: int):
+        """
+        Actualizar fecha de último login en segundo plano
+        
+        No bloquea al llamador: el UPDATE se encola en _bg y los errores
+        solo se informan (el dato no es crítico).
+        
+        Returns:
+            Future: con el resultado (bool) del UPDATE
+        """
+        return _bg.submit(UsuarioDAO._registrar_ultimo_login, usuario_id)
+    
+    @staticmethod
+    def _registrar_ultimo_login(usuario_id: int) -> bool:
+        """UPDATE de ultimo_login (se ejecuta en el executor _bg)"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor() as cursor:
                 query = "UPDATE usuarios SET ultimo_login = NOW() WHERE id_usuario = %s"
                 cursor.execute(query, (usuario_id,))
-                respuesta = cursor.rowcount > 0
-                return respuesta
-        except Exception as e:
-                print(f"Error updating ultimo_login: {e}")
-                connection.rollback()
-                raise
-        finally:
-                connection.close()
+                return cursor.rowcount > 0
+        except Exception:
+            logger.exception("Error updating ultimo_login")
+            return False
     
     # Esta funcion no debe estar por que el id del usuario tiene relacion con tabla auditoria.
     # @staticmethod
@@ -474,33 +630,27 @@ class UsuarioDAO:
     def exists_username(username: str) -> bool:
         """Verificar si existe un username"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
-                query = "SELECT COUNT(*) as count FROM usuarios WHERE username = %s"
+            # Alcanza con encontrar una fila en el índice UNIQUE
+            query = "SELECT 1 FROM usuarios WHERE username = %s LIMIT 1"
+            with ConectDB.get_prepared_cursor(query, dictionary=False) as cursor:
                 cursor.execute(query, (username,))
-                result = cursor.fetchone()
-                return result[0] > 0
-        except Exception as e:
-            print(f"Error checking username: {e}")
+                return cursor.fetchone() is not None
+        except Exception:
+            logger.exception("Error checking username")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def exists_email(email: str) -> bool:
         """Verificar si existe un email"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
-                query = "SELECT COUNT(*) as count FROM usuarios WHERE email = %s"
+            # Alcanza con encontrar una fila en el índice UNIQUE
+            query = "SELECT 1 FROM usuarios WHERE email = %s LIMIT 1"
+            with ConectDB.get_prepared_cursor(query, dictionary=False) as cursor:
                 cursor.execute(query, (email,))
-                result = cursor.fetchone()
-                return result[0] > 0
-        except Exception as e:
-            print(f"Error checking email: {e}")
+                return cursor.fetchone() is not None
+        except Exception:
+            logger.exception("Error checking email")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def asignar_rol(usuario_id: int, rol_id: int, asignado_por: int = None) -> bool:
@@ -512,95 +662,146 @@ class UsuarioDAO:
             raise ValueError(f"El rol con ID {rol_id} no existe")
 
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
-                query = """
-                    INSERT INTO usuarios_roles (id_usuario, id_rol, asignado_por)
-                    VALUES (%s, %s, %s)
-                    ON DUPLICATE KEY UPDATE
-                    id_rol = VALUES(id_rol),
-                    asignado_por = VALUES(asignado_por),
-                    fecha_asignacion = CURRENT_TIMESTAMP
-                """
-                cursor.execute(query, (usuario_id, rol_id, asignado_por,))
-                connection.commit()
-                return cursor.rowcount > 0
-        except Exception as e:
-            print(f"Error asignando rol: {e}")
-            connection.rollback()
+            with ConectDB.get_cursor() as cursor:
+                cursor.execute(_ASIGNAR_ROL, (usuario_id, rol_id, asignado_por,))
+                asignado = cursor.rowcount > 0
+            invalidar_permisos(usuario_id)
+            _invalidar_usuario(usuario_id)
+            return asignado
+        except Exception:
+            logger.exception("Error asignando rol")
+            raise
+    
+    @staticmethod
+    def asignar_roles(asignaciones: list, asignado_por: int = None) -> int:
+        """
+        Asignar roles a varios usuarios en una sola transacción
+        
+        Cada usuario tiene un único rol (PRIMARY KEY id_usuario en
+        usuarios_roles), así que el lote es de usuarios: executemany envía
+        un único INSERT ... VALUES (...), (...) por cada _BULK_BATCH filas.
+        
+        Args:
+            asignaciones (list): Tuplas (usuario_id, rol_id)
+            asignado_por (int): ID del usuario que asigna
+        
+        Returns:
+            int: Filas afectadas (como informa MySQL para ON DUPLICATE KEY UPDATE)
+        """
+        if not asignaciones:
+            return 0
+        
+        rol_ids = {rol_id for _, rol_id in asignaciones}
+        try:
+            with ConectDB.get_cursor(dictionary=False) as cursor:
+                # Validar todos los roles con una sola consulta
+                placeholders, params = in_params(rol_ids)
+                cursor.execute(f"SELECT id_rol FROM roles WHERE id_rol IN ({placeholders})", params)
+                faltantes = rol_ids - {row[0] for row in cursor.fetchall()}
+                if faltantes:
+                    raise ValueError(f"Los roles con ID {sorted(faltantes)} no existen")
+                
+                filas = [(usuario_id, rol_id, asignado_por) for usuario_id, rol_id in asignaciones]
+                afectadas = 0
+                for i in range(0, len(filas), _BULK_BATCH):
+                    cursor.executemany(_ASIGNAR_ROL, filas[i:i + _BULK_BATCH])
+                    afectadas += cursor.rowcount
+            for usuario_id, _ in asignaciones:
+                invalidar_permisos(usuario_id)
+                _invalidar_usuario(usuario_id)
+            return afectadas
+        except Exception:
+            logger.exception("Error asignando roles")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def quitar_rol(usuario_id: int) -> bool:
         
         """Quitar un rol de un usuario"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor() as cursor:
                 query = "DELETE FROM usuarios_roles WHERE id_usuario = %s"
                 cursor.execute(query, (usuario_id,))
-                connection.commit()
-                return cursor.rowcount > 0
-        except Exception as e:
-            print(f"Error quitando rol: {e}")
-            connection.rollback()
+                quitado = cursor.rowcount > 0
+            invalidar_permisos(usuario_id)
+            _invalidar_usuario(usuario_id)
+            return quitado
+        except Exception:
+            logger.exception("Error quitando rol")
+            raise
+    
+    @staticmethod
+    def quitar_roles(usuario_ids: list) -> int:
+        """Quitar el rol de varios usuarios (un DELETE ... IN por lote)"""
+        if not usuario_ids:
+            return 0
+        
+        try:
+            quitados = 0
+            with ConectDB.get_cursor() as cursor:
+                for lote in chunks(set(usuario_ids)):
+                    placeholders, params = in_params(lote)
+                    cursor.execute(f"DELETE FROM usuarios_roles WHERE id_usuario IN ({placeholders})", params)
+                    quitados += cursor.rowcount
+            for usuario_id in usuario_ids:
+                invalidar_permisos(usuario_id)
+                _invalidar_usuario(usuario_id)
+            return quitados
+        except Exception:
+            logger.exception("Error quitando roles")
             raise
-        finally:
-            connection.close()
 
     @staticmethod
     def get_permisos(usuario_id: int) -> dict:
         """Obtener todos los permisos de un usuario"""
         
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor(dictionary=True) as cursor:
-                query = """
-                    SELECT DISTINCT p.nombre, p.descripcion, p.recurso
-                    FROM usuarios_roles ur
-                    JOIN roles_permisos rp ON ur.id_rol = rp.id_rol
-                    JOIN permisos p ON rp.id_permiso = p.id_permiso
-                    WHERE ur.id_usuario = %s
-                    ORDER BY p.recurso, p.nombre
-                """
-                cursor.execute(query, (usuario_id,))
+            with ConectDB.get_cursor(readonly=True) as cursor:
+                cursor.execute(_QUERY_PERMISOS, (usuario_id,))
                 return cursor.fetchall()
-        except Exception as e:
-            print(f"Error getting permisos: {e}")
+        except Exception:
+            logger.exception("Error getting permisos")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
-    def tiene_permiso(usuario_id: int, nombre_permiso: str) -> bool:
-        """Verificar si un usuario tiene un permiso específico"""
+    def get_nombres_permisos(usuario_id: int) -> frozenset:
+        """
+        Obtener los nombres de los permisos de un usuario
+        
+        Se cachean por usuario durante 60 segundos; asignar/quitar roles o
+        modificar los permisos de un rol invalidan el cache.
+        """
+        permisos = _permisos_cache.get(usuario_id, None)
+        if permisos is not None:
+            return permisos
+        
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
-                query = """
-                    SELECT COUNT(*) as count
-                    FROM usuarios_roles ur
-                    JOIN roles_permisos rp ON ur.id_rol = rp.id_rol
-                    JOIN permisos p ON rp.id_permiso = p.id_permiso
-                    WHERE ur.id_usuario = %s AND p.nombre = %s
-                """
-                cursor.execute(query, (usuario_id, nombre_permiso))
-                result = cursor.fetchone()
-                return result[0] > 0 
-        except Exception as e:
-            print(f"Error checking permiso : {e}")
+            query = """
+                SELECT DISTINCT p.nombre
+                FROM usuarios_roles ur
+                JOIN roles_permisos rp ON ur.id_rol = rp.id_rol
+                JOIN permisos p ON rp.id_permiso = p.id_permiso
+                WHERE ur.id_usuario = %s
+            """
+            with ConectDB.get_prepared_cursor(query, dictionary=False) as cursor:
+                cursor.execute(query, (usuario_id,))
+                permisos = frozenset(row[0] for row in cursor.fetchall())
+            _permisos_cache.set(usuario_id, permisos)
+            return permisos
+        except Exception:
+            logger.exception("Error getting nombres de permisos")
             raise
-        finally:
-            connection.close()
+    
+    @staticmethod
+    def tiene_permiso(usuario_id: int, nombre_permiso: str) -> bool:
+        """Verificar si un usuario tiene un permiso específico"""
+        return nombre_permiso in UsuarioDAO.get_nombres_permisos(usuario_id)
 
     @staticmethod
     def get_rol(usuario_id: int) -> dict:
         """Obtener el rol principal de un usuario"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor(dictionary=False, readonly=True) as cursor:
                 query = """
                     SELECT r.nombre
                     FROM usuarios_roles ur
@@ -612,79 +813,66 @@ class UsuarioDAO:
                 cursor.execute(query, (usuario_id,))
                 result = cursor.fetchone()
                 return result[0] if result else None
-        except Exception as e:
-            print(f"Error getting rol: {e}")
+        except Exception:
+            logger.exception("Error getting rol")
             raise
-        finally:
-            connection.close()
 
     
     @staticmethod
     def rol_existe(rol_id: int) -> bool:
         """Verificar si existe un rol por ID"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
-                query = "SELECT COUNT(*) as count FROM roles WHERE id_rol = %s"
+            with ConectDB.get_cursor(dictionary=False, readonly=True) as cursor:
+                query = "SELECT 1 FROM roles WHERE id_rol = %s LIMIT 1"
                 cursor.execute(query, (rol_id,))
-                result = cursor.fetchone()
-                return result[0] > 0
-        except Exception as e:
-            print(f"Error checking rol: {e}")
+                return cursor.fetchone() is not None
+        except Exception:
+            logger.exception("Error checking rol")
             raise
-        finally:
-            connection.close()
 
 
     @staticmethod
     def activar_usuario(usuario_id: int) -> bool:
         """Activar un usuario"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor() as cursor:
                 query = "UPDATE usuarios SET activo = 1 WHERE id_usuario = %s"
                 cursor.execute(query, (usuario_id,))
-                connection.commit()
-                return cursor.rowcount > 0
-        except Exception as e:
-            print(f"Error activating usuario: {e}")
-            connection.rollback()
+                activado = cursor.rowcount > 0
+            _count_cache.clear()
+            _invalidar_usuario(usuario_id)
+            return activado
+        except Exception:
+            logger.exception("Error activating usuario")
             raise
-        finally:
-            connection.close()
     
     @staticmethod
     def desactivar_usuario(usuario_id: int) -> bool:
         """Desactivar un usuario"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor() as cursor:
                 query = "UPDATE usuarios SET activo = 0 WHERE id_usuario = %s"
                 cursor.execute(query, (usuario_id,))
-                connection.commit()
-                return cursor.rowcount > 0
-        except Exception as e:
-            print(f"Error desactivating usuario: {e}")
-            connection.rollback()
+                desactivado = cursor.rowcount > 0
+            _count_cache.clear()
+            _invalidar_usuario(usuario_id)
+            return desactivado
+        except Exception:
+            logger.exception("Error desactivating usuario")
             raise
-        finally:
-            connection.close()
 
     @staticmethod
     def get_estado(usuario_id: int) -> bool:
         """Obtener el estado activo de un usuario"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor(dictionary=False, readonly=True) as cursor:
                 query = "SELECT activo FROM usuarios WHERE id_usuario = %s"
                 cursor.execute(query, (usuario_id,))
                 result = cursor.fetchone()
                 return result[0] == 1 if result else False
-        except Exception as e:
-            print(f"Error getting estado: {e}")
+        except Exception:
+            logger.exception("Error getting estado")
             raise
-        finally:
-            connection.close()
 
     # esta funcion deberia recibir un diccionario con los datos que se desean actualiar por editor
     @staticmethod
@@ -699,51 +887,40 @@ class UsuarioDAO:
         """
         
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor() as cursor:
+            with ConectDB.get_cursor() as cursor:
 
                 # Validar campos permitidos
-                campos_permitidos = ['nombre', 'apellido', 'username', 'email', 'legajo', 'id_localidad', 'activo']
                 for key in data.keys():
-                 if key not in campos_permitidos:
+                 if key not in _ALLOWED_UPDATE_USUARIO:
                     raise ValueError(f"Campo no permitido para actualizar: {key}")
     
                 # Validar que haya al menos un campo
                 if not data:
                     raise ValueError("No se proporcionaron campos para actualizar")
                 
-                # Construir la parte SET de la query dinámicamente
-                # Ejemplo: "nombre=%s, apellido=%s, rol=%s"
-                set_clause = ", ".join([f"{campo}=%s" for campo in data.keys()])
-            
-                # Query completa
-                query = f"""
-                    UPDATE usuarios
-                    SET {set_clause}
-                    WHERE id_usuario=%s
-                """
+                # Las columnas van en el orden de _ALLOWED_UPDATE_USUARIO, así la
+                # query se arma una sola vez por combinación de campos
+                campos = tuple(key for key in _ALLOWED_UPDATE_USUARIO if key in data)
+                values = [data[key] for key in campos]
+                values.append(id_usuario)
             
-                # Los valores en el orden correcto
-                values = tuple(data.values()) + (id_usuario,)
+                cursor.execute(_build_update_sql(campos), values)
             
-                cursor.execute(query, values)
-                connection.commit()
+                actualizado = cursor.rowcount > 0  # True si actualizó al menos 1 fila
+            dimensiones.invalidar('usuarios')
+            _count_cache.clear()
+            _invalidar_usuario(id_usuario)
+            return actualizado
             
-                return cursor.rowcount > 0  # True si actualizó al menos 1 fila
-            
-        except Exception as e:
-                connection.rollback()
-                print(f"Error update usuarioDAO: {e}")
-                return False
-        finally:
-                connection.close()
+        except Exception:
+            logger.exception("Error update usuarioDAO")
+            return False
         
     @staticmethod
     def get_localidad(localidad_id: int) -> dict:
         """Obtener localidad de un usuario"""
         try:
-            connection = ConectDB.get_connection()
-            with connection.cursor(dictionary=True) as cursor:
+            with ConectDB.get_cursor(readonly=True) as cursor:
                 query = """
                         SELECT 
                         u.id_usuario, 
@@ -757,8 +934,6 @@ class UsuarioDAO:
                 
                 cursor.execute(query, (localidad_id,))
                 return cursor.fetchone()
-        except Exception as e:
-            print(f"Error getting localidad: {e}")
-            raise
-        finally:
-            connection.close()
\ No newline at end of file
+        except Exception:
+            logger.exception("Error getting localidad")
+            raise
\ No newline at end of file
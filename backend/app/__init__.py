@@ -3,32 +3,47 @@ Aplicación Flask - Aguas Rionegrinas
 Inicialización y registro de routers
 """
 
+import logging
+
 from flask import Flask
 
 from dotenv import load_dotenv
 
+# Cargar el .env una sola vez por proceso y antes de importar Config, que lee
+# las variables de entorno al definirse la clase
+load_dotenv()
+
 from .config import Config
+from .db.conexion_DB import ConectDB
+from .db.indices import verificar_indices
 from .extensions import jwt, cors, limiter
+from .utils.logs import configurar_logging
 
-# Blueprints
-from .routers.auth_routers import auth_bp
-from .routers.usuario_routers import usuario_bp
-from .routers.producto_routers import producto_bp
-from .routers.movimiento_routers import movimiento_bp
-from .routers.envio_routers import envio_bp
-from .routers.auditoria_routers import auditoria_bp
-from .routers.localidades_routers import localidades_bp
-from .routers.rol_routers import roles_bp
 
 def create_app():
-    
-    load_dotenv()
+
+    # Logging asíncrono (QueueHandler): la E/S del log sale del hilo de la request
+    configurar_logging()
+
+    # Pools de conexiones MySQL: se abren al iniciar el worker. Si la base
+    # todavía no responde, se crean en la primera request que los use
+    try:
+        ConectDB.init_pools()
+    except Exception:
+        logging.getLogger(__name__).exception("No se pudieron crear los pools de conexiones")
 
     app = Flask(__name__)
 
     
     app.config.from_object(Config)
 
+    # Índices de los que dependen los DAOs: se informan los que falten y,
+    # con AUTO_MIGRATE, se crean
+    try:
+        verificar_indices(crear=app.config["AUTO_MIGRATE"])
+    except Exception:
+        logging.getLogger(__name__).exception("No se pudieron verificar los índices")
+
     # Extensiones
     jwt.init_app(app)
 
@@ -41,7 +56,17 @@ def create_app():
     #limitacion de rutas para prevenir denegacion de servicios
     limiter.init_app(app)
     
-    # Blueprints
+    # Blueprints: se importan recién acá, así importar el paquete app (por
+    # ejemplo para usar Config) no carga todos los routers, servicios y DAOs
+    from .routers.auth_routers import auth_bp
+    from .routers.usuario_routers import usuario_bp
+    from .routers.producto_routers import producto_bp
+    from .routers.movimiento_routers import movimiento_bp
+    from .routers.envio_routers import envio_bp
+    from .routers.auditoria_routers import auditoria_bp
+    from .routers.localidades_routers import localidades_bp
+    from .routers.rol_routers import roles_bp
+
     app.register_blueprint(auth_bp, url_prefix="/api/auth")
     app.register_blueprint(usuario_bp, url_prefix="/api/usuarios")
     app.register_blueprint(producto_bp, url_prefix="/api/productos")
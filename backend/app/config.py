@@ -37,10 +37,16 @@ class Config:
     )
 
     # CORS
-    CORS_ORIGINS = os.getenv("CORS_ORIGINS", "").split(",")
+    # Se parsea una sola vez: tupla de orígenes sin espacios ni entradas vacías
+    CORS_ORIGINS = tuple(
+        origen.strip() for origen in os.getenv("CORS_ORIGINS", "").split(",") if origen.strip()
+    )
 
     # Database
     DB_HOST = os.getenv("DB_HOST")
     DB_USER = os.getenv("DB_USER")
     DB_PASSWORD = os.getenv("DB_PASSWORD")
-    DB_NAME = os.getenv("DB_NAME")
\ No newline at end of file
+    DB_NAME = os.getenv("DB_NAME")
+
+    # Crear al iniciar los índices requeridos que falten (si no, solo se informan)
+    AUTO_MIGRATE = str_to_bool(os.getenv("AUTO_MIGRATE", "False"))
\ No newline at end of file
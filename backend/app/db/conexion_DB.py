@@ -1,7 +1,9 @@
 #nos permite conectarnos a la base de datos MySQL
-from mysql.connector import connect, Error
+from mysql.connector import connect, Error, pooling
 #nos permite cargar variables de entorno desde un archivo .env
 import os
+import threading
+from contextlib import contextmanager
 #cargar las variables de entorno desde el archivo .env
 from dotenv import load_dotenv
 
@@ -9,7 +11,24 @@ from dotenv import load_dotenv
 load_dotenv()
 
 class ConectDB():
-    
+
+    # Tamaño de cada pool por proceso. Los dos pools abren todas sus conexiones
+    # al crearse, así que workers * (DB_POOL_SIZE + DB_POOL_SIZE_RO) tiene que
+    # quedar por debajo del max_connections de MySQL (151 por defecto), dejando
+    # lugar a las conexiones directas de get_connection. Cada pool necesita al
+    # menos --threads de gunicorn (8) más los hilos de fondo que lo usan: el
+    # writer de auditoría y _bg de usuarios en el pool principal (3), los
+    # executors de consultas en el de lectura (4). Si se agota, get_connection
+    # lanza PoolError en lugar de esperar.
+    _POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 12))
+    _POOL_SIZE_RO = int(os.getenv("DB_POOL_SIZE_RO", 12))
+
+    # Pool de conexiones compartido por todo el proceso (se crea al primer uso)
+    _pool = None
+    _pool_lock = threading.Lock()
+    # Pool de solo lectura: autocommit y READ COMMITTED
+    _pool_ro = None
+
     @staticmethod
     def get_connection():
         try:
@@ -23,4 +42,148 @@ class ConectDB():
         except Error as e:
             print(f"Error connecting to the database: {e}")
             return None
- 
\ No newline at end of file
+
+    @staticmethod
+    def get_pool():
+        """Obtener (o crear) el pool de conexiones"""
+        if ConectDB._pool is None:
+            with ConectDB._pool_lock:
+                if ConectDB._pool is None:
+                    ConectDB._pool = pooling.MySQLConnectionPool(
+                        pool_name="aguas_rionegrinas",
+                        pool_size=ConectDB._POOL_SIZE,
+                        pool_reset_session=True,
+                        # Descarta filas no leídas (cursores sin buffer cerrados antes de tiempo)
+                        consume_results=True,
+                        host=os.getenv("DB_HOST"),
+                        user=os.getenv("DB_USER"),
+                        password=os.getenv("DB_PASSWORD"),
+                        database=os.getenv("DB_NAME")
+                    )
+        return ConectDB._pool
+
+    @staticmethod
+    def get_pool_readonly():
+        """
+        Obtener (o crear) el pool de conexiones de solo lectura
+
+        Las conexiones se abren en autocommit y con aislamiento READ COMMITTED
+        (configurado una sola vez al conectar). Como los lectores no dejan
+        estado de sesión, no se resetea la sesión al devolverlas al pool.
+        """
+        if ConectDB._pool_ro is None:
+            with ConectDB._pool_lock:
+                if ConectDB._pool_ro is None:
+                    ConectDB._pool_ro = pooling.MySQLConnectionPool(
+                        pool_name="aguas_rionegrinas_ro",
+                        pool_size=ConectDB._POOL_SIZE_RO,
+                        pool_reset_session=False,
+                        consume_results=True,
+                        autocommit=True,
+                        init_command="SET SESSION TRANSACTION ISOLATION LEVEL READ COMMITTED",
+                        host=os.getenv("DB_HOST"),
+                        user=os.getenv("DB_USER"),
+                        password=os.getenv("DB_PASSWORD"),
+                        database=os.getenv("DB_NAME")
+                    )
+        return ConectDB._pool_ro
+
+    @staticmethod
+    def init_pools():
+        """
+        Crear los pools al iniciar la aplicación (una vez por proceso/worker)
+
+        Así las conexiones se abren antes de la primera request y no durante ella.
+        """
+        ConectDB.get_pool()
+        ConectDB.get_pool_readonly()
+
+    @staticmethod
+    @contextmanager
+    def get_prepared_cursor(query, dictionary=True):
+        """
+        Obtener un cursor preparado de solo lectura para una consulta fija
+
+        Cada conexión del pool de solo lectura guarda sus cursores preparados
+        por consulta: la sentencia se prepara una vez por conexión y las
+        siguientes llamadas solo envían los parámetros (protocolo binario).
+        Funciona porque ese pool no resetea la sesión al devolver la conexión;
+        si la conexión se reconectó (cambia connection_id) se vuelven a preparar.
+
+        El llamador debe ejecutar exactamente esa query y leer todas las filas.
+
+        Uso:
+            with ConectDB.get_prepared_cursor(query) as cursor:
+                cursor.execute(query, params)
+                return cursor.fetchone()
+        """
+        connection = ConectDB.get_pool_readonly().get_connection()
+        try:
+            # Los cursores se guardan en la conexión real (no en el envoltorio
+            # del pool, que se crea de nuevo en cada get_connection)
+            cnx = connection._cnx
+            cache = getattr(cnx, '_stmt_cache', None)
+            if cache is None or cache[0] != cnx.connection_id:
+                cache = cnx._stmt_cache = (cnx.connection_id, {})
+            cursores = cache[1]
+
+            key = (query, dictionary)
+            cursor = cursores.get(key)
+            if cursor is None:
+                cursor = cursores[key] = connection.cursor(dictionary=dictionary, prepared=True)
+
+            try:
+                yield cursor
+            except Exception:
+                # El cursor puede quedar en un estado inválido: se descarta
+                cursores.pop(key, None)
+                try:
+                    cursor.close()
+                except Exception:
+                    pass
+                raise
+        finally:
+            connection.close()
+
+    @staticmethod
+    @contextmanager
+    def get_cursor(dictionary=True, prepared=False, readonly=False):
+        """
+        Obtener un cursor sobre una conexión del pool
+
+        Hace commit si el bloque termina sin errores y rollback si lanza una
+        excepción. Al salir, la conexión se devuelve al pool (no se cierra).
+
+        Con prepared=True se usa un cursor de sentencias preparadas (protocolo
+        binario): MySQL parsea la sentencia una vez y la reutiliza en las
+        siguientes ejecuciones del mismo cursor.
+
+        Con readonly=True se usa el pool de solo lectura (autocommit, READ
+        COMMITTED): no hay BEGIN/COMMIT implícitos. Solo para SELECT.
+
+        Uso:
+            with ConectDB.get_cursor() as cursor:
+                cursor.execute(query, params)
+                return cursor.fetchall()
+        """
+        if readonly:
+            connection = ConectDB.get_pool_readonly().get_connection()
+            cursor = connection.cursor(dictionary=dictionary, prepared=prepared)
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+                connection.close()
+            return
+
+        connection = ConectDB.get_pool().get_connection()
+        cursor = connection.cursor(dictionary=dictionary, prepared=prepared)
+        try:
+            yield cursor
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            cursor.close()
+            connection.close()
@@ -0,0 +1,83 @@
+"""
+Verificación de índices al iniciar la aplicación
+Las consultas de los DAOs dependen de estos índices; sin ellos se degradan a
+recorridos completos de tabla. El esquema completo lo crea
+init_db_aguas_rionegrinas.py; acá solo se controla que lo esencial exista.
+"""
+
+import logging
+
+from app.db.conexion_DB import ConectDB
+
+logger = logging.getLogger(__name__)
+
+# (tabla, columnas, nombre para crearlo, unique)
+# Alcanza con que algún índice empiece con esas columnas. En InnoDB cada índice
+# secundario incluye la PRIMARY KEY al final, así que (activo) ya sirve como
+# (activo, id_usuario) para el listado filtrado y paginado por keyset.
+INDICES_REQUERIDOS = (
+    ('usuarios', ('username',), 'idx_usuarios_username', True),
+    ('usuarios', ('email',), 'idx_usuarios_email', True),
+    ('usuarios', ('id_localidad',), 'idx_usuarios_localidad', False),
+    ('usuarios', ('activo',), 'idx_usuarios_activo', False),
+    ('usuarios_roles', ('id_usuario',), 'idx_ur_usuario', False),
+)
+
+
+def _indices_de(cursor, tabla: str) -> list:
+    """Índices de una tabla: lista de (columnas, unique)"""
+    cursor.execute("""
+        SELECT index_name, column_name, non_unique
+        FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s
+        ORDER BY index_name, seq_in_index
+    """, (tabla,))
+
+    indices = {}
+    for nombre, columna, non_unique in cursor.fetchall():
+        columnas, _ = indices.get(nombre, ((), False))
+        indices[nombre] = (columnas + (columna.lower(),), not non_unique)
+    return list(indices.values())
+
+
+def _cubierto(indices: list, columnas: tuple, unique: bool) -> bool:
+    """True si algún índice empieza con esas columnas (y es UNIQUE si hace falta)"""
+    for existentes, es_unique in indices:
+        if unique:
+            if es_unique and existentes == columnas:
+                return True
+        elif existentes[:len(columnas)] == columnas:
+            return True
+    return False
+
+
+def verificar_indices(crear: bool = False) -> list:
+    """
+    Verificar que existan los índices de INDICES_REQUERIDOS
+
+    Args:
+        crear (bool): Crear los que falten (Config.AUTO_MIGRATE); si es False
+            solo se informan
+
+    Returns:
+        list: Nombres de los índices que faltaban
+    """
+    faltantes = []
+    with ConectDB.get_cursor(dictionary=False) as cursor:
+        indices_por_tabla = {}
+        for tabla, columnas, nombre, unique in INDICES_REQUERIDOS:
+            if tabla not in indices_por_tabla:
+                indices_por_tabla[tabla] = _indices_de(cursor, tabla)
+
+            if _cubierto(indices_por_tabla[tabla], columnas, unique):
+                continue
+
+            faltantes.append(nombre)
+            if not crear:
+                logger.warning("Falta el índice %s en %s (%s)", nombre, tabla, ", ".join(columnas))
+                continue
+
+            tipo = "UNIQUE " if unique else ""
+            cursor.execute(f"CREATE {tipo}INDEX {nombre} ON {tabla} ({', '.join(columnas)})")
+            logger.info("Índice %s creado en %s", nombre, tabla)
+    return faltantes
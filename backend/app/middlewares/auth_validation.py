@@ -6,8 +6,55 @@ Protege contra SQL injection y valida formato de credenciales
 """
 
 from functools import wraps
-from flask import request, jsonify
+from flask import request, g
+from app.utils.respuestas import json_response, leer_json
 import re
+import string
+
+
+# Patrones de SQL injection compilados una sola vez (una alternancia por
+# conjunto: un único recorrido del texto en lugar de uno por patrón)
+_SQL_INJECTION_LOGIN_RE = re.compile(
+    r"('|(\\')|(;)|(--)|(\/\*)|(xp_))"  # Comillas, comentarios SQL
+    r"|(\bunion\b.*\bselect\b)"  # UNION SELECT
+    r"|(\bdrop\b.*\btable\b)"  # DROP TABLE
+    r"|(\binsert\b.*\binto\b)"  # INSERT INTO
+    r"|(\bupdate\b.*\bset\b)"  # UPDATE SET
+    r"|(\bdelete\b.*\bfrom\b)",  # DELETE FROM
+    re.IGNORECASE
+)
+
+_SQL_INJECTION_PASSWORD_RE = re.compile(
+    r"('|(\\')|(;)|(--)|(\/\*))"
+    r"|(\bunion\b.*\bselect\b)"
+    r"|(\bdrop\b.*\btable\b)",
+    re.IGNORECASE
+)
+
+# Tamaño máximo del body (bytes): credenciales, nunca más que unos pocos campos
+_MAX_BODY = 8 * 1024
+
+# Respuestas de error fijas (se arman una sola vez)
+_ERR_BODY_GRANDE = {
+    'error': 'Payload demasiado grande',
+    'detail': f'El body no puede exceder {_MAX_BODY} bytes'
+}
+_ERR_JSON_INVALIDO = {
+    'error': 'JSON inválido',
+    'detail': 'El body debe contener JSON válido'
+}
+_ERR_DATOS_FALTANTES = {
+    'error': 'Datos faltantes',
+    'detail': 'El body debe contener JSON válido'
+}
+
+# sanitize_string: caracteres sueltos que se borran (una pasada con translate)
+# y secuencias de varios caracteres (un regex)
+_SANITIZE_DEL = str.maketrans('', '', "'\";")
+_SANITIZE_MULTICHAR_RE = re.compile(r"--|/\*|\*/|xp_")
+
+# Caracteres permitidos en el username (más rápido que un regex de clase)
+_USERNAME_CHARS = frozenset(string.ascii_letters + string.digits + "_-")
 
 
 def validate_credentials(require_current_password=False):
@@ -37,15 +84,22 @@ def validate_credentials(require_current_password=False):
     def decorator(fn):
         @wraps(fn)
         def wrapper(*args, **kwargs):
+            # Rechazar bodies demasiado grandes antes de parsear el JSON
+            content_length = request.content_length
+            if content_length is not None and content_length > _MAX_BODY:
+                return json_response(_ERR_BODY_GRANDE, 413)
+            
             try:
-                data = request.get_json()
+                # Se parsea una sola vez: la vista lo lee de g.validated_json
+                try:
+                    data = leer_json()
+                except ValueError:
+                    return json_response(_ERR_JSON_INVALIDO, 400)
+                g.validated_json = data
                 
                 # Validar que venga JSON
                 if not data:
-                    return jsonify({
-                        'error': 'Datos faltantes',
-                        'detail': 'El body debe contener JSON válido'
-                    }), 400
+                    return json_response(_ERR_DATOS_FALTANTES, 400)
                 
                 # Para login
                 if not require_current_password:
@@ -54,63 +108,50 @@ def validate_credentials(require_current_password=False):
                     
                     # Validar campos requeridos
                     if not username or not password:
-                        return jsonify({
+                        return json_response({
                             'error': 'Datos incompletos',
                             'detail': 'Username y password son requeridos'
-                        }), 400
+                        }, 400)
                     
                     # Validar tipos
                     if not isinstance(username, str) or not isinstance(password, str):
-                        return jsonify({
+                        return json_response({
                             'error': 'Tipo de dato inválido',
                             'detail': 'Username y password deben ser strings'
-                        }), 400
+                        }, 400)
                     
                     # Validar longitud mínima de password
                     if len(password) < 6:
-                        return jsonify({
+                        return json_response({
                             'error': 'Password inválido',
                             'detail': 'El password debe tener al menos 6 caracteres'
-                        }), 400
+                        }, 400)
                     
                     # Validar longitud de username
                     if len(username) < 3 or len(username) > 50:
-                        return jsonify({
+                        return json_response({
                             'error': 'Username inválido',
                             'detail': 'El username debe tener entre 3 y 50 caracteres'
-                        }), 400
+                        }, 400)
                     
                     # Sanitizar username - solo alfanuméricos, guiones y guión bajo
-                    if not re.match(r'^[a-zA-Z0-9_-]+$', username):
-                        return jsonify({
+                    if not _USERNAME_CHARS.issuperset(username):
+                        return json_response({
                             'error': 'Username inválido',
                             'detail': 'El username solo puede contener letras, números, guiones y guión bajo'
-                        }), 400
+                        }, 400)
                     
                     # Protección contra patrones de SQL injection
-                    sql_patterns = [
-                        r"('|(\\')|(;)|(--)|(\/\*)|(xp_))",  # Comillas, comentarios SQL
-                        r"(\bunion\b.*\bselect\b)",  # UNION SELECT
-                        r"(\bdrop\b.*\btable\b)",  # DROP TABLE
-                        r"(\binsert\b.*\binto\b)",  # INSERT INTO
-                        r"(\bupdate\b.*\bset\b)",  # UPDATE SET
-                        r"(\bdelete\b.*\bfrom\b)",  # DELETE FROM
-                    ]
-                    
-                    username_lower = username.lower()
-                    password_lower = password.lower()
-                    
-                    for pattern in sql_patterns:
-                        if re.search(pattern, username_lower, re.IGNORECASE):
-                            return jsonify({
-                                'error': 'Datos sospechosos detectados',
-                                'detail': 'El username contiene caracteres no permitidos'
-                            }), 400
-                        if re.search(pattern, password_lower, re.IGNORECASE):
-                            return jsonify({
-                                'error': 'Datos sospechosos detectados',
-                                'detail': 'El password contiene patrones no permitidos'
-                            }), 400
+                    if _SQL_INJECTION_LOGIN_RE.search(username):
+                        return json_response({
+                            'error': 'Datos sospechosos detectados',
+                            'detail': 'El username contiene caracteres no permitidos'
+                        }, 400)
+                    if _SQL_INJECTION_LOGIN_RE.search(password):
+                        return json_response({
+                            'error': 'Datos sospechosos detectados',
+                            'detail': 'El password contiene patrones no permitidos'
+                        }, 400)
                 #agregar validacion de para cuando mandan un id ejemplo sea positivo y no contenga letras, no sql injection
 
                 
@@ -122,61 +163,54 @@ def validate_credentials(require_current_password=False):
                     
                     # Validar campos requeridos
                     if not password_actual or not password_nuevo:
-                        return jsonify({
+                        return json_response({
                             'error': 'Datos incompletos',
                             'detail': 'Password actual y nuevo son requeridos'
-                        }), 400
+                        }, 400)
                     
                     # Validar tipos
                     if not isinstance(password_actual, str) or not isinstance(password_nuevo, str):
-                        return jsonify({
+                        return json_response({
                             'error': 'Tipo de dato inválido',
                             'detail': 'Los passwords deben ser strings'
-                        }), 400
+                        }, 400)
                     
                     # Validar longitud mínima
                     if len(password_nuevo) < 6:
-                        return jsonify({
+                        return json_response({
                             'error': 'Password nuevo inválido',
                             'detail': 'El password debe tener al menos 6 caracteres'
-                        }), 400
+                        }, 400)
                     
                     # Validar longitud máxima (prevenir DoS)
                     if len(password_nuevo) > 128 or len(password_actual) > 128:
-                        return jsonify({
+                        return json_response({
                             'error': 'Password demasiado largo',
                             'detail': 'El password no puede exceder 128 caracteres'
-                        }), 400
+                        }, 400)
                     
                     # Validar que sean diferentes
                     if password_actual == password_nuevo:
-                        return jsonify({
+                        return json_response({
                             'error': 'Password inválido',
                             'detail': 'El password nuevo debe ser diferente al actual'
-                        }), 400
+                        }, 400)
                     
                     # Protección contra SQL injection en passwords
-                    sql_patterns = [
-                        r"('|(\\')|(;)|(--)|(\/\*))",
-                        r"(\bunion\b.*\bselect\b)",
-                        r"(\bdrop\b.*\btable\b)",
-                    ]
-                    
-                    for pattern in sql_patterns:
-                        if re.search(pattern, password_nuevo.lower(), re.IGNORECASE):
-                            return jsonify({
-                                'error': 'Password inválido',
-                                'detail': 'El password contiene patrones no permitidos'
-                            }), 400
+                    if _SQL_INJECTION_PASSWORD_RE.search(password_nuevo):
+                        return json_response({
+                            'error': 'Password inválido',
+                            'detail': 'El password contiene patrones no permitidos'
+                        }, 400)
                 
                 # Si pasa todas las validaciones, ejecutar la función
                 return fn(*args, **kwargs)
                 
             except Exception as e:
-                return jsonify({
+                return json_response({
                     'error': 'Error al validar datos',
                     'detail': str(e)
-                }), 500
+                }, 500)
         
         return wrapper
     return decorator
@@ -199,9 +233,11 @@ def sanitize_string(value: str, max_length: int = 255) -> str:
     # Truncar si es muy largo
     value = value[:max_length]
     
-    # Eliminar caracteres peligrosos
-    dangerous_chars = ["'", '"', ';', '--', '/*', '*/', 'xp_']
-    for char in dangerous_chars:
-        value = value.replace(char, '')
+    # Eliminar caracteres peligrosos (se repite por si al borrar una
+    # secuencia se forma otra, ej. "-/**/-")
+    value = value.translate(_SANITIZE_DEL)
+    value, n = _SANITIZE_MULTICHAR_RE.subn('', value)
+    while n:
+        value, n = _SANITIZE_MULTICHAR_RE.subn('', value)
     
     return value.strip()
\ No newline at end of file
@@ -4,11 +4,72 @@ Protege contra SQL injection y valida formato de datos
 """
 
 from functools import wraps
-from flask import request, jsonify
+from flask import request, g
+from app.utils.respuestas import json_response, leer_json
 import re
+import string
 from decimal import Decimal, InvalidOperation
 
 
+# Patrones de SQL injection, compilados una sola vez en una única alternancia
+_SQL_INJECTION_RE = re.compile(
+    r"('|(\\')|(;)|(--)|(/\*))"  # Comillas, punto y coma, comentarios
+    r"|(\bunion\b.*\bselect\b)"  # UNION SELECT
+    r"|(\bdrop\b.*\b(table|database)\b)"  # DROP TABLE/DATABASE
+    r"|(\binsert\b.*\binto\b)"  # INSERT INTO
+    r"|(\bupdate\b.*\bset\b)"  # UPDATE SET
+    r"|(\bdelete\b.*\bfrom\b)"  # DELETE FROM
+    r"|(\bexec\b.*\()"  # EXEC(
+    r"|(\bscript\b.*>)"  # <script> tag
+    r"|(\bor\b.*=.*)"  # OR 1=1
+    r"|(\band\b.*=.*)"  # AND 1=1
+    r"|xp_cmdshell"  # SQL Server command execution
+    r"|(\bselect\b.*\bfrom\b)",  # SELECT FROM
+    re.IGNORECASE
+)
+
+# Tamaño máximo del body (bytes) de un producto
+_MAX_BODY = 64 * 1024
+
+# Respuestas de error fijas (se arman una sola vez)
+_ERR_BODY_GRANDE = {
+    'error': 'Payload demasiado grande',
+    'detail': f'El body no puede exceder {_MAX_BODY} bytes'
+}
+_ERR_JSON_INVALIDO = {
+    'error': 'JSON inválido',
+    'detail': 'El body debe contener JSON válido'
+}
+_ERR_DATOS_FALTANTES = {
+    'error': 'Datos faltantes',
+    'detail': 'El body debe contener JSON válido'
+}
+
+# Valor máximo de los precios (hasta 2 decimales), también en centavos
+_MAX_PRECIO = Decimal('999999999.99')
+_MAX_CENTAVOS = 99_999_999_999
+_CENT = Decimal('0.01')
+
+# Unidades de medida aceptadas (el orden es el del mensaje de error)
+_UNIDADES = (
+    'kg', 'g', 'mg', 'l', 'ml', 'unidad', 'unidades',
+    'caja', 'cajas', 'paquete', 'paquetes', 'bolsa', 'bolsas',
+    'm', 'cm', 'mm', 'm2', 'm3', 'docena'
+)
+_UNIDADES_VALIDAS = frozenset(_UNIDADES)
+_ERR_UNIDAD = {
+    'error': 'Unidad de medida inválida',
+    'detail': f'Unidades válidas: {", ".join(_UNIDADES)}'
+}
+
+# Caracteres de control (0x00-0x1F y 0x7F) que borra sanitize_producto_string
+_CTRL_DEL = dict.fromkeys([*range(0x20), 0x7F])
+
+# Tabla que borra los caracteres permitidos en el nombre: si después de
+# traducir solo queda espacio en blanco (\s), el nombre es válido
+_NOMBRE_DEL = str.maketrans('', '', string.ascii_letters + string.digits + "áéíóúÁÉÍÓÚñÑ-()./")
+
+
 def validate_producto_data(is_update=False):
     """
     Valida datos de creación/actualización de productos
@@ -44,243 +105,311 @@ def validate_producto_data(is_update=False):
     def decorator(fn):
         @wraps(fn)
         def wrapper(*args, **kwargs):
+            # Rechazar bodies demasiado grandes antes de parsear el JSON
+            content_length = request.content_length
+            if content_length is not None and content_length > _MAX_BODY:
+                return json_response(_ERR_BODY_GRANDE, 413)
+            
             try:
-                data = request.get_json()
+                # Se parsea una sola vez: la vista lo lee de g.validated_json
+                try:
+                    data = leer_json()
+                except ValueError:
+                    return json_response(_ERR_JSON_INVALIDO, 400)
+                g.validated_json = data
                 
                 # Validar que venga JSON
                 if not data:
-                    return jsonify({
-                        'error': 'Datos faltantes',
-                        'detail': 'El body debe contener JSON válido'
-                    }), 400
-                
-                # ===== VALIDAR NOMBRE =====
-                if 'nombre' in data:
-                    nombre = data.get('nombre')
-                    
-                    # Validar tipo
-                    if not isinstance(nombre, str):
-                        return jsonify({
-                            'error': 'Nombre inválido',
-                            'detail': 'El nombre debe ser un string'
-                        }), 400
-                    
-                    # Sanitizar y validar longitud
-                    nombre = nombre.strip()
-                    if len(nombre) < 3 or len(nombre) > 200:
-                        return jsonify({
-                            'error': 'Nombre inválido',
-                            'detail': 'El nombre debe tener entre 3 y 200 caracteres'
-                        }), 400
-                    
-                    # Validar caracteres permitidos (letras, números, espacios, guiones, paréntesis)
-                    if not re.match(r'^[a-zA-Z0-9áéíóúÁÉÍÓÚñÑ\s\-\(\)\.\/]+$', nombre):
-                        return jsonify({
-                            'error': 'Nombre inválido',
-                            'detail': 'El nombre contiene caracteres no permitidos'
-                        }), 400
-                    
-                    # Protección SQL injection
-                    if _tiene_patron_sql_injection(nombre):
-                        return jsonify({
-                            'error': 'Datos sospechosos detectados',
-                            'detail': 'El nombre contiene patrones no permitidos'
-                        }), 400
-                    
-                    data['nombre'] = nombre
-                
-                elif not is_update:
-                    # Campo requerido para creación
-                    return jsonify({
-                        'error': 'Campo requerido',
-                        'detail': 'El nombre es obligatorio'
-                    }), 400
+                    return json_response(_ERR_DATOS_FALTANTES, 400)
                 
-                            
-                # ===== VALIDAR DESCRIPCIÓN =====
-                if 'descripcion' in data:
-                    descripcion = data.get('descripcion')
-                    
-                    if descripcion is not None:  # Puede ser None o vacío
-                        if not isinstance(descripcion, str):
-                            return jsonify({
-                                'error': 'Descripción inválida',
-                                'detail': 'La descripción debe ser un string'
-                            }), 400
-                        
-                        descripcion = descripcion.strip()
-                        
-                        if len(descripcion) > 1000:
-                            return jsonify({
-                                'error': 'Descripción demasiado larga',
-                                'detail': 'La descripción no puede exceder 1000 caracteres'
-                            }), 400
-                        
-                        # Permitir más caracteres en descripción pero validar SQL injection
-                        if _tiene_patron_sql_injection(descripcion):
-                            return jsonify({
-                                'error': 'Datos sospechosos detectados',
-                                'detail': 'La descripción contiene patrones no permitidos'
-                            }), 400
-                        
-                        data['descripcion'] = descripcion
-                
-                # ===== VALIDAR PRECIO/COSTO =====
-                for campo in ['precio', 'costo', 'precio_venta']:
+                # Validar cada campo presente; los obligatorios al crear deben venir
+                for campo, validador, requerido in _SCHEMA:
                     if campo in data:
-                        valor = data.get(campo)
-                        
-                        if valor is not None:
-                            try:
-                                # Convertir a Decimal para validación precisa
-                                if isinstance(valor, str):
-                                    valor_decimal = Decimal(valor)
-                                else:
-                                    valor_decimal = Decimal(str(valor))
-                                
-                                # Validar que sea positivo
-                                if valor_decimal < 0:
-                                    return jsonify({
-                                        'error': f'{campo.capitalize()} inválido',
-                                        'detail': f'El {campo} debe ser un valor positivo'
-                                    }), 400
-                                
-                                # Validar máximo 2 decimales
-                                if valor_decimal.as_tuple().exponent < -2:
-                                    return jsonify({
-                                        'error': f'{campo.capitalize()} inválido',
-                                        'detail': f'El {campo} solo puede tener hasta 2 decimales'
-                                    }), 400
-                                
-                                # Validar rango máximo (evitar valores absurdos)
-                                if valor_decimal > Decimal('999999999.99'):
-                                    return jsonify({
-                                        'error': f'{campo.capitalize()} inválido',
-                                        'detail': f'El {campo} excede el valor máximo permitido'
-                                    }), 400
-                                
-                                data[campo] = float(valor_decimal)
-                                
-                            except (InvalidOperation, ValueError):
-                                return jsonify({
-                                    'error': f'{campo.capitalize()} inválido',
-                                    'detail': f'El {campo} debe ser un número válido'
-                                }), 400
-                        
-                        elif not is_update and campo in ['precio', 'costo']:
-                            # Precio/Costo requeridos en creación
-                            return jsonify({
-                                'error': 'Campo requerido',
-                                'detail': f'El {campo} es obligatorio'
-                            }), 400
-                
-                # ===== VALIDAR ID CATEGORÍA =====
-                if 'id_categoria' in data:
-                    id_categoria = data.get('id_categoria')
-                    
-                    if not isinstance(id_categoria, int) or id_categoria <= 0:
-                        return jsonify({
-                            'error': 'Categoría inválida',
-                            'detail': 'El id_categoria debe ser un entero positivo'
-                        }), 400
-                
-                elif not is_update:
-                    return jsonify({
-                        'error': 'Campo requerido',
-                        'detail': 'La categoría es obligatoria'
-                    }), 400
-                
-                # ===== VALIDAR STOCK MÍNIMO =====
-                if 'stock_minimo' in data:
-                    stock_minimo = data.get('stock_minimo')
-                    
-                    if stock_minimo is not None:
-                        if not isinstance(stock_minimo, int) or stock_minimo < 0:
-                            return jsonify({
-                                'error': 'Stock mínimo inválido',
-                                'detail': 'El stock_minimo debe ser un entero >= 0'
-                            }), 400
-                        
-                        # Validar rango razonable
-                        if stock_minimo > 1000000:
-                            return jsonify({
-                                'error': 'Stock mínimo inválido',
-                                'detail': 'El stock_minimo excede el valor máximo permitido'
-                            }), 400
-                
-                # ===== VALIDAR UNIDAD DE MEDIDA =====
-                if 'unidad_medida' in data:
-                    unidad_medida = data.get('unidad_medida')
-                    
-                    if unidad_medida is not None:
-                        if not isinstance(unidad_medida, str):
-                            return jsonify({
-                                'error': 'Unidad de medida inválida',
-                                'detail': 'La unidad_medida debe ser un string'
-                            }), 400
-                        
-                        unidad_medida = unidad_medida.strip().lower()
-                        
-                        # Lista de unidades válidas
-                        unidades_validas = [
-                            'kg', 'g', 'mg', 'l', 'ml', 'unidad', 'unidades',
-                            'caja', 'cajas', 'paquete', 'paquetes', 'bolsa', 'bolsas',
-                            'm', 'cm', 'mm', 'm2', 'm3', 'docena'
-                        ]
-                        
-                        if unidad_medida not in unidades_validas:
-                            return jsonify({
-                                'error': 'Unidad de medida inválida',
-                                'detail': f'Unidades válidas: {", ".join(unidades_validas)}'
-                            }), 400
-                        
-                        data['unidad_medida'] = unidad_medida
-                
-                # ===== VALIDAR CÓDIGO DE BARRAS =====
-                if 'codigo_barras' in data:
-                    codigo_barras = data.get('codigo_barras')
-                    
-                    if codigo_barras is not None:
-                        if not isinstance(codigo_barras, str):
-                            return jsonify({
-                                'error': 'Código de barras inválido',
-                                'detail': 'El codigo_barras debe ser un string'
-                            }), 400
-                        
-                        codigo_barras = codigo_barras.strip()
-                        
-                        # Solo dígitos, longitud entre 8-18 caracteres (EAN-8, EAN-13, etc)
-                        if not re.match(r'^\d{8,18}$', codigo_barras):
-                            return jsonify({
-                                'error': 'Código de barras inválido',
-                                'detail': 'El código de barras debe contener solo dígitos (8-18 caracteres)'
-                            }), 400
-                        
-                        data['codigo_barras'] = codigo_barras
-                
-                # ===== VALIDAR ACTIVO (BOOLEAN) =====
-                if 'activo' in data:
-                    activo = data.get('activo')
-                    
-                    if not isinstance(activo, bool):
-                        return jsonify({
-                            'error': 'Estado inválido',
-                            'detail': 'El campo activo debe ser true o false'
-                        }), 400
+                        error = validador(data, campo, is_update)
+                        if error:
+                            return json_response(error, 400)
+                    elif requerido and not is_update:
+                        return json_response({
+                            'error': 'Campo requerido',
+                            'detail': requerido
+                        }, 400)
                 
                 # Si pasa todas las validaciones, ejecutar la función
                 return fn(*args, **kwargs)
                 
             except Exception as e:
-                return jsonify({
+                return json_response({
                     'error': 'Error al validar datos',
                     'detail': str(e)
-                }), 500
+                }, 500)
         
         return wrapper
     return decorator
 
 
+# ===== VALIDADORES POR CAMPO =====
+# Cada validador recibe (data, campo, is_update), normaliza data[campo] si
+# corresponde y devuelve el dict de error (400) o None si el valor es válido.
+
+def _validar_nombre(data: dict, campo: str, is_update: bool):
+    """Nombre: string de 3-200 caracteres permitidos, sin patrones SQL"""
+    nombre = data.get(campo)
+    
+    # Validar tipo
+    if not isinstance(nombre, str):
+        return {
+            'error': 'Nombre inválido',
+            'detail': 'El nombre debe ser un string'
+        }
+    
+    # Sanitizar y validar longitud
+    nombre = nombre.strip()
+    if len(nombre) < 3 or len(nombre) > 200:
+        return {
+            'error': 'Nombre inválido',
+            'detail': 'El nombre debe tener entre 3 y 200 caracteres'
+        }
+    
+    # Validar caracteres permitidos (letras, números, espacios, guiones, paréntesis)
+    resto = nombre.translate(_NOMBRE_DEL)
+    if resto and not resto.isspace():
+        return {
+            'error': 'Nombre inválido',
+            'detail': 'El nombre contiene caracteres no permitidos'
+        }
+    
+    # Protección SQL injection
+    if _tiene_patron_sql_injection(nombre):
+        return {
+            'error': 'Datos sospechosos detectados',
+            'detail': 'El nombre contiene patrones no permitidos'
+        }
+    
+    data[campo] = nombre
+    return None
+
+
+def _validar_descripcion(data: dict, campo: str, is_update: bool):
+    """Descripción: opcional (None o vacío), hasta 1000 caracteres, sin patrones SQL"""
+    descripcion = data.get(campo)
+    if descripcion is None:
+        return None
+    
+    if not isinstance(descripcion, str):
+        return {
+            'error': 'Descripción inválida',
+            'detail': 'La descripción debe ser un string'
+        }
+    
+    descripcion = descripcion.strip()
+    
+    if len(descripcion) > 1000:
+        return {
+            'error': 'Descripción demasiado larga',
+            'detail': 'La descripción no puede exceder 1000 caracteres'
+        }
+    
+    # Permitir más caracteres en descripción pero validar SQL injection
+    if _tiene_patron_sql_injection(descripcion):
+        return {
+            'error': 'Datos sospechosos detectados',
+            'detail': 'La descripción contiene patrones no permitidos'
+        }
+    
+    data[campo] = descripcion
+    return None
+
+
+def _validar_precio(data: dict, campo: str, is_update: bool):
+    """Precio/costo: positivo, hasta 2 decimales; precio y costo no pueden ser null al crear"""
+    valor = data.get(campo)
+    
+    if valor is None:
+        if not is_update and campo in ('precio', 'costo'):
+            # Precio/Costo requeridos en creación
+            return {
+                'error': 'Campo requerido',
+                'detail': f'El {campo} es obligatorio'
+            }
+        return None
+    
+    try:
+        # Validar en centavos enteros (sin Decimal para int/float)
+        centavos, exacto = _a_centavos(valor)
+    except (InvalidOperation, ValueError, OverflowError):
+        return {
+            'error': f'{campo.capitalize()} inválido',
+            'detail': f'El {campo} debe ser un número válido'
+        }
+    
+    # Validar que sea positivo
+    if centavos < 0:
+        return {
+            'error': f'{campo.capitalize()} inválido',
+            'detail': f'El {campo} debe ser un valor positivo'
+        }
+    
+    # Validar rango máximo (evitar valores absurdos)
+    if centavos > _MAX_CENTAVOS:
+        return {
+            'error': f'{campo.capitalize()} inválido',
+            'detail': f'El {campo} excede el valor máximo permitido'
+        }
+    
+    # Validar máximo 2 decimales
+    if not exacto:
+        return {
+            'error': f'{campo.capitalize()} inválido',
+            'detail': f'El {campo} solo puede tener hasta 2 decimales'
+        }
+    
+    data[campo] = centavos / 100
+    return None
+
+
+def _validar_id_categoria(data: dict, campo: str, is_update: bool):
+    """ID categoría: entero positivo"""
+    id_categoria = data.get(campo)
+    
+    if not isinstance(id_categoria, int) or id_categoria <= 0:
+        return {
+            'error': 'Categoría inválida',
+            'detail': 'El id_categoria debe ser un entero positivo'
+        }
+    return None
+
+
+def _validar_stock_minimo(data: dict, campo: str, is_update: bool):
+    """Stock mínimo: entero entre 0 y 1.000.000 (o None)"""
+    stock_minimo = data.get(campo)
+    if stock_minimo is None:
+        return None
+    
+    if not isinstance(stock_minimo, int) or stock_minimo < 0:
+        return {
+            'error': 'Stock mínimo inválido',
+            'detail': 'El stock_minimo debe ser un entero >= 0'
+        }
+    
+    # Validar rango razonable
+    if stock_minimo > 1000000:
+        return {
+            'error': 'Stock mínimo inválido',
+            'detail': 'El stock_minimo excede el valor máximo permitido'
+        }
+    return None
+
+
+def _validar_unidad_medida(data: dict, campo: str, is_update: bool):
+    """Unidad de medida: una de _UNIDADES (se normaliza a minúsculas)"""
+    unidad_medida = data.get(campo)
+    if unidad_medida is None:
+        return None
+    
+    if not isinstance(unidad_medida, str):
+        return {
+            'error': 'Unidad de medida inválida',
+            'detail': 'La unidad_medida debe ser un string'
+        }
+    
+    unidad_medida = unidad_medida.strip().lower()
+    
+    if unidad_medida not in _UNIDADES_VALIDAS:
+        return _ERR_UNIDAD
+    
+    data[campo] = unidad_medida
+    return None
+
+
+def _validar_codigo_barras(data: dict, campo: str, is_update: bool):
+    """Código de barras: solo dígitos, 8-18 caracteres (o None)"""
+    codigo_barras = data.get(campo)
+    if codigo_barras is None:
+        return None
+    
+    if not isinstance(codigo_barras, str):
+        return {
+            'error': 'Código de barras inválido',
+            'detail': 'El codigo_barras debe ser un string'
+        }
+    
+    codigo_barras = codigo_barras.strip()
+    
+    # Solo dígitos, longitud entre 8-18 caracteres (EAN-8, EAN-13, etc)
+    if not (codigo_barras.isdecimal() and 8 <= len(codigo_barras) <= 18):
+        return {
+            'error': 'Código de barras inválido',
+            'detail': 'El código de barras debe contener solo dígitos (8-18 caracteres)'
+        }
+    
+    data[campo] = codigo_barras
+    return None
+
+
+def _validar_activo(data: dict, campo: str, is_update: bool):
+    """Activo: boolean"""
+    if not isinstance(data.get(campo), bool):
+        return {
+            'error': 'Estado inválido',
+            'detail': 'El campo activo debe ser true o false'
+        }
+    return None
+
+
+# Esquema de validación, en el orden en que se validan los campos:
+# (campo, validador, detalle si es obligatorio al crear o None)
+_SCHEMA = (
+    ('nombre', _validar_nombre, 'El nombre es obligatorio'),
+    ('descripcion', _validar_descripcion, None),
+    ('precio', _validar_precio, None),
+    ('costo', _validar_precio, None),
+    ('precio_venta', _validar_precio, None),
+    ('id_categoria', _validar_id_categoria, 'La categoría es obligatoria'),
+    ('stock_minimo', _validar_stock_minimo, None),
+    ('unidad_medida', _validar_unidad_medida, None),
+    ('codigo_barras', _validar_codigo_barras, None),
+    ('activo', _validar_activo, None),
+)
+
+
+def _a_centavos(valor) -> tuple:
+    """
+    Convertir un precio (int, float o string numérico) a centavos enteros
+    
+    Args:
+        valor: Precio recibido en el JSON
+    
+    Returns:
+        tuple: (centavos, exacto); exacto es False si tenía más de 2 decimales
+    
+    Raises:
+        InvalidOperation, ValueError, OverflowError: Si no es un número válido
+    """
+    if type(valor) is int:
+        return valor * 100, True
+    
+    if type(valor) is float:
+        # round(valor, 2) == valor si el float se escribe con hasta 2 decimales
+        return round(valor * 100), round(valor, 2) == valor
+    
+    if isinstance(valor, str):
+        valor_decimal = Decimal(valor)
+        if not valor_decimal.is_finite():
+            raise InvalidOperation(valor)
+        
+        # Fuera de rango: no se convierte a int (ej. "1e999999999")
+        if valor_decimal.copy_abs() > _MAX_PRECIO:
+            return (_MAX_CENTAVOS + 1 if valor_decimal > 0 else -1), True
+        
+        # La comparación es exacta (no redondea como scaleb/multiplicar
+        # con el contexto de Decimal)
+        redondeado = valor_decimal.quantize(_CENT)
+        return int(redondeado.scaleb(2)), redondeado == valor_decimal
+    
+    # bool, listas, etc.
+    raise ValueError(valor)
+
+
 def _tiene_patron_sql_injection(texto: str) -> bool:
     """
     Detecta patrones comunes de SQL injection
@@ -291,30 +420,7 @@ def _tiene_patron_sql_injection(texto: str) -> bool:
     Returns:
         bool: True si detecta patrones sospechosos
     """
-    # Convertir a minúsculas para comparación
-    texto_lower = texto.lower()
-    
-    # Patrones de SQL injection
-    patrones_peligrosos = [
-        r"('|(\\')|(;)|(--)|(/\*))",  # Comillas, punto y coma, comentarios
-        r"(\bunion\b.*\bselect\b)",   # UNION SELECT
-        r"(\bdrop\b.*\b(table|database)\b)",  # DROP TABLE/DATABASE
-        r"(\binsert\b.*\binto\b)",    # INSERT INTO
-        r"(\bupdate\b.*\bset\b)",     # UPDATE SET
-        r"(\bdelete\b.*\bfrom\b)",    # DELETE FROM
-        r"(\bexec\b.*\()",            # EXEC(
-        r"(\bscript\b.*>)",           # <script> tag
-        r"(\bor\b.*=.*)",             # OR 1=1
-        r"(\band\b.*=.*)",            # AND 1=1
-        r"xp_cmdshell",               # SQL Server command execution
-        r"(\bselect\b.*\bfrom\b)",    # SELECT FROM
-    ]
-    
-    for patron in patrones_peligrosos:
-        if re.search(patron, texto_lower, re.IGNORECASE):
-            return True
-    
-    return False
+    return _SQL_INJECTION_RE.search(texto) is not None
 
 
 def sanitize_producto_string(value: str, max_length: int = 255) -> str:
@@ -338,6 +444,6 @@ def sanitize_producto_string(value: str, max_length: int = 255) -> str:
     value = value[:max_length]
     
     # Eliminar caracteres de control
-    value = re.sub(r'[\x00-\x1F\x7F]', '', value)
+    value = value.translate(_CTRL_DEL)
     
     return value
@@ -2,7 +2,8 @@
 
 import re
 from functools import wraps
-from flask import request, jsonify
+from flask import request
+from app.utils.respuestas import json_response
 
 # =========================
 # EXPRESIONES REGULARES
@@ -66,9 +67,9 @@ def usuario_data_validation(f):
         data = request.get_json()
 
         if not data:
-            return jsonify({
+            return json_response({
                 "error": "No se enviaron datos JSON"
-            }), 400
+            }, 400)
 
         campos_obligatorios = [
             "nombre",
@@ -87,9 +88,9 @@ def usuario_data_validation(f):
 
         for campo in campos_obligatorios:
             if campo not in data:
-                return jsonify({
+                return json_response({
                     "error": f"Falta el campo '{campo}'"
-                }), 400
+                }, 400)
 
         # =========================
         # VALIDAR TEXTOS
@@ -107,9 +108,9 @@ def usuario_data_validation(f):
             error = validar_texto(campo, data[campo])
 
             if error:
-                return jsonify({
+                return json_response({
                     "error": error
-                }), 400
+                }, 400)
 
         # =========================
         # VALIDAR EMAIL
@@ -118,21 +119,21 @@ def usuario_data_validation(f):
         email = data["email"]
 
         if not isinstance(email, str):
-            return jsonify({
+            return json_response({
                 "error": "El email debe ser texto"
-            }), 400
+            }, 400)
 
         email = email.strip()
 
         if not re.match(EMAIL_REGEX, email):
-            return jsonify({
+            return json_response({
                 "error": "Formato de email inválido"
-            }), 400
+            }, 400)
 
         if contiene_sql_injection(email):
-            return jsonify({
+            return json_response({
                 "error": "Email inválido"
-            }), 400
+            }, 400)
 
         # =========================
         # VALIDAR IDS
@@ -147,14 +148,14 @@ def usuario_data_validation(f):
         for campo in campos_enteros:
 
             if not isinstance(data[campo], int):
-                return jsonify({
+                return json_response({
                     "error": f"El campo '{campo}' debe ser entero"
-                }), 400
+                }, 400)
 
             if data[campo] <= 0:
-                return jsonify({
+                return json_response({
                     "error": f"El campo '{campo}' debe ser mayor a 0"
-                }), 400
+                }, 400)
 
         # =========================
         # DATOS LIMPIOS
@@ -1,11 +1,34 @@
 """Router de Auditoría - Solo Maestro y Supervisor"""
 
-from flask import Blueprint, request, jsonify
+from datetime import date
+from flask import Blueprint, Response, request
 from app.services.services_init import AuditoriaService
 from app.utils.decoradores_auth import jwt_required_cookie, require_permiso
+from app.utils.paginacion import parse_cursor
+from app.utils.respuestas import json_response, json_page_response
 
 auditoria_bp = Blueprint('auditoria', __name__)
 
+
+def _etag(prefijo: str, version: int) -> str:
+    """
+    ETag (débil) de una respuesta de auditoría
+    
+    Cambia con cada acción auditada nueva (version = último id) y con el día,
+    porque las estadísticas son de los últimos 90 días. Los filtros no hace
+    falta incluirlos: el cliente manda If-None-Match para la misma URL.
+    """
+    return f"{prefijo}-{version}-{date.today().isoformat()}"
+
+
+def _no_modificado(etag: str):
+    """Respuesta 304 si el cliente ya tiene esta versión, si no None"""
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        return response
+    return None
+
 @auditoria_bp.route('/', methods=['GET'])
 @jwt_required_cookie()
 @require_permiso('ver_auditoria')
@@ -16,16 +39,27 @@ def get_auditoria():
     entidad = request.args.get('entidad', type=str)
     accion = request.args.get('accion', type=str)
     usuario_id = request.args.get('usuario_id', type=int)
+    cursor = parse_cursor(request.args.get('cursor', type=str))
+    
+    version = AuditoriaService.get_latest_id()
+    etag = _etag('auditoria', version)
+    no_modificado = _no_modificado(etag)
+    if no_modificado:
+        return no_modificado
     
     result = AuditoriaService.get_all(
         page=page,
         limit=limit,
         entidad=entidad,
         accion=accion,
-        usuario_id=usuario_id
+        usuario_id=usuario_id,
+        cursor=cursor,
+        version=version
     )
     
-    return jsonify(result), 200
+    response = json_page_response(result)
+    response.set_etag(etag, weak=True)
+    return response
 
 @auditoria_bp.route('/usuario/<int:usuario_id>', methods=['GET'])
 @jwt_required_cookie()
@@ -33,13 +67,31 @@ def get_auditoria():
 def get_auditoria_usuario(usuario_id):
     """Ver qué hizo un usuario específico"""
     page = request.args.get('page', 1, type=int)
-    result = AuditoriaService.get_by_usuario(usuario_id, page)
-    return jsonify(result), 200
+    cursor = parse_cursor(request.args.get('cursor', type=str))
+    
+    version = AuditoriaService.get_latest_id()
+    etag = _etag('auditoria', version)
+    no_modificado = _no_modificado(etag)
+    if no_modificado:
+        return no_modificado
+    
+    result = AuditoriaService.get_by_usuario(usuario_id, page, cursor=cursor, version=version)
+    response = json_page_response(result)
+    response.set_etag(etag, weak=True)
+    return response
 
 @auditoria_bp.route('/estadisticas', methods=['GET'])
 @jwt_required_cookie()
 @require_permiso('ver_auditoria')
 def get_estadisticas():
     """Estadísticas de auditoría"""
-    stats = AuditoriaService.get_estadisticas()
-    return jsonify(stats), 200
\ No newline at end of file
+    version = AuditoriaService.get_latest_id()
+    etag = _etag('stats', version)
+    no_modificado = _no_modificado(etag)
+    if no_modificado:
+        return no_modificado
+    
+    stats = AuditoriaService.get_estadisticas(version=version)
+    response = json_response(stats)
+    response.set_etag(etag, weak=True)
+    return response
\ No newline at end of file
@@ -4,7 +4,7 @@ Endpoints: login, logout, refresh, me, verify
 Maneja JWT en cookies HttpOnly
 """
 
-from flask import Blueprint, request, jsonify, make_response
+from flask import Blueprint, jsonify, make_response, g
 from flask_jwt_extended import (
     create_access_token,
     create_refresh_token,
@@ -40,7 +40,8 @@ def login():
         401: Credenciales inválidas
     """
     try:
-        data = request.get_json()
+        # Parseado por validate_credentials
+        data = g.validated_json
         
         # Validar datos requeridos
         if not data or not data.get('username') or not data.get('password'):
@@ -230,7 +231,7 @@ def change_password():
     """
     try:
         usuario_id = get_jwt_identity()
-        data = request.get_json()
+        data = g.validated_json
         ip_editor = get_client_ip()
         
         # Validar datos
@@ -10,6 +10,7 @@ from app.utils.decoradores_auth import (
     require_permiso,
     get_current_user_id
 )
+from app.utils.paginacion import parse_cursor
 
 
 envio_bp = Blueprint('envio', __name__)
@@ -24,6 +25,7 @@ def get_envios():
     
     Query params:
         - page, limit: Paginación
+        - cursor: Paginación por keyset (valor de next_cursor de la respuesta anterior)
         - estado: enviado, en_transito, recibido, cancelado
         - localidad_origen, localidad_destino: Filtrar por localidades
         - producto_id: Filtrar por producto
@@ -38,6 +40,7 @@ def get_envios():
         localidad_origen = request.args.get('localidad_origen', type=int)
         localidad_destino = request.args.get('localidad_destino', type=int)
         producto_id = request.args.get('producto_id', type=int)
+        cursor = parse_cursor(request.args.get('cursor', type=str))
         
         result = EnvioService.get_all(
             page=page,
@@ -45,10 +48,11 @@ def get_envios():
             estado=estado,
             localidad_origen=localidad_origen,
             localidad_destino=localidad_destino,
-            producto_id=producto_id
+            producto_id=producto_id,
+            cursor=cursor
         )
         
-        return jsonify(result), 200
+        return jsonify(result.to_dict()), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -7,6 +7,7 @@ CRÍTICO: Actualiza el stock en productos_localidad
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import get_jwt
 from app.services.movimiento_service import MovimientoService
+from app.utils.paginacion import parse_cursor
 from app.utils.decoradores_auth import (
     jwt_required_cookie,
     require_permiso,
@@ -27,6 +28,7 @@ def get_movimientos():
     
     Query params:
         - page, limit: Paginación
+        - cursor: Paginación por keyset (valor de next_cursor de la respuesta anterior)
         - tipo: entrada, salida, transferencia, ajuste
         - producto_id: Filtrar por producto
         - usuario_id: Filtrar por usuario
@@ -45,6 +47,7 @@ def get_movimientos():
         localidad_id = request.args.get('localidad_id', type=int)
         fecha_desde = request.args.get('fecha_desde', type=str)
         fecha_hasta = request.args.get('fecha_hasta', type=str)
+        cursor = parse_cursor(request.args.get('cursor', type=str))
         
         result = MovimientoService.get_historial(
             producto_id=producto_id,
@@ -54,10 +57,11 @@ def get_movimientos():
             limit=limit,
             tipo=tipo,
             fecha_desde=fecha_desde,
-            fecha_hasta=fecha_hasta
+            fecha_hasta=fecha_hasta,
+            cursor=cursor
         )
         
-        return jsonify(result), 200
+        return jsonify(result.to_dict()), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -3,7 +3,7 @@ Router de Productos
 CRUD completo de productos con validación de permisos
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g
 from app.services.producto_service import ProductoService
 from app.services.usuario_service import UsuarioService
 from app.middlewares.producto_validation import validate_producto_data
@@ -93,6 +93,8 @@ def get_productos():
         - categoria_id: Filtrar por categoría
         - activo: Filtrar por estado (true/false)
         - search: Buscar por nombre o código
+        - cursor: next_cursor de la respuesta anterior (paginación por keyset,
+          recomendada para páginas profundas; ignora page)
     
     Returns:
         200: Lista de productos con paginación
@@ -103,13 +105,15 @@ def get_productos():
         categoria_id = request.args.get('categoria_id', type=int)
         activo = request.args.get('activo', type=lambda x: x.lower() == 'true')
         search = request.args.get('search', type=str)
+        cursor_id = request.args.get('cursor', type=int)
         
         result = ProductoService.get_all(
             page=page,
             limit=limit,
             categoria_id=categoria_id,
             activo=activo,
-            search=search
+            search=search,
+            cursor_id=cursor_id
         )
         
         return jsonify(result), 200
@@ -169,7 +173,8 @@ def create_producto():
         #obtener el ID del usuario desde el token JWT 
         usuario_id = get_current_user_id()
 
-        data = request.get_json()
+        # Parseado (y normalizado) por validate_producto_data
+        data = g.validated_json
         
         if not data:
             return jsonify({'error': 'Datos requeridos'}), 400
@@ -23,10 +23,13 @@ def get_usuarios():
 
     page = request.args.get('page', 1, type=int)
     limit = request.args.get('limit', 20, type=int)
+    # Paginación por keyset: next_cursor de la respuesta anterior (ignora page)
+    cursor_id = request.args.get('cursor', type=int)
+    contar = request.args.get('contar', 'false').lower() == 'true'
 
     activo = data.get('activo')
     
-    result = UsuarioService.get_estado(page, limit, activo)
+    result = UsuarioService.get_estado(page, limit, activo, cursor_id=cursor_id, contar=contar)
     return jsonify(result), 200
 
 @usuario_bp.route('/get', methods=['GET'])
@@ -27,8 +27,13 @@ class AuthService:
             Exception: Si las credenciales son inválidas
         """
         
-        # Buscar usuario por username
-        usuario = UsuarioDAO.get_by_username(username)
+        # Buscar el usuario y verificar credenciales; los permisos se leen en
+        # otra conexión mientras se compara el bcrypt y el último login se
+        # actualiza en segundo plano
+        def verificar(usuario):
+            return usuario['activo'] and AuthService.verify_password(password, usuario['password_hash'])
+
+        usuario, permisos = UsuarioDAO.get_for_login(username, verificar)
         
         
         if not usuario:
@@ -40,16 +45,9 @@ class AuthService:
         
         
         # Verificar password
-        if not AuthService.verify_password(password, usuario['password_hash']):
+        if permisos is None:
             raise Exception("Contraseña incorrecta")
 
-        
-        # Actualizar último login
-        UsuarioDAO.update_ultimo_login(usuario['id_usuario'])
-
-        
-        # Obtener permisos del usuario
-        permisos = UsuarioDAO.get_permisos(usuario['id_usuario'])
                 
         usuario['permisos'] = [p['nombre'] for p in permisos]
 
@@ -132,7 +130,7 @@ class AuthService:
         
         if success:
             # Registrar en auditoría
-            AuditoriaDAO.create({
+            AuditoriaDAO.create_async({
                 'entidad': 'Usuario',
                 'id_entidad': usuario_id,
                 'accion': 'update',
@@ -205,7 +203,7 @@ class AuthService:
             bool: True siempre
         """
         # Registrar logout en auditoría
-        AuditoriaDAO.create({
+        AuditoriaDAO.create_async({
             'entidad': 'Usuario',
             'id_entidad': usuario_id,
             'accion': 'logout',
@@ -86,8 +86,14 @@ class EnvioService:
             'observaciones_envio': data.get('observaciones_envio', '')
         }
         
-        # Crear envío
-        envio_id = EnvioDAO.create(envio_data)
+        # Crear envío (con los nombres ya consultados para el listado)
+        envio_id = EnvioDAO.create({
+            **envio_data,
+            'producto_nombre': producto['nombre'],
+            'producto_codigo': producto.get('codigo'),
+            'localidad_origen_nombre': lugar_origen['localidad_nombre'],
+            'localidad_destino_nombre': localidad_destino['nombre']
+        })
         
         # RESTAR STOCK DEL ORIGEN
         ProductoLocalidadDAO.restar_stock(
@@ -97,7 +103,7 @@ class EnvioService:
         )
         
         # Registrar en auditoría
-        AuditoriaDAO.create({
+        AuditoriaDAO.create_async({
             'entidad': 'Envio',
             'id_entidad': envio_id,
             'accion': 'envio',
@@ -149,24 +155,24 @@ class EnvioService:
         if lugar_destino['id_localidad'] != envio['localidad_destino']:
             raise Exception("El lugar no pertenece a la localidad de destino")
         
-        # Marcar como recibido
-        success = EnvioDAO.marcar_recibido(
+        # Marcar como recibido (devuelve los datos del envío bloqueado)
+        recibido = EnvioDAO.marcar_recibido(
             envio_id,
             usuario_recibe_id,
             lugar_destino_id,
             observaciones
         )
         
-        if success:
+        if recibido:
             # SUMAR STOCK AL DESTINO
             ProductoLocalidadDAO.sumar_stock(
-                envio['id_producto'],
+                recibido['id_producto'],
                 lugar_destino_id,
-                envio['cantidad']
+                recibido['cantidad']
             )
             
             # Registrar en auditoría
-            AuditoriaDAO.create({
+            AuditoriaDAO.create_async({
                 'entidad': 'Envio',
                 'id_entidad': envio_id,
                 'accion': 'recepcion',
@@ -182,7 +188,7 @@ class EnvioService:
                 'id_usuario': usuario_recibe_id
             })
         
-        return success
+        return recibido is not None
     
     @staticmethod
     def cancelar_envio(envio_id: int, usuario_id: int, observaciones: str = '') -> bool:
@@ -210,19 +216,19 @@ class EnvioService:
         if envio['estado'] == 'recibido':
             raise Exception("No se puede cancelar un envío ya recibido")
         
-        # Cancelar envío
-        success = EnvioDAO.cancelar(envio_id, observaciones)
+        # Cancelar envío (devuelve los datos del envío bloqueado)
+        cancelado = EnvioDAO.cancelar(envio_id, observaciones)
         
-        if success:
+        if cancelado:
             # DEVOLVER STOCK AL ORIGEN
             ProductoLocalidadDAO.sumar_stock(
-                envio['id_producto'],
-                envio['lugar_origen'],
-                envio['cantidad']
+                cancelado['id_producto'],
+                cancelado['lugar_origen'],
+                cancelado['cantidad']
             )
             
             # Registrar en auditoría
-            AuditoriaDAO.create({
+            AuditoriaDAO.create_async({
                 'entidad': 'Envio',
                 'id_entidad': envio_id,
                 'accion': 'cancelacion',
@@ -234,11 +240,11 @@ class EnvioService:
                 'id_usuario': usuario_id
             })
         
-        return success
+        return cancelado is not None
     
     @staticmethod
     def get_all(page=1, limit=20, estado=None, localidad_origen=None, 
-                localidad_destino=None, producto_id=None):
+                localidad_destino=None, producto_id=None, cursor=None):
         """Obtener todos los envíos con filtros"""
         return EnvioDAO.get_all(
             page=page,
@@ -246,7 +252,8 @@ class EnvioService:
             estado=estado,
             localidad_origen=localidad_origen,
             localidad_destino=localidad_destino,
-            producto_id=producto_id
+            producto_id=producto_id,
+            cursor=cursor
         )
     
     @staticmethod
@@ -68,7 +68,7 @@ class MovimientoService:
         )
         
         # Registrar en auditoría
-        AuditoriaDAO.create({
+        AuditoriaDAO.create_async({
             'entidad': 'Movimiento',
             'id_entidad': movimiento_id,
             'accion': 'create',
@@ -141,7 +141,7 @@ class MovimientoService:
         )
         
         # Registrar en auditoría
-        AuditoriaDAO.create({
+        AuditoriaDAO.create_async({
             'entidad': 'Movimiento',
             'id_entidad': movimiento_id,
             'accion': 'create',
@@ -222,7 +222,7 @@ class MovimientoService:
         )
         
         # Registrar en auditoría
-        AuditoriaDAO.create({
+        AuditoriaDAO.create_async({
             'entidad': 'Movimiento',
             'id_entidad': movimiento_id,
             'accion': 'create',
@@ -301,7 +301,7 @@ class MovimientoService:
         )
         
         # Registrar en auditoría
-        AuditoriaDAO.create({
+        AuditoriaDAO.create_async({
             'entidad': 'Movimiento',
             'id_entidad': movimiento_id,
             'accion': 'ajuste',
@@ -318,7 +318,8 @@ class MovimientoService:
     
     @staticmethod
     def get_historial(producto_id=None, usuario_id=None, localidad_id=None, 
-                      page=1, limit=20, tipo=None, fecha_desde=None, fecha_hasta=None):
+                      page=1, limit=20, tipo=None, fecha_desde=None, fecha_hasta=None,
+                      cursor=None):
         """Obtener historial de movimientos con filtros"""
         return MovimientoDAO.get_all(
             page=page,
@@ -328,7 +329,8 @@ class MovimientoService:
             usuario_id=usuario_id,
             localidad_id=localidad_id,
             fecha_desde=fecha_desde,
-            fecha_hasta=fecha_hasta
+            fecha_hasta=fecha_hasta,
+            cursor=cursor
         )
     
     @staticmethod
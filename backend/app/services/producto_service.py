@@ -85,7 +85,7 @@ class ProductoService:
                 cantidad=data['stock_minimo'])
 
             # Registrar en auditoría
-            AuditoriaDAO.create({
+            AuditoriaDAO.create_async({
                 'entidad': 'Producto',
                 'id_entidad': producto_id,
                 'accion': 'create',
@@ -132,31 +132,15 @@ class ProductoService:
         return ProductoDAO.get_stock_en_localidad(localidad_id)
 
     @staticmethod
-    def get_all(page=1, limit=20, categoria_id=None, activo=None, search=None):
-        """Obtener todos los productos con filtros"""
-        result = ProductoDAO.get_all(page, limit, categoria_id, activo, search)
-
-        # Agregar stock total a cada producto
-        for producto in result['productos']:
-            producto['stock_total'] = ProductoDAO.get_stock_total(producto['id_producto'])
-
-        return result
+    def get_all(page=1, limit=20, categoria_id=None, activo=None, search=None, cursor_id=None):
+        """Obtener todos los productos con filtros (cada producto trae su stock_total)"""
+        return ProductoDAO.get_all(page, limit, categoria_id, activo, search, cursor_id)
 
     @staticmethod
     def get_by_id(producto_id: int) -> dict:
         """Obtener producto por ID con información completa"""
-        producto = ProductoDAO.get_by_id(producto_id)
-
-        if not producto:
-            return None
-
-        # Agregar stock total
-        producto['stock_total'] = ProductoDAO.get_stock_total(producto_id)
-
-        # Agregar stock por localidad
-        producto['stock_por_localidad'] = ProductoDAO.get_stock_por_localidad(producto_id)
-
-        return producto
+        # Producto, stock total y stock por localidad en una sola consulta
+        return ProductoDAO.get_detail(producto_id)
 
     @staticmethod
     def update(producto_id: int, data: dict, usuario_id: int) -> bool:
@@ -171,6 +155,9 @@ class ProductoService:
         Returns:
             bool: True si se actualizó
         """
+        # El frontend envía id_producto en el body: el ID es el de la ruta
+        data = {key: value for key, value in data.items() if key != 'id_producto'}
+
         # Obtener producto actual
         producto_actual = ProductoDAO.get_by_id(producto_id)
         if not producto_actual:
@@ -237,7 +224,7 @@ class ProductoService:
 
         if success:
             # Registrar en auditoría
-            AuditoriaDAO.create({
+            AuditoriaDAO.create_async({
                 'entidad': 'Producto',
                 'id_entidad': producto_id,
                 'accion': 'delete',
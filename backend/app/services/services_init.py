@@ -26,24 +26,41 @@ __all__ = [
 # AUDITORIA SERVICE
 # ========================================
 from app.DAO.auditoria_DAO import AuditoriaDAO
+from app.utils.cache import TTLCache, cached
+
+# Los paneles consultan estadísticas y listados de auditoría seguido: se
+# toleran unos segundos de atraso en lugar de repetir las consultas
+_estadisticas_cache = TTLCache(maxsize=16, ttl=30)
+_auditoria_cache = TTLCache(maxsize=256, ttl=15)
 
 class AuditoriaService:
     """Servicio de consulta de auditoría"""
     
+    # El parámetro version (get_latest_id) no se usa en la consulta: forma parte
+    # de la clave del cache, así una acción auditada nueva lo invalida y el
+    # body siempre corresponde al ETag calculado con esa versión
+    
+    @staticmethod
+    def get_latest_id() -> int:
+        """Último id de auditoría (versión de los datos para ETag y cache)"""
+        return AuditoriaDAO.get_latest_id()
+    
     @staticmethod
-    def get_all(page=1, limit=50, **filters):
+    @cached(_auditoria_cache)
+    def get_all(page=1, limit=50, version=None, **filters):
         """Obtener todos los registros de auditoría"""
         return AuditoriaDAO.get_all(page=page, limit=limit, **filters)
     
     @staticmethod
-    def get_by_usuario(usuario_id: int, page=1, limit=50):
+    @cached(_auditoria_cache)
+    def get_by_usuario(usuario_id: int, page=1, limit=50, cursor=None, version=None):
         """Obtener auditoría de un usuario"""
-        return AuditoriaDAO.get_by_usuario(usuario_id, page, limit)
+        return AuditoriaDAO.get_by_usuario(usuario_id, page, limit, cursor)
     
     @staticmethod
-    def get_by_entidad(entidad: str, id_entidad: int):
+    def get_by_entidad(entidad: str, id_entidad: int, parse_json=True):
         """Obtener historial de una entidad"""
-        return AuditoriaDAO.get_by_entidad(entidad, id_entidad)
+        return AuditoriaDAO.get_by_entidad(entidad, id_entidad, parse_json)
     
     @staticmethod
     def get_actividad_reciente(limit: int = 20):
@@ -51,7 +68,8 @@ class AuditoriaService:
         return AuditoriaDAO.get_actividad_reciente(limit)
     
     @staticmethod
-    def get_estadisticas(fecha_desde=None, fecha_hasta=None):
+    @cached(_estadisticas_cache)
+    def get_estadisticas(fecha_desde=None, fecha_hasta=None, version=None):
         """Obtener estadísticas de auditoría"""
         return {
             'por_accion': AuditoriaDAO.count_por_accion(fecha_desde, fecha_hasta),
@@ -77,7 +95,7 @@ class CategoriaService:
         categoria_id = CategoriaDAO.create(data)
         
         # Auditoría
-        AuditoriaDAO.create({
+        AuditoriaDAO.create_async({
             'entidad': 'Categoria',
             'id_entidad': categoria_id,
             'accion': 'create',
@@ -103,7 +121,7 @@ class CategoriaService:
         success = CategoriaDAO.update(categoria_id, data)
         
         if success:
-            AuditoriaDAO.create({
+            AuditoriaDAO.create_async({
                 'entidad': 'Categoria',
                 'id_entidad': categoria_id,
                 'accion': 'update',
@@ -124,7 +142,7 @@ class CategoriaService:
         success = CategoriaDAO.delete(categoria_id)
         
         if success:
-            AuditoriaDAO.create({
+            AuditoriaDAO.create_async({
                 'entidad': 'Categoria',
                 'id_entidad': categoria_id,
                 'accion': 'delete',
@@ -153,7 +171,7 @@ class LocalidadService:
         localidad_id = LocalidadDAO.create(data)
         
         # Auditoría
-        AuditoriaDAO.create({
+        AuditoriaDAO.create_async({
             'entidad': 'Localidad',
             'id_entidad': localidad_id,
             'accion': 'create',
@@ -184,7 +202,7 @@ class LocalidadService:
         success = LocalidadDAO.update(localidad_id, data)
         
         if success:
-            AuditoriaDAO.create({
+            AuditoriaDAO.create_async({
                 'entidad': 'Localidad',
                 'id_entidad': localidad_id,
                 'accion': 'update',
@@ -205,7 +223,7 @@ class LocalidadService:
         success = LocalidadDAO.delete(localidad_id)
         
         if success:
-            AuditoriaDAO.create({
+            AuditoriaDAO.create_async({
                 'entidad': 'Localidad',
                 'id_entidad': localidad_id,
                 'accion': 'delete',
@@ -235,7 +253,7 @@ class LugarService:
         lugar_id = LugarDAO.create(data)
         
         # Auditoría
-        AuditoriaDAO.create({
+        AuditoriaDAO.create_async({
             'entidad': 'Lugar',
             'id_entidad': lugar_id,
             'accion': 'create',
@@ -266,7 +284,7 @@ class LugarService:
         success = LugarDAO.update(lugar_id, data)
         
         if success:
-            AuditoriaDAO.create({
+            AuditoriaDAO.create_async({
                 'entidad': 'Lugar',
                 'id_entidad': lugar_id,
                 'accion': 'update',
@@ -282,7 +300,7 @@ class LugarService:
         success = LugarDAO.delete(lugar_id)
         
         if success:
-            AuditoriaDAO.create({
+            AuditoriaDAO.create_async({
                 'entidad': 'Lugar',
                 'id_entidad': lugar_id,
                 'accion': 'delete',
@@ -10,6 +10,10 @@ from app.services.auth_service import AuthService
 from app.utils.decoradores_auth import get_client_ip
 from app.DAO.usuario_DAO import UsuarioDAO
 import re
+import string
+
+# Caracteres permitidos en el username
+_USERNAME_CHARS = frozenset(string.ascii_letters + string.digits + "_")
 
 
 class UsuarioService:
@@ -86,7 +90,7 @@ class UsuarioService:
 
         if usuario_id > 0 :    
             # Registrar en auditoría
-            AuditoriaDAO.create({
+            AuditoriaDAO.create_async({
                 'entidad': 'Usuario',
                 'id_entidad': usuario_id,
                 'accion': 'create',
@@ -105,9 +109,9 @@ class UsuarioService:
         return usuario_id
     
     @staticmethod
-    def get_estado(page=1, limit=20, activo=1):
-        """Obtener todos los usuarios con paginación"""
-        return UsuarioDAO.get_all(page, limit, activo)
+    def get_estado(page=1, limit=20, activo=1, cursor_id=None, contar=False):
+        """Obtener todos los usuarios con paginación (por page o por cursor)"""
+        return UsuarioDAO.get_all(page, limit, activo, cursor_id=cursor_id, contar=contar)
     
     @staticmethod
     def get_all_sin_paginacion():
@@ -170,7 +174,7 @@ class UsuarioService:
         #Esta valiendo que el username no se repita con otro usuario que no sea el mismo
         if 'username' in data and data['username']:
            # Validar username (solo alfanumérico y _)
-            if not re.match(r'^[a-zA-Z0-9_]{3,50}$', data['username']):
+            if not (3 <= len(data['username']) <= 50 and _USERNAME_CHARS.issuperset(data['username'])):
                 raise Exception("Username inválido (3-50 caracteres, solo letras, números y _)")
                 
             # Verificar que no exista otro usuario con ese username
@@ -190,7 +194,7 @@ class UsuarioService:
         
         if success:
             #Registrar en auditoría
-            AuditoriaDAO.create({
+            AuditoriaDAO.create_async({
                 'entidad': 'Usuario',
                 'id_entidad': usuario_id,
                 'accion': 'update',
@@ -271,7 +275,7 @@ class UsuarioService:
             estado = UsuarioDAO.activar_usuario(usuario_id)  # Activar usuario al asignar rol
 
             # Registrar en auditoría
-            AuditoriaDAO.create({
+            AuditoriaDAO.create_async({
                 'entidad': 'Usuario',
                 'id_entidad': usuario_id,
                 'accion': 'update',
@@ -310,7 +314,7 @@ class UsuarioService:
             estado =  UsuarioDAO.desactivar_usuario(usuario_id)  # Desactivar usuario al quitar rol
 
             # Registrar en auditoría
-            AuditoriaDAO.create({
+            AuditoriaDAO.create_async({
             'entidad': 'Usuario',
             'id_entidad': usuario_id,
             'accion': 'update',
@@ -334,7 +338,7 @@ class UsuarioService:
                 raise Exception(f"Campo requerido: {field}")
         
         # Validar username (solo alfanumérico y _)
-        if not re.match(r'^[a-zA-Z0-9_]{3,50}$', data['username']):
+        if not (3 <= len(data['username']) <= 50 and _USERNAME_CHARS.issuperset(data['username'])):
             raise Exception("Username inválido (3-50 caracteres, solo letras, números y _)")
         
         # Validar password
@@ -380,7 +384,7 @@ class UsuarioService:
         
         if success:
             # Registrar en auditoría
-            AuditoriaDAO.create({
+            AuditoriaDAO.create_async({
                 'entidad': 'Usuario',
                 'id_entidad': usuario_id,
                 'accion': 'update',
@@ -410,7 +414,7 @@ class UsuarioService:
         
         if success:
             # Registrar en auditoría
-            AuditoriaDAO.create({
+            AuditoriaDAO.create_async({
                 'entidad': 'Usuario',
                 'id_entidad': usuario_id,
                 'accion': 'update',
@@ -443,7 +447,7 @@ class UsuarioService:
 
         if success:
             # Registrar en auditoría
-            AuditoriaDAO.create({
+            AuditoriaDAO.create_async({
                 'entidad': 'Usuario',
                 'id_entidad': usuario_id,
                 'accion': 'update',
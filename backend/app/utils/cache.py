@@ -0,0 +1,127 @@
+"""
+Cache en memoria con expiración (TTL)
+Pensado para tablas de consulta pequeñas y casi de solo lectura
+"""
+
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g, has_request_context
+
+# Marcador para distinguir "no está en cache" de un valor None cacheado
+MISS = object()
+
+
+class TTLCache:
+    """
+    Cache LRU con expiración por tiempo, segura entre hilos
+
+    Args:
+        maxsize (int): Cantidad máxima de entradas (se descartan las menos usadas)
+        ttl (float): Segundos de vida de cada entrada
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 120):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key, default=MISS):
+        """Obtener un valor; devuelve default si no existe o expiró"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """Guardar un valor"""
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        """Invalidar una entrada"""
+        with self._lock:
+            item = self._data.pop(key, None)
+            return default if item is None else item[1]
+
+    def clear(self):
+        """Invalidar todo el cache"""
+        with self._lock:
+            self._data.clear()
+
+
+def copiar_filas(value):
+    """Copiar filas (dict o lista de dict) para que el llamador no modifique el cache"""
+    if isinstance(value, dict):
+        return dict(value)
+    if isinstance(value, list):
+        return [dict(row) if isinstance(row, dict) else row for row in value]
+    return value
+
+
+def cached(cache: TTLCache):
+    """
+    Decorador para cachear el resultado de un método de DAO
+
+    La clave es el nombre de la función más sus argumentos. Se devuelve
+    una copia del valor cacheado para no compartir los dicts entre requests.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (func.__name__, args, tuple(sorted(kwargs.items())))
+            value = cache.get(key)
+            if value is MISS:
+                value = func(*args, **kwargs)
+                cache.set(key, value)
+            return copiar_filas(value)
+        return wrapper
+    return decorator
+
+
+def request_memoize(func):
+    """
+    Decorador para memoizar una lectura de DAO durante una sola request
+
+    Los resultados se guardan en flask.g (que se descarta al terminar la
+    request), así no hace falta invalidarlos por tiempo. Fuera de un contexto
+    de request se llama directamente a la función. Las escrituras que
+    modifiquen los datos dentro de la misma request deben llamar a
+    limpiar_cache_request().
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not has_request_context():
+            return func(*args, **kwargs)
+
+        memo = g.get('_dao_cache')
+        if memo is None:
+            memo = g._dao_cache = {}
+
+        key = (func.__qualname__, args, tuple(sorted(kwargs.items())))
+        value = memo.get(key, MISS)
+        if value is MISS:
+            value = func(*args, **kwargs)
+            memo[key] = value
+        return copiar_filas(value)
+    return wrapper
+
+
+def limpiar_cache_request():
+    """Descartar las lecturas memoizadas en la request actual"""
+    if has_request_context():
+        g.pop('_dao_cache', None)
@@ -0,0 +1,41 @@
+"""
+Configuración de logging
+Los registros se encolan (QueueHandler) y un hilo aparte (QueueListener) los
+escribe, así la E/S del log no ocurre en el hilo de la request
+"""
+
+import atexit
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+_FORMATO = "%(asctime)s %(levelname)s [%(name)s] %(message)s"
+
+_listener = None
+
+
+def configurar_logging(nivel: str = None) -> None:
+    """
+    Configurar el logger raíz con un QueueHandler (una sola vez por proceso)
+
+    Args:
+        nivel (str): Nivel de log (por defecto LOG_LEVEL del entorno o INFO)
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    nivel = (nivel or os.getenv("LOG_LEVEL", "INFO")).upper()
+
+    salida = logging.StreamHandler()
+    salida.setFormatter(logging.Formatter(_FORMATO))
+
+    cola = queue.SimpleQueue()
+    _listener = QueueListener(cola, salida, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    raiz = logging.getLogger()
+    raiz.setLevel(nivel)
+    raiz.addHandler(QueueHandler(cola))
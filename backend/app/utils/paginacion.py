@@ -0,0 +1,81 @@
+"""
+Utilidades de paginación
+Paginación por cursor (keyset): el cursor es "<fecha_iso>,<id>" del último registro
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+
+
+def build_cursor(fecha, id_registro):
+    """Construir el cursor a partir de la fecha y el ID del último registro"""
+    if isinstance(fecha, datetime):
+        fecha = fecha.isoformat()
+    return f"{fecha},{id_registro}"
+
+
+def parse_cursor(value):
+    """
+    Parsear el cursor recibido por query string
+
+    Returns:
+        tuple: (fecha_iso, id) o None si el cursor no es válido
+    """
+    if not value:
+        return None
+
+    fecha, sep, id_registro = value.rpartition(',')
+    if not sep or not fecha:
+        return None
+
+    try:
+        return (datetime.fromisoformat(fecha).isoformat(sep=' '), int(id_registro))
+    except ValueError:
+        return None
+
+
+@dataclass(slots=True)
+class PageResult:
+    """
+    Resultado paginado de un listado
+
+    Se convierte a dict recién al serializar la respuesta (to_dict), con el
+    formato {<key>: rows, 'next_cursor': ..., 'pagination': {...}}.
+    Las filas pueden ser dicts o namedtuples (se convierten con _asdict).
+    """
+    key: str
+    rows: list
+    page: int
+    limit: int
+    total: int = None
+    next_cursor: str = None
+
+    @property
+    def total_pages(self):
+        """Cantidad de páginas (None si no se calculó el total)"""
+        if self.total is None:
+            return None
+        return -(-self.total // self.limit)
+
+    def dict_rows(self, start: int = 0, stop: int = None) -> list:
+        """Filas [start:stop] como dicts"""
+        return [
+            row._asdict() if hasattr(row, '_asdict') else row
+            for row in self.rows[start:stop]
+        ]
+
+    def meta(self) -> dict:
+        """Todo lo que acompaña a las filas en la respuesta"""
+        return {
+            'next_cursor': self.next_cursor,
+            'pagination': {
+                'page': self.page,
+                'limit': self.limit,
+                'total': self.total,
+                'total_pages': self.total_pages
+            }
+        }
+
+    def to_dict(self) -> dict:
+        """Formato de respuesta de la API"""
+        return {self.key: self.dict_rows(), **self.meta()}
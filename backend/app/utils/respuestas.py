@@ -0,0 +1,79 @@
+"""
+Respuestas JSON y lectura del body de la request
+Usa orjson (mucho más rápido que jsonify/get_json)
+"""
+
+from datetime import date
+from decimal import Decimal
+
+import orjson
+from flask import Response, request
+from werkzeug.http import http_date
+
+# Las fechas salen en el mismo formato que jsonify (HTTP-date), así estas
+# respuestas son iguales a las del resto de las rutas
+_OPCIONES = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+def _default(obj):
+    if isinstance(obj, date):
+        return http_date(obj)
+    if isinstance(obj, Decimal):
+        return str(obj)
+    raise TypeError
+
+
+def dumps(obj) -> bytes:
+    """Serializar a JSON (fechas como jsonify, Decimal como string)"""
+    return orjson.dumps(obj, default=_default, option=_OPCIONES)
+
+
+loads = orjson.loads
+
+
+def json_response(obj, status: int = 200) -> Response:
+    """
+    Respuesta JSON sin pasar por flask.jsonify
+
+    Uso:
+        return json_response({'error': '...', 'detail': '...'}, 400)
+    """
+    return Response(dumps(obj), status=status, mimetype='application/json')
+
+
+def json_page_response(result, lote: int = 100) -> Response:
+    """
+    Respuesta JSON de un PageResult, serializada por partes
+
+    El body es el mismo que json_response(result.to_dict()), pero las filas se
+    serializan de a `lote` mientras se envía la respuesta: no se arma el dict
+    completo ni el body entero en memoria (los listados pueden pedir un
+    limit grande).
+    """
+    def generar():
+        yield b'{' + dumps(result.key) + b':['
+        for inicio in range(0, len(result.rows), lote):
+            if inicio:
+                yield b','
+            # [1:-1] quita los corchetes de la lista serializada
+            yield dumps(result.dict_rows(inicio, inicio + lote))[1:-1]
+        # [1:] quita la llave de apertura del dict serializado
+        yield b'],' + dumps(result.meta())[1:]
+
+    return Response(generar(), mimetype='application/json')
+
+
+def leer_json():
+    """
+    Parsear el body JSON de la request (en lugar de request.get_json)
+
+    Returns:
+        El JSON parseado, o None si el body está vacío o no es application/json
+
+    Raises:
+        ValueError: Si el body no es JSON válido
+    """
+    if not request.is_json:
+        return None
+    raw = request.get_data(cache=True)
+    return loads(raw) if raw else None
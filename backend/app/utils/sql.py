@@ -0,0 +1,38 @@
+"""
+Utilidades para armar SQL
+"""
+
+import functools
+
+
+@functools.lru_cache(maxsize=64)
+def in_placeholders(n: int) -> str:
+    """Placeholders para un IN con n valores: "%s,%s,...,%s" (cacheado por n)"""
+    return ",".join(["%s"] * n)
+
+
+def in_params(valores) -> tuple:
+    """
+    Armar los placeholders y parámetros de un IN (...)
+
+    La cantidad se redondea a la siguiente potencia de dos repitiendo el último
+    valor (no cambia el resultado del IN), así hay pocas formas distintas de la
+    consulta y el texto SQL se reutiliza.
+
+    Returns:
+        tuple: ("%s,%s,...", [valores])
+    """
+    params = list(valores)
+    if not params:
+        raise ValueError("in_params requiere al menos un valor")
+
+    n = 1 << (len(params) - 1).bit_length()
+    params.extend([params[-1]] * (n - len(params)))
+    return in_placeholders(n), params
+
+
+def chunks(valores, n: int = 500):
+    """Partir una lista de valores en lotes de a lo sumo n (para IN muy largos)"""
+    valores = list(valores)
+    for i in range(0, len(valores), n):
+        yield valores[i:i + n]
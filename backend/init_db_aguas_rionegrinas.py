@@ -68,6 +68,7 @@ def create_tables():
                     ciudad VARCHAR(100),
                     codigo_postal VARCHAR(20),
                     activo TINYINT(1) DEFAULT 1,
+                    num_lugares INT NOT NULL DEFAULT 0 COMMENT 'Lugares activos (mantenido por triggers)',
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
                     INDEX idx_nombre (nombre),
@@ -261,6 +262,20 @@ def create_tables():
             """)
             print("  ✓ Tabla 'productos_localidad' creada")
             
+            # ========================================
+            # TABLA: PRODUCTO_STOCK_TOTAL (Resumen de stock por producto)
+            # ========================================
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS producto_stock_total (
+                    id_producto INT PRIMARY KEY,
+                    stock_total INT NOT NULL DEFAULT 0,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                    FOREIGN KEY (id_producto) REFERENCES productos(id_producto) ON DELETE CASCADE
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+                COMMENT='Suma de productos_localidad.cantidad (mantenida por triggers)'
+            """)
+            print("  ✓ Tabla 'producto_stock_total' creada")
+            
             # ========================================
             # TABLA: MOVIMIENTOS
             # ========================================
@@ -282,11 +297,11 @@ def create_tables():
                     FOREIGN KEY (id_localidad) REFERENCES localidades(id_localidad),
                     FOREIGN KEY (lugar_origen) REFERENCES lugares(id_lugar),
                     FOREIGN KEY (lugar_destino) REFERENCES lugares(id_lugar),
-                    INDEX idx_producto (id_producto),
-                    INDEX idx_usuario (id_usuario),
-                    INDEX idx_localidad (id_localidad),
-                    INDEX idx_tipo (tipo),
-                    INDEX idx_fecha (fecha_hora)
+                    INDEX idx_mov_prod_fecha (id_producto, fecha_hora),
+                    INDEX idx_mov_usuario_fecha (id_usuario, fecha_hora),
+                    INDEX idx_mov_localidad_fecha (id_localidad, fecha_hora),
+                    INDEX idx_mov_tipo_fecha (tipo, fecha_hora),
+                    INDEX idx_mov_fecha (fecha_hora, id_movimiento)
                 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
             """)
             print("  ✓ Tabla 'movimientos' creada")
@@ -313,6 +328,10 @@ def create_tables():
                     observaciones_envio TEXT,
                     observaciones_recepcion TEXT,
                     observaciones_cancelacion TEXT,
+                    producto_nombre_snapshot VARCHAR(200) COMMENT 'Nombre del producto al enviar (listados)',
+                    producto_codigo_snapshot VARCHAR(50) COMMENT 'Código del producto al enviar (listados)',
+                    localidad_origen_nombre_snapshot VARCHAR(100) COMMENT 'Nombre de la localidad de origen (listados)',
+                    localidad_destino_nombre_snapshot VARCHAR(100) COMMENT 'Nombre de la localidad de destino (listados)',
                     FOREIGN KEY (id_producto) REFERENCES productos(id_producto),
                     FOREIGN KEY (id_usuario_envia) REFERENCES usuarios(id_usuario),
                     FOREIGN KEY (id_usuario_recibe) REFERENCES usuarios(id_usuario),
@@ -342,8 +361,8 @@ def create_tables():
                     accion ENUM('create', 'update', 'delete', 'login', 'logout', 
                                 'envio', 'recepcion', 'cancelacion', 'ajuste') NOT NULL,
                     descripcion TEXT COMMENT 'Descripción de la acción',
-                    datos_anteriores JSON COMMENT 'Estado antes del cambio',
-                    datos_nuevos JSON COMMENT 'Estado después del cambio',
+                    datos_anteriores MEDIUMBLOB COMMENT 'Estado antes del cambio (JSON, comprimido con zstd)',
+                    datos_nuevos MEDIUMBLOB COMMENT 'Estado después del cambio (JSON, comprimido con zstd)',
                     id_usuario INT NOT NULL COMMENT 'Usuario que realizó la acción',
                     ip_address VARCHAR(45),
                     user_agent VARCHAR(255),
@@ -358,6 +377,31 @@ def create_tables():
             """)
             print("  ✓ Tabla 'auditoria' creada")
             
+            # ========================================
+            # TABLAS: RESUMEN DIARIO DE AUDITORIA
+            # ========================================
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS auditoria_stats_accion (
+                    accion VARCHAR(20) NOT NULL,
+                    dia DATE NOT NULL,
+                    cnt BIGINT NOT NULL DEFAULT 0,
+                    PRIMARY KEY (accion, dia),
+                    INDEX idx_dia (dia)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """)
+            print("  ✓ Tabla 'auditoria_stats_accion' creada")
+            
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS auditoria_stats_usuario (
+                    id_usuario INT NOT NULL,
+                    dia DATE NOT NULL,
+                    cnt BIGINT NOT NULL DEFAULT 0,
+                    PRIMARY KEY (id_usuario, dia),
+                    INDEX idx_dia (dia)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """)
+            print("  ✓ Tabla 'auditoria_stats_usuario' creada")
+            
         connection.commit()
         print("\n✅ Todas las tablas creadas correctamente")
         
@@ -369,6 +413,322 @@ def create_tables():
         connection.close()
 
 
+# Índices adicionales (tabla, nombre, columnas). Se crean también sobre bases
+# ya existentes, donde CREATE TABLE IF NOT EXISTS no agrega índices nuevos.
+INDICES = [
+    # Actividad reciente: recorrido solo por índice, sin leer los JSON
+    ('auditoria', 'idx_recent', 'fecha_hora, id_usuario, entidad, accion'),
+    # Conteo por acción agrupado en orden de índice
+    ('auditoria', 'idx_accion_fecha', 'accion, fecha_hora'),
+    # Combinación de filtros más común del listado de auditoría
+    ('auditoria', 'idx_aud_filter', 'id_usuario, entidad, accion, fecha_hora'),
+    # Paginación por keyset (fecha, id) de auditoría y envíos
+    ('auditoria', 'idx_aud_fecha_id', 'fecha_hora, id_auditoria'),
+    ('envios', 'idx_envios_fecha_id', 'fecha_envio, id_envio'),
+    # Listado de movimientos: filtro + fecha, el ORDER BY fecha_hora DESC se
+    # resuelve recorriendo el índice hacia atrás (sin filesort)
+    ('movimientos', 'idx_mov_prod_fecha', 'id_producto, fecha_hora'),
+    ('movimientos', 'idx_mov_usuario_fecha', 'id_usuario, fecha_hora'),
+    ('movimientos', 'idx_mov_localidad_fecha', 'id_localidad, fecha_hora'),
+    ('movimientos', 'idx_mov_tipo_fecha', 'tipo, fecha_hora'),
+    ('movimientos', 'idx_mov_fecha', 'fecha_hora, id_movimiento'),
+    # Envíos de un usuario (enviados / recibidos) ordenados por fecha
+    ('envios', 'idx_envios_envia_fecha', 'id_usuario_envia, fecha_envio'),
+    ('envios', 'idx_envios_recibe_fecha', 'id_usuario_recibe, fecha_envio'),
+    # Stock por localidad (get_stock_por_localidad, listados de una localidad)
+    ('productos_localidad', 'idx_pl_localidad_prod', 'id_localidad, id_producto'),
+    # Listado de productos filtrado por categoría y estado
+    ('productos', 'idx_prod_categoria_activo', 'id_categoria, activo'),
+    # Listados de productos: cubre las columnas de _PRODUCTO_LIST_COLS (MySQL
+    # no tiene INCLUDE, van al final de la clave) para resolverlos solo con el índice
+    ('productos', 'idx_prod_list', 'activo, id_categoria, id_producto, nombre, codigo, costo, unidad_medida, stock_minimo'),
+]
+
+# Índices UNIQUE (tabla, nombre, columnas)
+INDICES_UNIQUE = [
+    # Un lugar pertenece a una sola localidad: (producto, lugar) identifica la
+    # fila de stock. Búsquedas por producto + lugar sin pasar por la localidad
+    ('productos_localidad', 'idx_pl_prod_lugar', 'id_producto, id_lugar'),
+]
+
+# Índices FULLTEXT (tabla, nombre, columnas)
+INDICES_FULLTEXT = [
+    # Búsqueda de productos por palabras (las búsquedas de una sola palabra
+    # usan LIKE 'x%' sobre idx_nombre / idx_codigo)
+    ('productos', 'ft_prod_nombre_desc', 'nombre, descripcion'),
+]
+
+
+# Columnas cuyo tipo cambió: (tabla, columna, tipo anterior, definición nueva)
+COLUMNAS = [
+    # Los JSON de auditoría se guardan comprimidos
+    ('auditoria', 'datos_anteriores', 'json', "MEDIUMBLOB COMMENT 'Estado antes del cambio (JSON, comprimido con zstd)'"),
+    ('auditoria', 'datos_nuevos', 'json', "MEDIUMBLOB COMMENT 'Estado después del cambio (JSON, comprimido con zstd)'"),
+]
+
+
+# Columnas agregadas después de la versión inicial: (tabla, columna, definición)
+COLUMNAS_NUEVAS = [
+    # Contador de lugares activos por localidad (ver TRIGGERS)
+    ('localidades', 'num_lugares', "INT NOT NULL DEFAULT 0 COMMENT 'Lugares activos (mantenido por triggers)'"),
+    # Nombres desnormalizados en envios para listar sin joins
+    ('envios', 'producto_nombre_snapshot', "VARCHAR(200) COMMENT 'Nombre del producto al enviar (listados)'"),
+    ('envios', 'producto_codigo_snapshot', "VARCHAR(50) COMMENT 'Código del producto al enviar (listados)'"),
+    ('envios', 'localidad_origen_nombre_snapshot', "VARCHAR(100) COMMENT 'Nombre de la localidad de origen (listados)'"),
+    ('envios', 'localidad_destino_nombre_snapshot', "VARCHAR(100) COMMENT 'Nombre de la localidad de destino (listados)'"),
+]
+
+
+def migrate_columns():
+    """Agregar columnas nuevas y actualizar el tipo de las que cambiaron en bases ya existentes"""
+    print("\n🔧 Verificando columnas...")
+    
+    config = DB_CONFIG.copy()
+    config['database'] = DB_NAME
+    connection = pymysql.connect(**config)
+    
+    try:
+        with connection.cursor() as cursor:
+            for tabla, columna, definicion in COLUMNAS_NUEVAS:
+                cursor.execute("""
+                    SELECT COUNT(*)
+                    FROM information_schema.columns
+                    WHERE table_schema = %s AND table_name = %s AND column_name = %s
+                """, (DB_NAME, tabla, columna))
+                
+                if cursor.fetchone()[0]:
+                    continue
+                
+                cursor.execute(f"ALTER TABLE {tabla} ADD COLUMN {columna} {definicion}")
+                print(f"  ✓ Columna '{tabla}.{columna}' agregada")
+            
+            for tabla, columna, tipo_anterior, definicion in COLUMNAS:
+                cursor.execute("""
+                    SELECT data_type
+                    FROM information_schema.columns
+                    WHERE table_schema = %s AND table_name = %s AND column_name = %s
+                """, (DB_NAME, tabla, columna))
+                
+                row = cursor.fetchone()
+                if not row or row[0].lower() != tipo_anterior:
+                    continue
+                
+                cursor.execute(f"ALTER TABLE {tabla} MODIFY {columna} {definicion}")
+                print(f"  ✓ Columna '{tabla}.{columna}' actualizada")
+        
+        connection.commit()
+        print("✅ Columnas verificadas")
+        
+    except Exception as e:
+        print(f"\n❌ Error al actualizar columnas: {e}")
+        raise
+    finally:
+        connection.close()
+
+
+def create_indexes():
+    """Crear los índices adicionales que no existan"""
+    print("\n🗂️  Creando índices...")
+    
+    config = DB_CONFIG.copy()
+    config['database'] = DB_NAME
+    connection = pymysql.connect(**config)
+    
+    try:
+        with connection.cursor() as cursor:
+            indices = [(t, n, c, '') for t, n, c in INDICES]
+            indices += [(t, n, c, 'UNIQUE ') for t, n, c in INDICES_UNIQUE]
+            indices += [(t, n, c, 'FULLTEXT ') for t, n, c in INDICES_FULLTEXT]
+            
+            for tabla, nombre, columnas, tipo in indices:
+                cursor.execute("""
+                    SELECT COUNT(*)
+                    FROM information_schema.statistics
+                    WHERE table_schema = %s AND table_name = %s AND index_name = %s
+                """, (DB_NAME, tabla, nombre))
+                
+                if cursor.fetchone()[0]:
+                    continue
+                
+                cursor.execute(f"CREATE {tipo}INDEX {nombre} ON {tabla} ({columnas})")
+                print(f"  ✓ Índice '{nombre}' creado en '{tabla}'")
+        
+        connection.commit()
+        print("✅ Índices verificados")
+        
+    except Exception as e:
+        print(f"\n❌ Error al crear índices: {e}")
+        raise
+    finally:
+        connection.close()
+
+
+def backfill_auditoria_stats():
+    """Cargar los resúmenes diarios de auditoría a partir de los registros existentes"""
+    print("\n📈 Cargando resúmenes de auditoría...")
+    
+    config = DB_CONFIG.copy()
+    config['database'] = DB_NAME
+    connection = pymysql.connect(**config)
+    
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM auditoria_stats_accion")
+            if cursor.fetchone()[0]:
+                print("  ✓ Resúmenes ya cargados")
+                return
+            
+            cursor.execute("""
+                INSERT INTO auditoria_stats_accion (accion, dia, cnt)
+                SELECT accion, DATE(fecha_hora), COUNT(*)
+                FROM auditoria
+                GROUP BY accion, DATE(fecha_hora)
+            """)
+            cursor.execute("""
+                INSERT INTO auditoria_stats_usuario (id_usuario, dia, cnt)
+                SELECT id_usuario, DATE(fecha_hora), COUNT(*)
+                FROM auditoria
+                GROUP BY id_usuario, DATE(fecha_hora)
+            """)
+        
+        connection.commit()
+        print("✅ Resúmenes de auditoría cargados")
+        
+    except Exception as e:
+        connection.rollback()
+        print(f"\n❌ Error al cargar resúmenes de auditoría: {e}")
+        raise
+    finally:
+        connection.close()
+
+
+# Triggers que mantienen localidades.num_lugares y producto_stock_total: (nombre, definición)
+TRIGGERS = [
+    ('trg_lugares_ai', """
+        CREATE TRIGGER trg_lugares_ai AFTER INSERT ON lugares
+        FOR EACH ROW
+        UPDATE localidades
+        SET num_lugares = num_lugares + 1
+        WHERE id_localidad = NEW.id_localidad AND NEW.activo = 1
+    """),
+    ('trg_lugares_au', """
+        CREATE TRIGGER trg_lugares_au AFTER UPDATE ON lugares
+        FOR EACH ROW
+        UPDATE localidades
+        SET num_lugares = num_lugares
+            - (id_localidad = OLD.id_localidad AND OLD.activo = 1)
+            + (id_localidad = NEW.id_localidad AND NEW.activo = 1)
+        WHERE id_localidad IN (OLD.id_localidad, NEW.id_localidad)
+    """),
+    ('trg_lugares_ad', """
+        CREATE TRIGGER trg_lugares_ad AFTER DELETE ON lugares
+        FOR EACH ROW
+        UPDATE localidades
+        SET num_lugares = num_lugares - 1
+        WHERE id_localidad = OLD.id_localidad AND OLD.activo = 1
+    """),
+    ('trg_productos_localidad_ai', """
+        CREATE TRIGGER trg_productos_localidad_ai AFTER INSERT ON productos_localidad
+        FOR EACH ROW
+        INSERT INTO producto_stock_total (id_producto, stock_total)
+        VALUES (NEW.id_producto, NEW.cantidad)
+        ON DUPLICATE KEY UPDATE stock_total = stock_total + NEW.cantidad
+    """),
+    # El stock nunca cambia de producto: solo se aplica la diferencia
+    ('trg_productos_localidad_au', """
+        CREATE TRIGGER trg_productos_localidad_au AFTER UPDATE ON productos_localidad
+        FOR EACH ROW
+        UPDATE producto_stock_total
+        SET stock_total = stock_total + NEW.cantidad - OLD.cantidad
+        WHERE id_producto = NEW.id_producto
+    """),
+    ('trg_productos_localidad_ad', """
+        CREATE TRIGGER trg_productos_localidad_ad AFTER DELETE ON productos_localidad
+        FOR EACH ROW
+        UPDATE producto_stock_total
+        SET stock_total = stock_total - OLD.cantidad
+        WHERE id_producto = OLD.id_producto
+    """),
+]
+
+
+def create_triggers():
+    """(Re)crear los triggers y recalcular los contadores que mantienen"""
+    print("\n⚙️  Creando triggers...")
+    
+    config = DB_CONFIG.copy()
+    config['database'] = DB_NAME
+    connection = pymysql.connect(**config)
+    
+    try:
+        with connection.cursor() as cursor:
+            for nombre, definicion in TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {nombre}")
+                cursor.execute(definicion)
+                print(f"  ✓ Trigger '{nombre}' creado")
+            
+            # Recalcular el contador por si hubo cambios sin triggers
+            cursor.execute("""
+                UPDATE localidades loc
+                SET num_lugares = (
+                    SELECT COUNT(*) FROM lugares l
+                    WHERE l.id_localidad = loc.id_localidad AND l.activo = 1
+                )
+            """)
+            cursor.execute("""
+                INSERT INTO producto_stock_total (id_producto, stock_total)
+                SELECT p.id_producto, COALESCE(SUM(pl.cantidad), 0)
+                FROM productos p
+                LEFT JOIN productos_localidad pl ON p.id_producto = pl.id_producto
+                GROUP BY p.id_producto
+                ON DUPLICATE KEY UPDATE stock_total = VALUES(stock_total)
+            """)
+        
+        connection.commit()
+        print("✅ Triggers verificados")
+        
+    except Exception as e:
+        connection.rollback()
+        print(f"\n❌ Error al crear triggers: {e}")
+        raise
+    finally:
+        connection.close()
+
+
+def backfill_envios_snapshots():
+    """Completar los nombres desnormalizados de los envíos existentes"""
+    print("\n🚚 Completando nombres de envíos...")
+    
+    config = DB_CONFIG.copy()
+    config['database'] = DB_NAME
+    connection = pymysql.connect(**config)
+    
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                UPDATE envios e
+                JOIN productos p ON e.id_producto = p.id_producto
+                JOIN localidades lo_origen ON e.localidad_origen = lo_origen.id_localidad
+                JOIN localidades lo_destino ON e.localidad_destino = lo_destino.id_localidad
+                SET e.producto_nombre_snapshot = p.nombre,
+                    e.producto_codigo_snapshot = p.codigo,
+                    e.localidad_origen_nombre_snapshot = lo_origen.nombre,
+                    e.localidad_destino_nombre_snapshot = lo_destino.nombre
+                WHERE e.producto_nombre_snapshot IS NULL
+            """)
+            print(f"  ✓ {cursor.rowcount} envíos actualizados")
+        
+        connection.commit()
+        print("✅ Nombres de envíos completados")
+        
+    except Exception as e:
+        connection.rollback()
+        print(f"\n❌ Error al completar nombres de envíos: {e}")
+        raise
+    finally:
+        connection.close()
+
+
 def insert_initial_data():
     """Insertar datos iniciales del sistema"""
     print("\n📝 Insertando datos iniciales...")
@@ -710,6 +1070,11 @@ def main():
         
         # Paso 2: Crear tablas
         create_tables()
+        migrate_columns()
+        create_indexes()
+        create_triggers()
+        backfill_auditoria_stats()
+        backfill_envios_snapshots()
         
         # Paso 3: Insertar datos iniciales
         insert_initial_data()
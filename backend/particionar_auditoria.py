@@ -0,0 +1,159 @@
+"""
+Script de mantenimiento de la tabla auditoria
+Sistema de Inventario - Aguas Rionegrinas
+
+Particiona auditoria por mes (RANGE sobre fecha_hora) para que las consultas
+por rango de fechas (estadísticas) lean solo las particiones necesarias.
+
+Uso:
+    python particionar_auditoria.py             # particionar (una vez) o rotar
+
+Ejecutar mensualmente (cron) para crear la partición del mes siguiente.
+Si AUDITORIA_RETENCION_MESES está definida, se eliminan las particiones
+más antiguas que ese número de meses.
+
+Notas:
+    - MySQL no admite claves foráneas en tablas particionadas: se elimina la
+      FK auditoria.id_usuario -> usuarios (el índice idx_usuario se mantiene).
+    - Toda clave única debe incluir la columna de partición: la PK pasa a ser
+      (id_auditoria, fecha_hora).
+    - fecha_hora es TIMESTAMP, por eso se particiona por UNIX_TIMESTAMP().
+"""
+
+import os
+from datetime import date
+
+import pymysql
+from dotenv import load_dotenv
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Configuración de base de datos
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'port': int(os.getenv('DB_PORT', 3306)),
+    'user': os.getenv('DB_USER', 'root'),
+    'password': os.getenv('DB_PASSWORD', ''),
+    'database': os.getenv('DB_NAME', 'aguas_rionegrinas_db_explotacion'),
+    'charset': 'utf8mb4'
+}
+
+RETENCION_MESES = os.getenv('AUDITORIA_RETENCION_MESES')
+
+
+def _siguiente_mes(fecha: date) -> date:
+    """Primer día del mes siguiente"""
+    if fecha.month == 12:
+        return date(fecha.year + 1, 1, 1)
+    return date(fecha.year, fecha.month + 1, 1)
+
+
+def _particion(mes: date) -> str:
+    """Definición de la partición que contiene el mes indicado"""
+    limite = _siguiente_mes(mes)
+    return (
+        f"PARTITION p{mes:%Y%m} "
+        f"VALUES LESS THAN (UNIX_TIMESTAMP('{limite:%Y-%m-%d} 00:00:00'))"
+    )
+
+
+def _particiones_actuales(cursor) -> list:
+    """Nombres de las particiones existentes de auditoria, en orden"""
+    cursor.execute("""
+        SELECT partition_name
+        FROM information_schema.partitions
+        WHERE table_schema = %s AND table_name = 'auditoria'
+          AND partition_name IS NOT NULL
+        ORDER BY partition_ordinal_position
+    """, (DB_CONFIG['database'],))
+    return [row[0] for row in cursor.fetchall()]
+
+
+def particionar(cursor):
+    """Particionar auditoria por mes desde el registro más antiguo"""
+    print("\n🗂️  Particionando tabla 'auditoria'...")
+
+    # Quitar la FK a usuarios (no soportada en tablas particionadas)
+    cursor.execute("""
+        SELECT constraint_name
+        FROM information_schema.referential_constraints
+        WHERE constraint_schema = %s AND table_name = 'auditoria'
+    """, (DB_CONFIG['database'],))
+    for (fk,) in cursor.fetchall():
+        cursor.execute(f"ALTER TABLE auditoria DROP FOREIGN KEY {fk}")
+        print(f"  ✓ FK '{fk}' eliminada")
+
+    cursor.execute("""
+        ALTER TABLE auditoria
+        DROP PRIMARY KEY,
+        ADD PRIMARY KEY (id_auditoria, fecha_hora)
+    """)
+    print("  ✓ PK cambiada a (id_auditoria, fecha_hora)")
+
+    cursor.execute("SELECT MIN(fecha_hora) FROM auditoria")
+    minimo = cursor.fetchone()[0]
+    mes = date(minimo.year, minimo.month, 1) if minimo else date.today().replace(day=1)
+
+    # Particiones hasta el mes siguiente al actual
+    hasta = _siguiente_mes(date.today().replace(day=1))
+    particiones = []
+    while mes <= hasta:
+        particiones.append(_particion(mes))
+        mes = _siguiente_mes(mes)
+    particiones.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+
+    cursor.execute(f"""
+        ALTER TABLE auditoria
+        PARTITION BY RANGE (UNIX_TIMESTAMP(fecha_hora)) (
+            {', '.join(particiones)}
+        )
+    """)
+    print(f"  ✓ {len(particiones)} particiones creadas")
+
+
+def rotar(cursor, particiones: list):
+    """Crear la partición del mes siguiente y eliminar las vencidas"""
+    print("\n🔄 Rotando particiones de 'auditoria'...")
+
+    siguiente = _siguiente_mes(date.today().replace(day=1))
+    if f"p{siguiente:%Y%m}" not in particiones:
+        cursor.execute(f"""
+            ALTER TABLE auditoria REORGANIZE PARTITION pmax INTO (
+                {_particion(siguiente)},
+                PARTITION pmax VALUES LESS THAN MAXVALUE
+            )
+        """)
+        print(f"  ✓ Partición 'p{siguiente:%Y%m}' creada")
+
+    if RETENCION_MESES:
+        hoy = date.today()
+        total = hoy.year * 12 + hoy.month - 1 - int(RETENCION_MESES)
+        limite = f"p{total // 12:04d}{total % 12 + 1:02d}"
+        vencidas = [p for p in particiones if p != 'pmax' and p < limite]
+        if vencidas:
+            cursor.execute(f"ALTER TABLE auditoria DROP PARTITION {', '.join(vencidas)}")
+            print(f"  ✓ Particiones eliminadas: {', '.join(vencidas)}")
+
+
+def main():
+    """Particionar la tabla la primera vez; luego solo rotar"""
+    connection = pymysql.connect(**DB_CONFIG)
+    try:
+        with connection.cursor() as cursor:
+            particiones = _particiones_actuales(cursor)
+            if particiones:
+                rotar(cursor, particiones)
+            else:
+                particionar(cursor)
+        connection.commit()
+        print("\n✅ Mantenimiento de auditoría completado")
+    except Exception as e:
+        print(f"\n❌ Error en el mantenimiento de auditoría: {e}")
+        raise
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()